@@ -0,0 +1,250 @@
+"""
+Открытая модель нагрузки: задачи запускаются по расписанию интенсивности.
+
+При ``wait_time = between(1.0, 5.0)`` (закрытая модель) замедление сервера
+снижает подаваемую нагрузку, и coordinated omission скрывает перегрузку.
+С ``--arrival-profile`` время ожидания пользователей заменяется
+планировщиком: каждый пользователь перед задачей занимает следующий слот
+общего расписания и спит до его наступления (первую задачу пользователь
+тоже ждет в конце ``on_start``, поэтому при старте ``-u`` пользователей
+не уходит пачка запросов вне расписания). Если все пользователи заняты,
+слоты не пропускаются, а стартуют с опозданием; разница между плановым и
+фактическим временем отправки добавляется к времени ответа, и исправленная
+задержка пишется в HDR-гистограмму под именем "<name> [CO-corrected]".
+Длительность каждой выполненной задачи (включая задачи, которые ничего не
+отправили, например, не подходящие по роли) пишется в "[arrival task]":
+число записей в ней - выполненные задачи, по ним capacity_search.py
+проверяет достигнутую интенсивность.
+
+Профили (интенсивность - задач в секунду на весь кластер; мастер делит
+ее поровну между подключенными воркерами):
+    constant:50                 - постоянная интенсивность
+    ramp:10:200:300             - линейно от 10 до 200 за 300 с
+    step:50@60,100@60,200@120   - ступени "интенсивность@длительность"
+    spike:50:500:120:10         - 50, а с 120-й секунды 10 с по 500
+    replay:rates.csv            - кривая из CSV "секунда,интенсивность"
+
+Пользователей должно хватать на пиковую интенсивность, умноженную на
+время ответа; иначе растет "[arrival lag]".
+"""
+import csv
+import logging
+import time
+
+import gevent
+from locust import events
+from locust.runners import MasterRunner, WorkerRunner
+
+import hdr_stats
+
+SHARE_MESSAGE = "arrival_share"
+TASK_HISTOGRAM = "[arrival task]"
+
+# Минимальная интенсивность, чтобы расписание не останавливалось навсегда
+MIN_RATE = 0.01
+
+
+class Schedule:
+    """Интенсивность как функция времени от начала теста"""
+
+    def rate(self, elapsed):
+        raise NotImplementedError
+
+
+class ConstantSchedule(Schedule):
+    def __init__(self, rate):
+        self._rate = rate
+
+    def rate(self, elapsed):
+        return self._rate
+
+
+class RampSchedule(Schedule):
+    def __init__(self, start, end, duration):
+        self.start = start
+        self.end = end
+        self.duration = duration
+
+    def rate(self, elapsed):
+        if elapsed >= self.duration:
+            return self.end
+        return self.start + (self.end - self.start) * elapsed / self.duration
+
+
+class StepSchedule(Schedule):
+    """Кусочно-постоянная интенсивность; после последней точки держится последнее значение"""
+
+    def __init__(self, points):
+        # points: список (начало интервала, интенсивность) по возрастанию времени
+        self.points = points
+
+    def rate(self, elapsed):
+        current = self.points[0][1]
+        for start, rate in self.points:
+            if start > elapsed:
+                break
+            current = rate
+        return current
+
+    @classmethod
+    def from_durations(cls, steps):
+        points, start = [], 0.0
+        for rate, duration in steps:
+            points.append((start, rate))
+            start += duration
+        return cls(points)
+
+
+class SpikeSchedule(Schedule):
+    def __init__(self, base, peak, at, duration):
+        self.base = base
+        self.peak = peak
+        self.at = at
+        self.duration = duration
+
+    def rate(self, elapsed):
+        return self.peak if self.at <= elapsed < self.at + self.duration else self.base
+
+
+def parse_profile(spec):
+    """Разбирает строку профиля из --arrival-profile"""
+    kind, _, args = spec.partition(":")
+    if kind == "constant":
+        return ConstantSchedule(float(args))
+    if kind == "ramp":
+        start, end, duration = (float(value) for value in args.split(":"))
+        return RampSchedule(start, end, duration)
+    if kind == "step":
+        steps = []
+        for item in args.split(","):
+            rate, _, duration = item.partition("@")
+            steps.append((float(rate), float(duration)))
+        return StepSchedule.from_durations(steps)
+    if kind == "spike":
+        base, peak, at, duration = (float(value) for value in args.split(":"))
+        return SpikeSchedule(base, peak, at, duration)
+    if kind == "replay":
+        with open(args, newline="") as f:
+            points = [(float(row[0]), float(row[1])) for row in csv.reader(f) if row and not row[0].startswith("#")]
+        return StepSchedule(sorted(points))
+    raise ValueError(f"Неизвестный профиль нагрузки: {spec}")
+
+
+class ArrivalScheduler:
+    """Общее для всех пользователей процесса расписание запусков задач"""
+
+    def __init__(self, schedule, share=1.0):
+        self.schedule = schedule
+        self.share = share
+        # Множитель интенсивности для автоматического снижения нагрузки (см. generator_health.py)
+        self.throttle = 1.0
+        self.started_at = None
+        self._next = None
+        self.late_starts = 0
+        self.max_lag = 0.0
+
+    def start(self):
+        self.started_at = self._next = time.time()
+        self.throttle = 1.0
+        self.late_starts = 0
+        self.max_lag = 0.0
+
+    def claim(self):
+        """Занимает следующий слот расписания и возвращает его плановое время"""
+        if self.started_at is None:
+            self.start()
+        intended = self._next
+        rate = max(MIN_RATE, self.schedule.rate(intended - self.started_at) * self.share * self.throttle)
+        self._next = intended + 1.0 / rate
+        return intended
+
+    def record_lag(self, lag):
+        if lag > 0.001:
+            self.late_starts += 1
+            self.max_lag = max(self.max_lag, lag)
+
+
+SCHEDULER = None
+
+
+def arrival_wait_time(user):
+    """Замена wait_time: спим до планового времени следующего слота"""
+    now = time.time()
+    task_started = getattr(user, "task_started", None)
+    if task_started is not None:
+        # wait_time вызывается после задачи, значит задача слота выполнена
+        hdr_stats.RECORDER.record(TASK_HISTOGRAM, (now - task_started) * 1000)
+    intended = SCHEDULER.claim()
+    user.intended_start = intended
+    user.task_started = max(intended, now)
+    return max(0.0, intended - now)
+
+
+def scheduled_start(on_start):
+    """Обертка on_start: после него пользователь ждет слот для своей первой задачи"""
+    def wrapper(user):
+        on_start(user)
+        # Locust вызывает wait_time только после задачи, поэтому первый слот занимаем здесь
+        gevent.sleep(arrival_wait_time(user))
+    return wrapper
+
+
+@events.init_command_line_parser.add_listener
+def _(parser):
+    parser.add_argument(
+        "--arrival-profile",
+        default="",
+        help="Профиль открытой модели нагрузки (constant:50, ramp:10:200:300, step:..., spike:..., replay:file.csv)",
+    )
+
+
+@events.init.add_listener
+def _(environment, **kwargs):
+    global SCHEDULER
+    options = environment.parsed_options
+    if options is None or not options.arrival_profile:
+        return
+    SCHEDULER = ArrivalScheduler(parse_profile(options.arrival_profile))
+    for user_class in environment.user_classes:
+        user_class.wait_time = arrival_wait_time
+        user_class.on_start = scheduled_start(user_class.on_start)
+    if isinstance(environment.runner, WorkerRunner):
+        def on_share(environment, msg, **kwargs):
+            SCHEDULER.share = msg.data
+
+        environment.runner.register_message(SHARE_MESSAGE, on_share)
+
+
+@events.test_start.add_listener
+def _(environment, **kwargs):
+    if SCHEDULER is None:
+        return
+    runner = environment.runner
+    if isinstance(runner, MasterRunner):
+        # Доля воркера отправляется до команды запуска пользователей, поэтому приходит раньше нее
+        share = 1.0 / max(1, runner.worker_count)
+        runner.send_message(SHARE_MESSAGE, share)
+        logging.info(f"Интенсивность профиля делится между {runner.worker_count} воркерами")
+    SCHEDULER.start()
+
+
+@events.request.add_listener
+def _(name, response_time, context, start_time=None, **kwargs):
+    if SCHEDULER is None or start_time is None or response_time is None:
+        return
+    intended = context.get("intended_start")
+    if intended is None:
+        return
+    lag = max(0.0, start_time - intended)
+    SCHEDULER.record_lag(lag)
+    hdr_stats.RECORDER.record("[arrival lag]", lag * 1000)
+    hdr_stats.RECORDER.record(f"{name} [CO-corrected]", response_time + lag * 1000)
+
+
+@events.test_stop.add_listener
+def _(environment, **kwargs):
+    if SCHEDULER is not None and SCHEDULER.late_starts:
+        logging.warning(
+            f"Задачи стартовали позже расписания {SCHEDULER.late_starts} раз, максимум на "
+            f"{SCHEDULER.max_lag * 1000:.0f} мс: пользователей не хватает для заданной интенсивности"
+        )
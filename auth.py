@@ -0,0 +1,25 @@
+"""
+Профили нагрузки на авторизацию English Gang.
+
+    locust -f auth.py --headless -u 200 -r 1 -t 5m --tags fresh
+    locust -f auth.py --headless -u 200 -r 1 -t 5m --tags reuse
+    locust -f auth.py --headless -u 50 -t 60s --tags invalid --auth-credentials accounts.csv
+"""
+from locust import HttpUser
+
+import generator_health  # noqa: F401 - самоконтроль генератора нагрузки
+import hdr_stats  # noqa: F401 - HDR-гистограммы по именам запросов
+import run_store  # noqa: F401 - сохранение итогов прогона (--run-store)
+import tracing  # noqa: F401 - X-Request-ID и traceparent (--trace)
+from auth_bench import AuthBenchUser
+from scenario_engine import load_scenario
+
+AUTH_BENCH_SCENARIO = load_scenario("auth_bench.yaml")
+
+
+class EnglishGangAuthUser(AuthBenchUser, HttpUser):
+    """Пользователь English Gang, нагружающий вход и /api/me по выбранному профилю"""
+
+    scenario = AUTH_BENCH_SCENARIO
+    tasks = AUTH_BENCH_SCENARIO.tasks
+    wait_time = AUTH_BENCH_SCENARIO.wait_time
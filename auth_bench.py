@@ -0,0 +1,423 @@
+"""
+Нагрузка на путь авторизации English Gang.
+
+Задача ``login_attempt`` из test2.py перебирает пять учетных записей и
+измеряет только время ``POST /api/token``, в котором основную часть
+занимает проверка хэша пароля на сервере. Здесь три сравнимых профиля,
+профиль выбирается тегом (``locust -f auth.py --tags fresh``):
+
+  * ``fresh`` - каждая итерация: вход и ``GET /api/me`` с новым токеном;
+  * ``reuse`` - пользователь входит один раз и использует токен до
+    истечения (``exp`` из JWT либо ``--token-ttl``), обновляя его за
+    ``--auth-refresh-margin`` секунд, но не раньше середины срока жизни
+    токена; итерация - только ``GET /api/me``;
+  * ``invalid`` - поток входов с неверным паролем или несуществующей
+    учетной записью (доля ``--auth-unknown-share``); ожидается 401,
+    ответ 429 считается срабатыванием ограничения частоты.
+
+Без ``--tags`` (или с несколькими тегами профилей) профили выполняются
+одними и теми же пользователями одновременно и друг на друга влияют,
+поэтому итоги такого прогона печатаются, но не сохраняются.
+
+Учетные записи берутся из ``--auth-credentials`` (CSV username,password
+как у ``--identity-file``), иначе из ``params.credentials`` сценария.
+
+Каждые ``--auth-window`` секунд замеряются запросы в секунду основного
+запроса профиля (вход, в reuse - ``/api/me``), их среднее время и число
+пользователей (с ``--auth-server-pid`` - еще и CPU процесса сервера).
+Точка насыщения - наименьшее число пользователей, при котором достигнуто
+95% пиковой пропускной способности: дальше растет только время ответа,
+что при входе характерно для упора в CPU на хэшировании пароля. Чтобы
+найти ее, пользователей нужно добавлять медленно (``-u 200 -r 1``). Итоги
+профиля печатаются и дописываются строкой в ``--auth-out``; если там есть
+прогон другого профиля из пары fresh/reuse с тем же хостом и числом
+пользователей, печатается прирост пропускной способности ``/api/me`` от
+повторного использования токена.
+"""
+import json
+import logging
+import random
+import time
+import uuid
+
+import gevent
+import psutil
+from locust import events
+from locust.runners import WorkerRunner
+
+from identities import read_accounts
+from response_json import parse
+from scenario_engine import ScenarioUser, action
+from token_pool import TOKEN_POOL, Credentials, token_expiry
+
+FRESH_LOGIN_NAME = "POST login [fresh]"
+FRESH_ME_NAME = "GET me [fresh]"
+REFRESH_LOGIN_NAME = "POST login [refresh]"
+REUSE_ME_NAME = "GET me [reuse]"
+INVALID_LOGIN_NAME = "POST login [invalid]"
+
+# Профиль -> (имя входа, имя /api/me или None)
+PROFILES = {
+    "fresh": (FRESH_LOGIN_NAME, FRESH_ME_NAME),
+    "reuse": (REFRESH_LOGIN_NAME, REUSE_ME_NAME),
+    "invalid": (INVALID_LOGIN_NAME, None),
+}
+# Запрос, по которому ищется точка насыщения профиля: в reuse входов почти нет
+SATURATION_REQUESTS = {
+    "fresh": (FRESH_LOGIN_NAME, "POST"),
+    "reuse": (REUSE_ME_NAME, "GET"),
+    "invalid": (INVALID_LOGIN_NAME, "POST"),
+}
+# Доля пиковой пропускной способности, с которой начинается насыщение
+SATURATION_SHARE = 0.95
+# Запас на обновление токена - не больше этой доли его срока жизни, иначе reuse входил бы на каждой итерации
+MAX_MARGIN_SHARE = 0.5
+RATE_LIMITED = 429
+
+CREDENTIALS = []
+REFRESH_MARGIN = 30.0
+UNKNOWN_SHARE = 0.5
+# Профили, выбранные тегами прогона; итоги сохраняются, только если он один
+ACTIVE_PROFILES = list(PROFILES)
+_margin_warned = False
+
+
+def corpus(endpoint):
+    return CREDENTIALS or endpoint.params["credentials"]
+
+
+def login(user, credentials, name):
+    """Вход под учетной записью; возвращает access_token или None"""
+    data = {"username": credentials["username"], "password": credentials["password"]}
+    with user.client.post("/api/token", data=data, name=name, catch_response=True) as response:
+        if response.status_code != 200:
+            response.failure(f"Ошибка авторизации: {response.status_code}, {response.text}")
+            return None
+        return parse(response)["access_token"]
+
+
+def refresh_margin(ttl):
+    """Запас обновления для токена, действующего еще ``ttl`` секунд"""
+    global _margin_warned
+    limit = MAX_MARGIN_SHARE * ttl
+    if REFRESH_MARGIN <= limit:
+        return REFRESH_MARGIN
+    if not _margin_warned:
+        _margin_warned = True
+        logging.warning(
+            f"--auth-refresh-margin {REFRESH_MARGIN:g} с больше половины срока жизни токена ({ttl:.0f} с): "
+            f"токен обновляется за {limit:.0f} с до истечения"
+        )
+    return limit
+
+
+@action("auth_fresh")
+def auth_fresh(user, endpoint):
+    """Новый вход и GET /api/me с полученным токеном на каждой итерации"""
+    account = random.choice(corpus(endpoint))
+    with endpoint.request(user, data={"username": account["username"], "password": account["password"]}) as response:
+        if not endpoint.check(response):
+            return
+        access_token = parse(response)["access_token"]
+    with user.client.get(
+        "/api/me", headers={"Authorization": f"Bearer {access_token}"}, name=FRESH_ME_NAME, catch_response=True
+    ) as response:
+        if response.status_code != 200:
+            response.failure(f"Ошибка получения профиля: {response.status_code}")
+
+
+@action("auth_reuse")
+def auth_reuse(user, endpoint):
+    """GET /api/me с токеном пользователя; вход только при отсутствии или истечении токена"""
+    if user.auth_credentials is None or time.time() >= user.auth_refresh_at:
+        account = user.auth_account = user.auth_account or random.choice(corpus(endpoint))
+        access_token = login(user, account, REFRESH_LOGIN_NAME)
+        if access_token is None:
+            return
+        expires_at = token_expiry(access_token, TOKEN_POOL.ttl)
+        user.auth_credentials = Credentials(account["username"], access_token, expires_at=expires_at)
+        user.auth_refresh_at = expires_at - refresh_margin(expires_at - time.time())
+    headers = {"Authorization": f"Bearer {user.auth_credentials.access_token}"}
+    with endpoint.request(user, headers=headers) as response:
+        if not endpoint.check(response):
+            # 401 до истечения срока: токен отозван, на следующей итерации войдем заново
+            user.auth_credentials = None
+
+
+@action("auth_invalid")
+def auth_invalid(user, endpoint):
+    """Вход с неверным паролем существующей учетной записи или с несуществующей учетной записью"""
+    if random.random() < UNKNOWN_SHARE:
+        data = {"username": f"nobody.{uuid.uuid4().hex[:12]}@example.com", "password": "wrongpassword"}
+    else:
+        account = random.choice(corpus(endpoint))
+        data = {"username": account["username"], "password": account["password"] + "-wrong"}
+    with endpoint.request(user, data=data) as response:
+        if response.status_code == RATE_LIMITED:
+            STATS.rate_limited += 1
+        endpoint.check(response)
+
+
+class AuthBenchUser(ScenarioUser):
+    """Пользователь профилей авторизации; учетная запись сценария при старте не нужна"""
+
+    abstract = True
+
+    # Учетная запись и токен профиля reuse
+    auth_account = None
+    auth_credentials = None
+    auth_refresh_at = 0.0
+
+
+class AuthStats:
+    """Окна пропускной способности входа по профилям и ответы 429"""
+
+    def __init__(self):
+        self.windows = {profile: [] for profile in PROFILES}
+        self.rate_limited = 0
+
+    def take(self):
+        rate_limited, self.rate_limited = self.rate_limited, 0
+        return rate_limited
+
+    def saturation(self, profile):
+        """Окно, в котором достигнута точка насыщения, и последнее окно профиля"""
+        windows = [window for window in self.windows[profile] if window["users"]]
+        if not windows:
+            return None, None
+        peak = max(window["rps"] for window in windows)
+        if not peak:
+            return None, None
+        knee = next(window for window in windows if window["rps"] >= SATURATION_SHARE * peak)
+        return knee, windows[-1]
+
+
+STATS = AuthStats()
+
+
+class ThroughputSampler:
+    """Периодический замер запросов в секунду по статистике (на мастере - по всем воркерам)"""
+
+    def __init__(self, environment, interval=5.0, server_pid=None):
+        self.environment = environment
+        self.interval = interval
+        self.server = None
+        if server_pid:
+            self.server = psutil.Process(server_pid)
+            self.server.cpu_percent()  # первый вызов только запоминает точку отсчета
+        self.previous = {}
+
+    def counters(self, name, method):
+        entry = self.environment.stats.entries.get((name, method))
+        return (entry.num_requests, entry.total_response_time) if entry is not None else (0, 0)
+
+    def sample(self):
+        server_cpu = self.server.cpu_percent() if self.server is not None else None
+        for profile, (name, method) in SATURATION_REQUESTS.items():
+            requests, total_time = self.counters(name, method)
+            previous_requests, previous_time = self.previous.get(name, (0, 0))
+            self.previous[name] = (requests, total_time)
+            count = requests - previous_requests
+            if not count:
+                continue
+            STATS.windows[profile].append({
+                "users": self.environment.runner.user_count,
+                "rps": count / self.interval,
+                "mean_ms": (total_time - previous_time) / count,
+                "server_cpu": server_cpu,
+            })
+
+    def run(self):
+        while True:
+            gevent.sleep(self.interval)
+            self.sample()
+
+
+def profile_result(environment, profile):
+    login_name, me_name = PROFILES[profile]
+    login_entry = environment.stats.entries.get((login_name, "POST"))
+    me_entry = environment.stats.entries.get((me_name, "GET")) if me_name else None
+    if not (login_entry and login_entry.num_requests) and not (me_entry and me_entry.num_requests):
+        return None
+    result = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "profile": profile,
+        "host": environment.host,
+        "users": environment.parsed_options.num_users,
+        "credentials": len(CREDENTIALS) or None,
+    }
+    if login_entry is not None and login_entry.num_requests:
+        result.update({
+            "logins": login_entry.num_requests,
+            "logins_per_second": round(login_entry.total_rps, 2),
+            "login_error_rate": round(login_entry.fail_ratio, 5),
+            "login_p50_ms": login_entry.get_response_time_percentile(0.5),
+            "login_p99_ms": login_entry.get_response_time_percentile(0.99),
+        })
+    if me_entry is not None and me_entry.num_requests:
+        result.update({
+            "me_per_second": round(me_entry.total_rps, 2),
+            "me_p50_ms": me_entry.get_response_time_percentile(0.5),
+            "me_p99_ms": me_entry.get_response_time_percentile(0.99),
+        })
+    knee, last = STATS.saturation(profile)
+    if knee is not None:
+        result.update({
+            "saturation_users": knee["users"],
+            "saturation_requests_per_second": round(knee["rps"], 2),
+            "saturation_mean_ms": round(knee["mean_ms"], 1),
+            "saturation_server_cpu": knee["server_cpu"],
+            "last_window_users": last["users"],
+            "last_window_mean_ms": round(last["mean_ms"], 1),
+        })
+    if profile == "invalid":
+        result["rate_limited"] = STATS.rate_limited
+    return result
+
+
+def describe(result):
+    text = f"Авторизация [{result['profile']}]: {result.get('logins', 0)} входов ({result.get('logins_per_second', 0)}/с"
+    if "login_p50_ms" in result:
+        text += f", p50/p99 {result['login_p50_ms']}/{result['login_p99_ms']} мс, ошибок {result['login_error_rate']:.2%}"
+    text += ")"
+    if "me_per_second" in result:
+        text += f"; /api/me {result['me_per_second']}/с, p50/p99 {result['me_p50_ms']}/{result['me_p99_ms']} мс"
+    if "saturation_users" in result:
+        text += (
+            f"; насыщение: {SATURATION_REQUESTS[result['profile']][0]} {result['saturation_requests_per_second']}/с "
+            f"при {result['saturation_users']} пользователях (среднее время {result['saturation_mean_ms']} мс"
+        )
+        if result["saturation_server_cpu"] is not None:
+            text += f", CPU сервера {result['saturation_server_cpu']:.0f}%"
+        text += (
+            f"), при {result['last_window_users']} пользователях среднее время {result['last_window_mean_ms']} мс"
+        )
+    if result.get("rate_limited"):
+        text += f"; ответов 429: {result['rate_limited']}"
+    return text
+
+
+def latest_results(path):
+    """Последний сохраненный результат каждого профиля"""
+    latest = {}
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                except ValueError:
+                    continue
+                latest[result.get("profile")] = result
+    except OSError:
+        pass
+    return latest
+
+
+def incomparable(fresh, reuse):
+    """Почему прогоны fresh и reuse нельзя сравнивать; None, если можно"""
+    for field, title in (("host", "хосты"), ("users", "числа пользователей")):
+        if fresh.get(field) != reuse.get(field):
+            return f"разные {title} ({fresh.get(field)} и {reuse.get(field)})"
+    if not fresh.get("me_per_second") or not reuse.get("me_per_second"):
+        return "нет запросов /api/me"
+    return None
+
+
+def reuse_gain(fresh, reuse):
+    """Во сколько раз /api/me быстрее с повторным использованием токена; None для несравнимых прогонов"""
+    if incomparable(fresh, reuse) is not None:
+        return None
+    return reuse["me_per_second"] / fresh["me_per_second"]
+
+
+_sampler = None
+
+
+@events.init_command_line_parser.add_listener
+def _(parser):
+    parser.add_argument("--auth-credentials", default="", help="CSV с учетными записями (username,password) для входа")
+    parser.add_argument("--auth-refresh-margin", type=float, default=30.0,
+                        help="За сколько секунд до истечения токена профиль reuse входит заново")
+    parser.add_argument("--auth-unknown-share", type=float, default=0.5,
+                        help="Доля несуществующих учетных записей в профиле invalid")
+    parser.add_argument("--auth-window", type=float, default=5.0, help="Окно замера входов в секунду, с")
+    parser.add_argument("--auth-server-pid", type=int, default=0,
+                        help="PID процесса сервера на этой машине для замера его CPU")
+    parser.add_argument("--auth-out", default="auth_results.jsonl", help="Файл, в который дописываются итоги профилей")
+
+
+@events.init.add_listener
+def _(environment, **kwargs):
+    global ACTIVE_PROFILES, CREDENTIALS, REFRESH_MARGIN, UNKNOWN_SHARE
+    options = environment.parsed_options
+    if options is None:
+        return
+    REFRESH_MARGIN = options.auth_refresh_margin
+    UNKNOWN_SHARE = options.auth_unknown_share
+    ACTIVE_PROFILES = [
+        profile for profile in PROFILES
+        if (not options.tags or profile in options.tags) and profile not in (options.exclude_tags or ())
+    ]
+    if len(ACTIVE_PROFILES) != 1 and not isinstance(environment.runner, WorkerRunner):
+        logging.warning(
+            f"Профили {', '.join(ACTIVE_PROFILES)} выполняются одновременно одними пользователями: "
+            f"итоги не будут сохранены в --auth-out; выберите один профиль через --tags"
+        )
+    if options.auth_credentials:
+        CREDENTIALS = read_accounts(options.auth_credentials)
+        logging.info(f"Загружено {len(CREDENTIALS)} учетных записей для профилей авторизации")
+
+
+@events.test_start.add_listener
+def _(environment, **kwargs):
+    global _sampler
+    if isinstance(environment.runner, WorkerRunner) or _sampler is not None:
+        return
+    options = environment.parsed_options
+    _sampler = ThroughputSampler(environment, interval=options.auth_window, server_pid=options.auth_server_pid or None)
+    gevent.spawn(_sampler.run)
+
+
+@events.report_to_master.add_listener
+def _(client_id, data):
+    if STATS.rate_limited:
+        data["auth_rate_limited"] = STATS.take()
+
+
+@events.worker_report.add_listener
+def _(client_id, data):
+    STATS.rate_limited += data.get("auth_rate_limited", 0)
+
+
+@events.quitting.add_listener
+def _(environment, **kwargs):
+    if isinstance(environment.runner, WorkerRunner) or _sampler is None:
+        return
+    results = {}
+    for profile in PROFILES:
+        result = profile_result(environment, profile)
+        if result is not None:
+            results[profile] = result
+            logging.info(describe(result))
+    if len(ACTIVE_PROFILES) != 1:
+        # Одновременные профили влияют друг на друга: такие итоги нельзя сравнивать с отдельными прогонами
+        return
+
+    path = environment.parsed_options.auth_out
+    previous = latest_results(path)
+    with open(path, "a", encoding="utf-8") as f:
+        for result in results.values():
+            f.write(json.dumps(result) + "\n")
+
+    fresh = results.get("fresh") or previous.get("fresh")
+    reuse = results.get("reuse") or previous.get("reuse")
+    if fresh is None or reuse is None or ("fresh" not in results and "reuse" not in results):
+        return
+    reason = incomparable(fresh, reuse)
+    if reason is not None:
+        logging.warning(f"Прирост от повторного использования токена не считается: {reason}")
+        return
+    logging.info(
+        f"Повторное использование токена: /api/me {reuse['me_per_second']}/с против {fresh['me_per_second']}/с "
+        f"с входом на каждой итерации (x{reuse_gain(fresh, reuse):.1f}; {reuse['users']} пользователей)"
+    )
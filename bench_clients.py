@@ -0,0 +1,147 @@
+"""
+Бенчмарк HTTP-клиентов Locust: HttpUser (python-requests) против FastHttpUser (geventhttpclient).
+
+Поднимает локальный стенд (mock_server.py) в отдельном процессе и по очереди гоняет
+обе реализации пользователей без пауз между задачами, каждую в своем
+процессе на одном ядре. Для каждой печатает:
+
+  * запросов в секунду на ядро воркера (запросы / процессорное время воркера);
+  * p50/p99 накладных расходов клиента: время ответа по данным Locust
+    минус время обработки на сервере из заголовка ``Server-Timing``.
+
+Пример:
+    python bench_clients.py --scenario test1 --users 50 --duration 20
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import mock_server
+
+BACKENDS = {
+    "test1": {
+        "requests": ("test1", "EnglishGangUserGETPUT"),
+        "fasthttp": ("test1_fast", "EnglishGangUserGETPUTFast"),
+    },
+    "test2": {
+        "requests": ("test2", "EnglishGangUserAllRequests"),
+        "fasthttp": ("test2_fast", "EnglishGangUserAllRequestsFast"),
+    },
+}
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def run_backend(module_name, class_name, host, users, duration, warmup):
+    """Прогон одной реализации пользователя; вызывается в отдельном процессе"""
+    # Locust делает monkey-patch gevent при импорте, поэтому импортируем его только здесь
+    import importlib
+
+    import gevent
+    from locust import constant, events
+    from locust.env import Environment
+
+    base = getattr(importlib.import_module(module_name), class_name)
+    user_class = type(class_name, (base,), {"wait_time": constant(0), "host": host})
+
+    overheads = []
+    measuring = [False]
+
+    def on_request(response_time, response, exception, **kwargs):
+        if not measuring[0] or exception is not None or response is None:
+            return
+        server_timing = response.headers.get("Server-Timing", "")
+        server_ms = float(server_timing.rpartition("dur=")[2] or 0.0)
+        overheads.append(response_time - server_ms)
+
+    events.request.add_listener(on_request)
+    env = Environment(user_classes=[user_class], events=events)
+    runner = env.create_local_runner()
+    runner.start(users, spawn_rate=users)
+    gevent.sleep(warmup)
+
+    env.stats.reset_all()
+    measuring[0] = True
+    cpu_started, wall_started = time.process_time(), time.perf_counter()
+    gevent.sleep(duration)
+    cpu_seconds, wall_seconds = time.process_time() - cpu_started, time.perf_counter() - wall_started
+    measuring[0] = False
+    num_requests = env.stats.total.num_requests
+    runner.quit()
+
+    overheads.sort()
+    return {
+        "user_class": class_name,
+        "requests": num_requests,
+        "rps": num_requests / wall_seconds,
+        "cpu_seconds": cpu_seconds,
+        "rps_per_core": num_requests / cpu_seconds if cpu_seconds else 0.0,
+        "overhead_p50_ms": percentile(overheads, 0.50),
+        "overhead_p99_ms": percentile(overheads, 0.99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение HttpUser и FastHttpUser на локальном стенде")
+    parser.add_argument("--scenario", choices=sorted(BACKENDS), default="test1")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=20.0, help="Длительность замера, с")
+    parser.add_argument("--warmup", type=float, default=3.0, help="Прогрев перед замером, с")
+    parser.add_argument("--json", action="store_true", help="Вывести результат в JSON")
+    parser.add_argument("--run-backend", help=argparse.SUPPRESS)
+    parser.add_argument("--host", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_backend:
+        module_name, class_name = BACKENDS[args.scenario][args.run_backend]
+        result = run_backend(module_name, class_name, args.host, args.users, args.duration, args.warmup)
+        print(json.dumps(result))
+        return
+
+    port = mock_server.free_port()
+    script = os.path.abspath(__file__)
+    server = mock_server.spawn(port)
+    try:
+        results = {}
+        for backend in ("requests", "fasthttp"):
+            # Каждый клиент в своем процессе: замер CPU не смешивается, а процесс занимает одно ядро
+            output = subprocess.run(
+                [
+                    sys.executable, script,
+                    "--scenario", args.scenario,
+                    "--run-backend", backend,
+                    "--host", f"http://127.0.0.1:{port}",
+                    "--users", str(args.users),
+                    "--duration", str(args.duration),
+                    "--warmup", str(args.warmup),
+                ],
+                cwd=os.path.dirname(script),
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            results[backend] = json.loads(output.strip().splitlines()[-1])
+    finally:
+        server.terminate()
+        server.wait()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'backend':<10} {'RPS':>9} {'CPU, s':>8} {'RPS/core':>10} {'p50, ms':>9} {'p99, ms':>9}")
+    for backend, r in results.items():
+        print(
+            f"{backend:<10} {r['rps']:>9.0f} {r['cpu_seconds']:>8.1f} {r['rps_per_core']:>10.0f}"
+            f" {r['overhead_p50_ms']:>9.2f} {r['overhead_p99_ms']:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
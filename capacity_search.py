@@ -0,0 +1,277 @@
+"""
+Поиск максимальной устойчивой интенсивности для набора задач.
+
+Для каждого набора тегов (``--tag-set get``, ``--tag-set get_auth,put``)
+запускается серия коротких headless-прогонов Locust в открытой модели
+(``--arrival-profile constant:RATE``, см. arrival_rate.py). Интенсивность
+удваивается до первого нарушения SLO, после чего граница уточняется
+бинарным поиском (``--search binary``) либо проходится с постоянным шагом
+(``--search step``). SLO проверяется для запроса ``--name`` (по умолчанию
+Aggregated): p99 с поправкой на coordinated omission из HDR-гистограмм,
+доля ошибок и достигнутая интенсивность: выполненных задач в секунду
+(гистограмма "[arrival task]" из arrival_rate.py) не меньше
+``--min-achieved`` от заданной (иначе не справился генератор или сервер
+сам ограничил пропускную способность). Считаются задачи, а не запросы:
+задачи, не подходящие пользователю по роли, тоже занимают слоты
+расписания, но запросов не отправляют. Прогон без запросов считается
+нарушением.
+
+Результат пишется в JSON (``--out``) и добавляется строкой в историю
+(``--history``), чтобы сравнивать емкость между прогонами:
+
+    python capacity_search.py -f test1.py -H http://127.0.0.1:8089 \\
+        --tag-set get --tag-set put --name "PUT update student" --p99-ms 300
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from locust.util.timespan import parse_timespan
+
+from arrival_rate import TASK_HISTOGRAM
+from hdr_stats import Histogram, read_histograms
+
+AGGREGATED = "Aggregated"
+CO_SUFFIX = " [CO-corrected]"
+
+
+class RunResult:
+    """Итоги одного прогона на фиксированной интенсивности"""
+
+    def __init__(self, rate, requests, failures, rps, p99, achieved=0.0, reason=None):
+        self.rate = rate
+        self.requests = requests
+        self.failures = failures
+        self.rps = rps
+        self.p99 = p99
+        # Выполненных задач в секунду
+        self.achieved = achieved
+        self.reason = reason
+
+    @property
+    def ok(self):
+        return self.reason is None
+
+    @property
+    def error_rate(self):
+        return self.failures / self.requests if self.requests else 0.0
+
+    def to_dict(self):
+        return {
+            "rate": self.rate,
+            "ok": self.ok,
+            "reason": self.reason,
+            "requests": self.requests,
+            "error_rate": round(self.error_rate, 5),
+            "rps": round(self.rps, 2),
+            "achieved": round(self.achieved, 2),
+            "p99_ms": round(self.p99, 2) if self.p99 is not None else None,
+        }
+
+
+def read_stats_row(path, name):
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            if row["Name"] == name:
+                return row
+    return None
+
+
+def executed_tasks(path):
+    """Число выполненных задач по гистограмме [arrival task]"""
+    if not os.path.exists(path):
+        return 0
+    histogram = read_histograms(path).get(TASK_HISTOGRAM)
+    return histogram.total if histogram is not None else 0
+
+
+def co_corrected_p99(path, name):
+    """p99 с поправкой на coordinated omission; для Aggregated - по всем именам"""
+    if not os.path.exists(path):
+        return None
+    histograms = read_histograms(path)
+    if name == AGGREGATED:
+        merged = None
+        for histogram_name, histogram in histograms.items():
+            if histogram_name.endswith(CO_SUFFIX):
+                if merged is None:
+                    merged = Histogram(histogram.digits)
+                merged.merge(histogram)
+        histogram = merged
+    else:
+        histogram = histograms.get(name + CO_SUFFIX) or histograms.get(name)
+    if histogram is None or not histogram.total:
+        return None
+    return histogram.value_at(0.99) / 1000
+
+
+class CapacitySearch:
+    """Серия прогонов Locust для одного набора тегов"""
+
+    def __init__(self, args, tags):
+        self.args = args
+        self.tags = tags
+        self.runs = []
+
+    def users_for(self, rate):
+        # Пользователей должно хватать на интенсивность * время ответа с запасом на паузы
+        return max(self.args.min_users, int(rate * self.args.user_seconds))
+
+    def run(self, rate):
+        args = self.args
+        with tempfile.TemporaryDirectory(prefix="capacity.") as work_dir:
+            prefix = os.path.join(work_dir, "run")
+            users = self.users_for(rate)
+            command = [
+                sys.executable, "-m", "locust", "-f", args.locustfile, "--headless", "--only-summary",
+                "-H", args.host, "-u", str(users), "-r", str(users), "-t", args.run_time,
+                "--arrival-profile", f"constant:{rate:g}", "--csv", prefix, "--hdr-prefix", prefix,
+            ]
+            if self.tags:
+                command += ["--tags", *self.tags]
+            command += args.locust_args
+            logging.info(f"[{','.join(self.tags) or 'все'}] {rate:g} задач/с, {users} пользователей")
+            completed = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+
+            row = read_stats_row(f"{prefix}_stats.csv", args.name) if os.path.exists(f"{prefix}_stats.csv") else None
+            if row is None:
+                tail = completed.stderr.strip().splitlines()[-3:]
+                result = RunResult(rate, 0, 0, 0.0, None, reason=f"нет статистики для '{args.name}': {' | '.join(tail)}")
+            elif not int(row["Request Count"]):
+                # Без запросов Locust пишет в перцентили "N/A"
+                result = RunResult(rate, 0, 0, 0.0, None, reason=f"нет запросов '{args.name}'")
+            else:
+                p99 = co_corrected_p99(f"{prefix}_hdr.bin", args.name)
+                if p99 is None:
+                    p99 = float(row["99%"])
+                achieved = executed_tasks(f"{prefix}_hdr.bin") / parse_timespan(args.run_time)
+                result = RunResult(
+                    rate, int(row["Request Count"]), int(row["Failure Count"]), float(row["Requests/s"]), p99,
+                    achieved,
+                )
+                result.reason = self.violation(result)
+        self.runs.append(result)
+        logging.info(
+            f"  p99 {result.p99 or 0:.1f} мс, ошибок {result.error_rate:.2%}, {result.rps:.1f} запросов/с, "
+            f"{result.achieved:.1f} задач/с"
+            + (f" - SLO нарушен: {result.reason}" if result.reason else "")
+        )
+        return result
+
+    def violation(self, result):
+        args = self.args
+        if result.p99 > args.p99_ms:
+            return f"p99 {result.p99:.1f} мс > {args.p99_ms:g} мс"
+        if result.error_rate > args.max_error_rate:
+            return f"ошибок {result.error_rate:.2%} > {args.max_error_rate:.2%}"
+        if result.achieved < args.min_achieved * result.rate:
+            return f"выполнено {result.achieved:.1f} задач/с < {args.min_achieved:.0%} от {result.rate:g} задач/с"
+        return None
+
+    def search(self):
+        args = self.args
+        good, bad = None, None
+        rate = args.start_rate
+        # Удваиваем интенсивность до первого нарушения
+        while rate <= args.max_rate:
+            if self.run(rate).ok:
+                good = rate
+                rate = rate * 2 if args.search == "binary" else rate + args.step
+            else:
+                bad = rate
+                break
+        if good is None or bad is None or args.search == "step":
+            return good
+
+        while bad - good > max(args.precision * good, args.min_step):
+            middle = round((good + bad) / 2, 2)
+            if self.run(middle).ok:
+                good = middle
+            else:
+                bad = middle
+        return good
+
+    def result(self, max_rate):
+        best = max((run for run in self.runs if run.ok and run.rate == max_rate), key=lambda run: run.rps, default=None)
+        return {
+            "tags": self.tags,
+            "max_rate": max_rate,
+            "max_rps": round(best.rps, 2) if best is not None else None,
+            "runs": [run.to_dict() for run in self.runs],
+        }
+
+
+def previous_result(history_path, key):
+    """Последний результат из истории для того же locustfile, запроса и набора тегов"""
+    if not os.path.exists(history_path):
+        return None
+    previous = None
+    with open(history_path, encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            for tag_set in record.get("tag_sets", ()):
+                if (record["locustfile"], record["name"], tuple(tag_set["tags"])) == key:
+                    previous = tag_set
+    return previous
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Поиск максимальной устойчивой интенсивности English Gang")
+    parser.add_argument("-f", "--locustfile", default="test2.py")
+    parser.add_argument("-H", "--host", required=True)
+    parser.add_argument("--tag-set", action="append", default=[],
+                        help="Теги через запятую; можно указать несколько раз. По умолчанию все задачи")
+    parser.add_argument("--name", default=AGGREGATED, help="Запрос, для которого проверяется SLO")
+    parser.add_argument("--p99-ms", type=float, default=500.0, help="Допустимый p99, мс")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="Допустимая доля ошибок")
+    parser.add_argument("--min-achieved", type=float, default=0.9,
+                        help="Минимальная доля заданной интенсивности, которую должны достичь выполненные задачи")
+    parser.add_argument("--search", choices=("binary", "step"), default="binary")
+    parser.add_argument("--start-rate", type=float, default=10.0, help="Начальная интенсивность, задач/с")
+    parser.add_argument("--max-rate", type=float, default=10000.0)
+    parser.add_argument("--step", type=float, default=10.0, help="Шаг для --search step, задач/с")
+    parser.add_argument("--precision", type=float, default=0.05, help="Относительная точность бинарного поиска")
+    parser.add_argument("--min-step", type=float, default=1.0, help="Минимальный шаг бинарного поиска, задач/с")
+    parser.add_argument("--run-time", default="30s", help="Длительность одного прогона")
+    parser.add_argument("--min-users", type=int, default=10)
+    parser.add_argument("--user-seconds", type=float, default=0.5,
+                        help="Пользователей на одну задачу/с (время ответа с запасом)")
+    parser.add_argument("--out", default="capacity.json", help="Результат поиска в JSON")
+    parser.add_argument("--history", default="capacity_history.jsonl", help="История результатов")
+    parser.add_argument("locust_args", nargs="*", help="Дополнительные аргументы Locust после --")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s", stream=sys.stdout)
+
+    tag_sets = [[tag for tag in tag_set.split(",") if tag] for tag_set in args.tag_set] or [[]]
+    record = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "locustfile": args.locustfile,
+        "host": args.host,
+        "name": args.name,
+        "slo": {"p99_ms": args.p99_ms, "max_error_rate": args.max_error_rate},
+        "tag_sets": [],
+    }
+    for tags in tag_sets:
+        search = CapacitySearch(args, tags)
+        result = search.result(search.search())
+        previous = previous_result(args.history, (args.locustfile, args.name, tuple(tags)))
+        change = ""
+        if previous is not None and previous["max_rate"] and result["max_rate"]:
+            change = f" (в прошлый раз {previous['max_rate']:g}, {result['max_rate'] / previous['max_rate'] - 1:+.1%})"
+        logging.info(f"[{','.join(tags) or 'все'}] максимальная устойчивая интенсивность: {result['max_rate']} задач/с{change}")
+        record["tag_sets"].append(result)
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(record, f, ensure_ascii=False, indent=2)
+    with open(args.history, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
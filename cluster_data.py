@@ -0,0 +1,172 @@
+"""
+Общие для кластера данные: id созданных сущностей и токены.
+
+В распределенном режиме каждый воркер сам авторизуется и видит только
+созданных им студентов и преподавателей. Этот модуль связывает воркеры
+через мастер сообщениями Locust (``runner.send_message``):
+
+  * воркер копит id, созданные ``register_student``/``create_teacher``, и
+    токены новых авторизаций и раз в ``--cluster-sync-interval`` секунд
+    отправляет их мастеру одной пачкой;
+  * мастер добавляет пачку в свою копию и рассылает ее остальным воркерам;
+  * воркер сразу после подключения запрашивает у мастера снимок
+    накопленного, и до его получения ``TOKEN_POOL`` не авторизуется сам:
+    пользователи, запущенные в начале теста, берут токены других воркеров.
+
+Полученные токены кладутся в ``TOKEN_POOL``, поэтому воркеры не повторяют
+чужие авторизации, а id доступны задачам чтения через
+``{created_student_id}``/``{created_teacher_id}`` в шаблонах путей.
+Без мастера (локальный запуск) id просто копятся в процессе.
+"""
+import logging
+import random
+from collections import deque
+
+import gevent
+from locust import events
+from locust.runners import MasterRunner, WorkerRunner
+
+from token_pool import TOKEN_POOL, Credentials
+
+# Сколько последних id каждого вида хранить
+MAX_IDS = 10000
+
+SYNC_MESSAGE = "cluster_data"
+HELLO_MESSAGE = "cluster_data_hello"
+
+
+class SharedData:
+    """Последние созданные id по видам сущностей и токены, ожидающие отправки"""
+
+    def __init__(self, max_ids=MAX_IDS):
+        self.max_ids = max_ids
+        # Очередь на отправку ведется только на воркере
+        self.publishing = False
+        self.ids = {}
+        self.tokens = {}
+        self._outbox_ids = {}
+        self._outbox_tokens = []
+
+    def _bucket(self, kind):
+        bucket = self.ids.get(kind)
+        if bucket is None:
+            bucket = self.ids[kind] = deque(maxlen=self.max_ids)
+        return bucket
+
+    def add_id(self, kind, entity_id, publish=True):
+        self._bucket(kind).append(entity_id)
+        if publish and self.publishing:
+            self._outbox_ids.setdefault(kind, []).append(entity_id)
+
+    def add_token(self, credentials, publish=True):
+        current = self.tokens.get(credentials["username"])
+        if current is None or current["expires_at"] < credentials["expires_at"]:
+            self.tokens[credentials["username"]] = credentials
+        if publish and self.publishing:
+            self._outbox_tokens.append(credentials)
+
+    def random_id(self, kind):
+        bucket = self.ids.get(kind)
+        return random.choice(bucket) if bucket else None
+
+    def merge(self, data, publish=False):
+        for kind, ids in data.get("ids", {}).items():
+            for entity_id in ids:
+                self.add_id(kind, entity_id, publish=publish)
+        for credentials in data.get("tokens", ()):
+            self.add_token(credentials, publish=publish)
+
+    def take_outbox(self):
+        """Забирает накопленное для отправки; None, если отправлять нечего"""
+        if not self._outbox_ids and not self._outbox_tokens:
+            return None
+        data = {"ids": self._outbox_ids, "tokens": self._outbox_tokens}
+        self._outbox_ids, self._outbox_tokens = {}, []
+        return data
+
+    def snapshot(self):
+        return {"ids": {kind: list(ids) for kind, ids in self.ids.items()}, "tokens": list(self.tokens.values())}
+
+
+SHARED = SharedData()
+
+
+def record_created(kind, entity_id):
+    """Запоминает id созданной сущности для задач чтения всего кластера"""
+    SHARED.add_id(kind, entity_id)
+
+
+def random_created(kind):
+    return SHARED.random_id(kind)
+
+
+def _apply_tokens(data):
+    for credentials in data.get("tokens", ()):
+        TOKEN_POOL.put(Credentials.from_dict(credentials))
+
+
+@events.init_command_line_parser.add_listener
+def _(parser):
+    parser.add_argument(
+        "--cluster-sync-interval",
+        type=float,
+        default=1.0,
+        help="Как часто воркер отправляет мастеру созданные id и новые токены, с",
+    )
+
+
+@events.init.add_listener
+def _(environment, **kwargs):
+    runner = environment.runner
+
+    if isinstance(runner, MasterRunner):
+        def on_sync(environment, msg, **kwargs):
+            SHARED.merge(msg.data)
+            # Пересылаем пачку всем воркерам; отправитель узнает свою по origin
+            runner.send_message(SYNC_MESSAGE, dict(msg.data, origin=msg.node_id))
+
+        def on_hello(environment, msg, **kwargs):
+            runner.send_message(SYNC_MESSAGE, dict(SHARED.snapshot(), origin=None), client_id=msg.node_id)
+
+        runner.register_message(SYNC_MESSAGE, on_sync)
+        runner.register_message(HELLO_MESSAGE, on_hello)
+
+    elif isinstance(runner, WorkerRunner):
+        def on_sync(environment, msg, **kwargs):
+            if msg.data.get("origin") == runner.client_id:
+                return
+            SHARED.merge(msg.data)
+            _apply_tokens(msg.data)
+            if msg.data.get("origin") is None:
+                # Снимок получен: дальше пул может авторизоваться сам
+                TOKEN_POOL.shared_ready.set()
+
+        runner.register_message(SYNC_MESSAGE, on_sync)
+        SHARED.publishing = True
+        # Снимок запрашивается при подключении, а не в test_start: к началу запуска пользователей
+        # токены других воркеров уже должны быть в пуле
+        TOKEN_POOL.shared_ready.clear()
+        runner.send_message(HELLO_MESSAGE)
+
+        @TOKEN_POOL.logged_in.add_listener
+        def _(credentials, **kwargs):
+            SHARED.add_token(credentials.to_dict())
+
+        def flush():
+            interval = environment.parsed_options.cluster_sync_interval if environment.parsed_options else 1.0
+            while True:
+                gevent.sleep(interval)
+                data = SHARED.take_outbox()
+                if data is not None:
+                    runner.send_message(SYNC_MESSAGE, data)
+
+        gevent.spawn(flush)
+
+
+@events.test_stop.add_listener
+def _(environment, **kwargs):
+    if isinstance(environment.runner, WorkerRunner):
+        return
+    counts = ", ".join(f"{kind}: {len(ids)}" for kind, ids in sorted(SHARED.ids.items()))
+    if counts:
+        logging.info(f"Созданные за тест id ({counts}), токенов в общем доступе: {len(SHARED.tokens)}")
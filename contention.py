@@ -0,0 +1,23 @@
+"""
+Конкурентная запись в горячих студентов English Gang.
+
+    locust -f contention.py --headless -u 50 -t 60s --hot-students 5
+"""
+from locust import HttpUser
+
+import generator_health  # noqa: F401 - самоконтроль генератора нагрузки
+import hdr_stats  # noqa: F401 - HDR-гистограммы по именам запросов
+import run_store  # noqa: F401 - сохранение итогов прогона (--run-store)
+import tracing  # noqa: F401 - X-Request-ID и traceparent (--trace)
+from scenario_engine import load_scenario
+from write_contention import ContentionUser
+
+WRITE_CONTENTION_SCENARIO = load_scenario("write_contention.yaml")
+
+
+class EnglishGangContentionUser(ContentionUser, HttpUser):
+    """Менеджер English Gang, обновляющий студентов из горячего набора"""
+
+    scenario = WRITE_CONTENTION_SCENARIO
+    tasks = WRITE_CONTENTION_SCENARIO.tasks
+    wait_time = WRITE_CONTENTION_SCENARIO.wait_time
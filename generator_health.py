@@ -0,0 +1,227 @@
+"""
+Самоконтроль генератора нагрузки.
+
+Каждые ``--health-interval`` секунд локальный раннер и каждый воркер
+снимают показатели своего процесса:
+
+  * загрузку CPU процесса, %;
+  * задержку цикла gevent - насколько позже запланированного проснулся
+    спящий greenlet (если цикл занят, растет и измеренное время ответа);
+  * число открытых TCP-сокетов;
+  * RSS процесса и RSS на одного пользователя.
+
+Задержка цикла пишется в HDR-гистограмму "[generator loop lag]", а все
+показатели - в ``<--csv>_generator.csv`` рядом со статистикой запросов
+(в распределенном режиме воркеры отправляют их мастеру). Генератор
+считается перегруженным, если CPU выше ``--health-cpu`` или задержка цикла
+выше ``--health-lag-ms``; такие интервалы отмечаются в CSV и в итогах
+теста, а с ``--health-fail`` прогон завершается с кодом 3. В открытой
+модели (``--arrival-profile``) с ``--health-throttle`` интенсивность
+автоматически снижается, пока генератор перегружен, и восстанавливается
+после.
+"""
+import csv
+import logging
+import os
+import time
+
+import gevent
+import psutil
+from locust import events
+from locust.runners import MasterRunner, WorkerRunner
+
+import arrival_rate
+import hdr_stats
+
+LAG_NAME = "[generator loop lag]"
+CSV_HEADER = ["Timestamp", "Node", "CPU, %", "Loop lag, ms", "Sockets", "RSS, MB", "Users", "RSS per user, KB",
+              "Saturated", "Throttle"]
+
+# Шаги автоматического снижения и восстановления интенсивности
+THROTTLE_DOWN = 0.9
+THROTTLE_UP = 1.05
+MIN_THROTTLE = 0.1
+
+
+class HealthSample:
+    __slots__ = ("timestamp", "node", "cpu", "lag_ms", "sockets", "rss", "users", "saturated", "throttle")
+
+    def __init__(self, timestamp, node, cpu, lag_ms, sockets, rss, users, saturated, throttle):
+        self.timestamp = timestamp
+        self.node = node
+        self.cpu = cpu
+        self.lag_ms = lag_ms
+        self.sockets = sockets
+        self.rss = rss
+        self.users = users
+        self.saturated = saturated
+        self.throttle = throttle
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def row(self):
+        per_user = self.rss / self.users / 1024 if self.users else 0
+        return [
+            int(self.timestamp), self.node, f"{self.cpu:.1f}", f"{self.lag_ms:.1f}", self.sockets,
+            f"{self.rss / 2 ** 20:.1f}", self.users, f"{per_user:.1f}", int(self.saturated), f"{self.throttle:.2f}",
+        ]
+
+
+class HealthLog:
+    """Итоги и CSV-выгрузка показателей всех узлов"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.samples = 0
+        self.saturated = 0
+        self.max_cpu = 0.0
+        self.max_lag_ms = 0.0
+        self.min_throttle = 1.0
+        self._header_written = path is not None and os.path.exists(path)
+
+    def add(self, sample):
+        self.samples += 1
+        self.saturated += sample.saturated
+        self.max_cpu = max(self.max_cpu, sample.cpu)
+        self.max_lag_ms = max(self.max_lag_ms, sample.lag_ms)
+        self.min_throttle = min(self.min_throttle, sample.throttle)
+        if self.path is None:
+            return
+        with open(self.path, "a", newline="") as f:
+            writer = csv.writer(f)
+            if not self._header_written:
+                writer.writerow(CSV_HEADER)
+                self._header_written = True
+            writer.writerow(sample.row())
+
+
+class HealthMonitor:
+    """Периодический замер показателей процесса генератора"""
+
+    def __init__(self, environment, interval=1.0, cpu_threshold=90.0, lag_threshold_ms=50.0, throttle=False):
+        self.environment = environment
+        self.interval = interval
+        self.cpu_threshold = cpu_threshold
+        self.lag_threshold_ms = lag_threshold_ms
+        self.throttle = throttle
+        self.process = psutil.Process()
+        self.pending = []
+
+    def node(self):
+        runner = self.environment.runner
+        return f"worker-{runner.worker_index}" if isinstance(runner, WorkerRunner) else "local"
+
+    def sockets(self):
+        # net_connections появился в psutil 6.0, а Locust допускает psutil >= 5.9.1
+        connections = getattr(self.process, "net_connections", None) or self.process.connections
+        try:
+            return len(connections(kind="tcp"))
+        except (psutil.Error, OSError):
+            return 0
+
+    def adjust_throttle(self, saturated):
+        scheduler = arrival_rate.SCHEDULER
+        if scheduler is None or not self.throttle:
+            return 1.0
+        if saturated:
+            scheduler.throttle = max(MIN_THROTTLE, scheduler.throttle * THROTTLE_DOWN)
+        elif scheduler.throttle < 1.0:
+            scheduler.throttle = min(1.0, scheduler.throttle * THROTTLE_UP)
+        return scheduler.throttle
+
+    def measure(self, lag_ms):
+        cpu = self.process.cpu_percent()
+        saturated = cpu >= self.cpu_threshold or lag_ms >= self.lag_threshold_ms
+        return HealthSample(
+            time.time(), self.node(), cpu, lag_ms, self.sockets(), self.process.memory_info().rss,
+            self.environment.runner.user_count, saturated, self.adjust_throttle(saturated),
+        )
+
+    def run(self):
+        self.process.cpu_percent()  # первый вызов только запоминает точку отсчета
+        while True:
+            started = time.perf_counter()
+            gevent.sleep(self.interval)
+            lag_ms = max(0.0, (time.perf_counter() - started - self.interval) * 1000)
+            hdr_stats.RECORDER.record(LAG_NAME, lag_ms)
+            sample = self.measure(lag_ms)
+            if isinstance(self.environment.runner, WorkerRunner):
+                self.pending.append(sample.to_dict())
+            else:
+                HEALTH_LOG.add(sample)
+            if sample.saturated:
+                logging.warning(
+                    f"Генератор перегружен: CPU {sample.cpu:.0f}%, задержка цикла gevent {lag_ms:.0f} мс"
+                    + (f", интенсивность снижена до {sample.throttle:.0%}" if sample.throttle < 1.0 else "")
+                )
+
+
+HEALTH_LOG = HealthLog()
+_monitor = None
+
+
+@events.init_command_line_parser.add_listener
+def _(parser):
+    parser.add_argument("--health-interval", type=float, default=1.0, help="Интервал замера показателей генератора, с")
+    parser.add_argument("--health-cpu", type=float, default=90.0,
+                        help="Загрузка CPU процесса, %%, выше которой генератор считается перегруженным")
+    parser.add_argument("--health-lag-ms", type=float, default=50.0,
+                        help="Задержка цикла gevent, мс, выше которой генератор считается перегруженным")
+    parser.add_argument("--health-fail", action="store_true", default=False,
+                        help="Завершать прогон с кодом 3, если генератор был перегружен")
+    parser.add_argument("--health-throttle", action="store_true", default=False,
+                        help="Снижать интенсивность --arrival-profile, пока генератор перегружен")
+
+
+@events.init.add_listener
+def _(environment, **kwargs):
+    global HEALTH_LOG, _monitor
+    options = environment.parsed_options
+    if options is None:
+        return
+    if not isinstance(environment.runner, WorkerRunner) and options.csv_prefix:
+        HEALTH_LOG = HealthLog(f"{options.csv_prefix}_generator.csv")
+    if not isinstance(environment.runner, MasterRunner):
+        _monitor = HealthMonitor(
+            environment,
+            interval=options.health_interval,
+            cpu_threshold=options.health_cpu,
+            lag_threshold_ms=options.health_lag_ms,
+            throttle=options.health_throttle,
+        )
+        gevent.spawn(_monitor.run)
+
+
+@events.report_to_master.add_listener
+def _(client_id, data):
+    if _monitor is not None and _monitor.pending:
+        data["generator_health"], _monitor.pending = _monitor.pending, []
+
+
+@events.worker_report.add_listener
+def _(client_id, data):
+    for sample in data.get("generator_health", ()):
+        HEALTH_LOG.add(HealthSample.from_dict(sample))
+
+
+@events.quitting.add_listener
+def _(environment, **kwargs):
+    if isinstance(environment.runner, WorkerRunner) or not HEALTH_LOG.samples:
+        return
+    summary = (
+        f"максимум CPU {HEALTH_LOG.max_cpu:.0f}%, максимум задержки цикла {HEALTH_LOG.max_lag_ms:.0f} мс, "
+        f"перегружен в {HEALTH_LOG.saturated} из {HEALTH_LOG.samples} замеров"
+    )
+    if HEALTH_LOG.min_throttle < 1.0:
+        summary += f", интенсивность снижалась до {HEALTH_LOG.min_throttle:.0%}"
+    if not HEALTH_LOG.saturated:
+        logging.info(f"Генератор: {summary}")
+        return
+    logging.warning(f"Генератор: {summary}. Задержки в этих интервалах могут быть вызваны самим генератором")
+    if environment.parsed_options is not None and environment.parsed_options.health_fail:
+        environment.process_exit_code = 3
@@ -0,0 +1,344 @@
+"""
+HDR-гистограммы времени ответа по именам запросов.
+
+Стандартные бакеты Locust округляют время ответа и скрывают хвосты на
+p99.9, где и нарушаются наши SLO. Этот модуль ведет для каждого имени
+запроса ("GET public teachers", "PUT update student", "POST login" и т.д.)
+лог-линейную гистограмму с заданным числом значащих цифр. Гистограммы
+разрежены (словарь бакет -> счетчик), поэтому занимают мало памяти,
+складываются между воркерами и передаются мастеру в компактном бинарном виде.
+
+С ``--hdr-prefix PREFIX`` мастер (или локальный раннер) каждые
+``--hdr-interval`` секунд и в конце прогона пишет:
+
+  * ``PREFIX_hdr.bin`` - накопленные гистограммы в бинарном формате;
+  * ``PREFIX_hdr.csv`` - накопленные перцентили по именам;
+  * ``PREFIX_hdr_history.csv`` - перцентили за каждый интервал.
+
+Сравнение прогонов:
+    python hdr_stats.py baseline_hdr.bin current_hdr.bin
+"""
+import argparse
+import csv
+import os
+import struct
+import time
+import zlib
+
+import gevent
+from locust import events
+from locust.runners import WorkerRunner
+
+MAGIC = b"EGH1"
+PERCENTILES = (0.5, 0.9, 0.99, 0.999, 0.9999)
+
+
+def _write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, pos):
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+class Histogram:
+    """
+    Разреженная лог-линейная гистограмма значений в микросекундах.
+
+    Значения до ``2 * 10**digits`` хранятся точно, дальше ширина бакета
+    удваивается с каждой октавой, так что относительная погрешность не
+    превышает ``10**-digits``.
+    """
+
+    __slots__ = ("digits", "sub_bits", "half", "counts", "total", "min", "max")
+
+    def __init__(self, digits=3):
+        self.digits = digits
+        self.sub_bits = (2 * 10 ** digits - 1).bit_length()
+        self.half = 1 << (self.sub_bits - 1)
+        self.counts = {}
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def _index(self, value):
+        shift = value.bit_length() - self.sub_bits
+        if shift <= 0:
+            return value
+        return shift * self.half + (value >> shift)
+
+    def _highest_value(self, index):
+        if index < 2 * self.half:
+            return index
+        shift = index // self.half - 1
+        return ((index - shift * self.half + 1) << shift) - 1
+
+    def record(self, value, count=1):
+        value = int(value)
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.total += count
+        if self.min is None or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        counts = self.counts
+        for index, count in other.counts.items():
+            counts[index] = counts.get(index, 0) + count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        self.max = max(self.max, other.max)
+
+    def percentiles(self, fractions=PERCENTILES):
+        """Значения для нескольких перцентилей за один проход по бакетам"""
+        result = {}
+        if not self.total:
+            return {fraction: 0 for fraction in fractions}
+        pending = sorted(fractions)
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            while pending and seen >= pending[0] * self.total:
+                result[pending.pop(0)] = min(self._highest_value(index), self.max)
+            if not pending:
+                break
+        for fraction in pending:
+            result[fraction] = self.max
+        return result
+
+    def value_at(self, fraction):
+        return self.percentiles((fraction,))[fraction]
+
+    def items(self):
+        """Пары (значение, количество) по возрастанию значений"""
+        for index in sorted(self.counts):
+            yield min(self._highest_value(index), self.max), self.counts[index]
+
+    def encode(self):
+        """Компактное представление: дельты индексов и счетчики в varint, сжатые zlib"""
+        out = bytearray()
+        _write_varint(out, self.digits)
+        _write_varint(out, self.min or 0)
+        _write_varint(out, self.max)
+        previous = 0
+        for index in sorted(self.counts):
+            _write_varint(out, index - previous)
+            _write_varint(out, self.counts[index])
+            previous = index
+        return zlib.compress(bytes(out))
+
+    @classmethod
+    def decode(cls, payload):
+        data = zlib.decompress(payload)
+        digits, pos = _read_varint(data, 0)
+        histogram = cls(digits)
+        histogram.min, pos = _read_varint(data, pos)
+        histogram.max, pos = _read_varint(data, pos)
+        index = 0
+        while pos < len(data):
+            delta, pos = _read_varint(data, pos)
+            count, pos = _read_varint(data, pos)
+            index += delta
+            histogram.counts[index] = count
+            histogram.total += count
+        if not histogram.total:
+            histogram.min = None
+        return histogram
+
+
+def encode_histograms(histograms):
+    out = bytearray(MAGIC)
+    for name, histogram in sorted(histograms.items()):
+        encoded_name = name.encode()
+        payload = histogram.encode()
+        out += struct.pack("<HI", len(encoded_name), len(payload)) + encoded_name + payload
+    return bytes(out)
+
+
+def decode_histograms(data):
+    if data[:4] != MAGIC:
+        raise ValueError("Неизвестный формат файла гистограмм")
+    histograms = {}
+    pos = 4
+    while pos < len(data):
+        name_length, payload_length = struct.unpack_from("<HI", data, pos)
+        pos += 6
+        name = data[pos:pos + name_length].decode()
+        pos += name_length
+        histograms[name] = Histogram.decode(data[pos:pos + payload_length])
+        pos += payload_length
+    return histograms
+
+
+def read_histograms(path):
+    with open(path, "rb") as f:
+        return decode_histograms(f.read())
+
+
+class HdrRecorder:
+    """Гистограммы за текущий интервал и накопленные за весь прогон"""
+
+    def __init__(self, digits=3):
+        self.digits = digits
+        self.interval = {}
+        self.total = {}
+
+    def record(self, name, response_time_ms):
+        histogram = self.interval.get(name)
+        if histogram is None:
+            histogram = self.interval[name] = Histogram(self.digits)
+        histogram.record(response_time_ms * 1000)
+
+    def merge(self, histograms):
+        for name, histogram in histograms.items():
+            current = self.interval.get(name)
+            if current is None:
+                self.interval[name] = histogram
+            else:
+                current.merge(histogram)
+
+    def take_interval(self):
+        """Забирает гистограммы интервала, добавляя их к накопленным"""
+        interval, self.interval = self.interval, {}
+        for name, histogram in interval.items():
+            total = self.total.get(name)
+            if total is None:
+                total = self.total[name] = Histogram(histogram.digits)
+            total.merge(histogram)
+        return interval
+
+    def reset(self):
+        self.interval.clear()
+        self.total.clear()
+
+
+def percentile_row(name, histogram):
+    values = histogram.percentiles()
+    return [name, histogram.total, f"{(histogram.min or 0) / 1000:.3f}"] + [
+        f"{values[fraction] / 1000:.3f}" for fraction in PERCENTILES
+    ] + [f"{histogram.max / 1000:.3f}"]
+
+
+CSV_HEADER = ["Name", "Count", "Min, ms"] + [f"p{fraction * 100:g}, ms" for fraction in PERCENTILES] + ["Max, ms"]
+
+
+class HdrExporter:
+    """Периодическая и финальная выгрузка гистограмм в файлы"""
+
+    def __init__(self, recorder, prefix):
+        self.recorder = recorder
+        self.prefix = prefix
+        self._history_header_written = os.path.exists(f"{prefix}_hdr_history.csv")
+
+    def export(self):
+        interval = self.recorder.take_interval()
+        timestamp = int(time.time())
+        with open(f"{self.prefix}_hdr_history.csv", "a", newline="") as f:
+            writer = csv.writer(f)
+            if not self._history_header_written:
+                writer.writerow(["Timestamp"] + CSV_HEADER)
+                self._history_header_written = True
+            for name, histogram in sorted(interval.items()):
+                writer.writerow([timestamp] + percentile_row(name, histogram))
+
+        with open(f"{self.prefix}_hdr.csv", "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_HEADER)
+            for name, histogram in sorted(self.recorder.total.items()):
+                writer.writerow(percentile_row(name, histogram))
+        with open(f"{self.prefix}_hdr.bin", "wb") as f:
+            f.write(encode_histograms(self.recorder.total))
+
+    def run(self, interval):
+        while True:
+            gevent.sleep(interval)
+            self.export()
+
+
+RECORDER = HdrRecorder()
+_exporter = None
+
+
+@events.init_command_line_parser.add_listener
+def _(parser):
+    parser.add_argument("--hdr-prefix", default="", help="Префикс файлов HDR-гистограмм; пусто - не выгружать")
+    parser.add_argument("--hdr-interval", type=float, default=10.0, help="Интервал выгрузки HDR-гистограмм, с")
+    parser.add_argument("--hdr-digits", type=int, default=3, help="Число значащих цифр HDR-гистограмм")
+
+
+@events.init.add_listener
+def _(environment, **kwargs):
+    global _exporter
+    options = environment.parsed_options
+    if options is None:
+        return
+    RECORDER.digits = options.hdr_digits
+    if options.hdr_prefix and not isinstance(environment.runner, WorkerRunner):
+        _exporter = HdrExporter(RECORDER, options.hdr_prefix)
+        gevent.spawn(_exporter.run, options.hdr_interval)
+
+
+@events.request.add_listener
+def _(name, response_time, **kwargs):
+    if response_time is not None:
+        RECORDER.record(name, response_time)
+
+
+@events.report_to_master.add_listener
+def _(client_id, data):
+    interval, RECORDER.interval = RECORDER.interval, {}
+    if interval:
+        data["hdr_histograms"] = encode_histograms(interval)
+
+
+@events.worker_report.add_listener
+def _(client_id, data):
+    if "hdr_histograms" in data:
+        RECORDER.merge(decode_histograms(data["hdr_histograms"]))
+
+
+@events.reset_stats.add_listener
+def _():
+    RECORDER.reset()
+
+
+@events.quitting.add_listener
+def _(environment, **kwargs):
+    if _exporter is not None:
+        _exporter.export()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение перцентилей HDR-гистограмм двух прогонов")
+    parser.add_argument("files", nargs="+", help="Файлы *_hdr.bin; первый считается базовым")
+    args = parser.parse_args()
+
+    runs = [read_histograms(path) for path in args.files]
+    names = sorted(set().union(*runs))
+    labels = [f"p{fraction * 100:g}" for fraction in PERCENTILES] + ["max"]
+    print(f"{'Name':<32} {'Run':<4} {'Count':>9} " + " ".join(f"{label:>10}" for label in labels))
+    for name in names:
+        for number, run in enumerate(runs):
+            histogram = run.get(name)
+            if histogram is None:
+                continue
+            values = histogram.percentiles()
+            cells = [values[fraction] / 1000 for fraction in PERCENTILES] + [histogram.max / 1000]
+            print(f"{name[:32]:<32} {number:<4} {histogram.total:>9} " + " ".join(f"{cell:>10.2f}" for cell in cells))
+
+
+if __name__ == "__main__":
+    main()
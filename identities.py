@@ -0,0 +1,189 @@
+"""
+Раздача учетных записей пользователям Locust.
+
+По умолчанию все студенты входят как alice@example.com, а менеджеры как
+admin@example.com, и все PUT /api/students/{id} приходятся на одну строку.
+С ``--identity-file`` учетные записи берутся из CSV (например,
+``accounts.csv`` из seed_data.py, колонки ``username,password,role``):
+роль по-прежнему выбирается по весам ``accounts`` сценария, а конкретная
+запись этой роли - из файла. Если записей нужной роли в файле нет,
+используется запись из сценария.
+
+Распределение задается ``--identity-skew``:
+    unique              - каждому пользователю своя запись (по умолчанию);
+    zipf:1.1            - запись с рангом k выбирается с вероятностью ~ 1/k^s;
+    hotcold:0.2:0.8     - на 20% "горячих" записей приходится 80% пользователей.
+
+В распределенном режиме мастер в начале теста сообщает воркерам число
+подключенных воркеров, и записи делятся между ними по позиции в файле,
+так что воркеры не пересекаются.
+"""
+import bisect
+import csv
+import logging
+import random
+from collections import deque
+
+from locust import events
+from locust.runners import MasterRunner, WorkerRunner
+
+SHARD_MESSAGE = "identity_shard"
+
+
+def read_accounts(path):
+    """Читает учетные записи из CSV; без колонки role записи считаются студенческими"""
+    with open(path, newline="", encoding="utf-8") as f:
+        return [
+            {"username": row["username"], "password": row["password"], "role": row.get("role") or "student"}
+            for row in csv.DictReader(f)
+        ]
+
+
+class UniqueAssignment:
+    """Каждому пользователю своя запись; освобожденные записи выдаются повторно"""
+
+    def __init__(self, accounts):
+        self.accounts = accounts
+        self.free = deque(range(len(accounts)))
+        self.shared = 0
+
+    def assign(self):
+        if self.free:
+            return self.free.popleft()
+        # Пользователей больше, чем записей: повторы неизбежны
+        self.shared += 1
+        return random.randrange(len(self.accounts))
+
+    def release(self, index):
+        self.free.append(index)
+
+
+class WeightedAssignment:
+    """Запись выбирается по заранее вычисленным накопленным весам рангов"""
+
+    shared = 0
+
+    def __init__(self, accounts, weights):
+        self.accounts = accounts
+        self.cumulative = []
+        total = 0.0
+        for weight in weights:
+            total += weight
+            self.cumulative.append(total)
+
+    def assign(self):
+        return bisect.bisect_right(self.cumulative, random.random() * self.cumulative[-1])
+
+    def release(self, index):
+        pass
+
+
+def zipf_weights(count, exponent):
+    return [1.0 / rank ** exponent for rank in range(1, count + 1)]
+
+
+def hot_cold_weights(count, hot_fraction, hot_share):
+    hot = max(1, min(count, round(count * hot_fraction)))
+    cold = count - hot
+    if not cold:
+        return [1.0] * count
+    return [hot_share / hot] * hot + [(1 - hot_share) / cold] * cold
+
+
+def make_assignment(accounts, skew):
+    kind, _, args = skew.partition(":")
+    if kind == "unique":
+        return UniqueAssignment(accounts)
+    if kind == "zipf":
+        return WeightedAssignment(accounts, zipf_weights(len(accounts), float(args or 1.0)))
+    if kind == "hotcold":
+        hot_fraction, hot_share = (float(value) for value in args.split(":"))
+        return WeightedAssignment(accounts, hot_cold_weights(len(accounts), hot_fraction, hot_share))
+    raise ValueError(f"Неизвестное распределение учетных записей: {skew}")
+
+
+class IdentityProvider:
+    """Учетные записи из файла, сгруппированные по ролям"""
+
+    def __init__(self, accounts, skew="unique"):
+        self.all_accounts = accounts
+        self.skew = skew
+        self.roles = {}
+        self.used = set()
+        self.shard(0, 1)
+
+    def shard(self, worker_index, worker_count):
+        """Оставляет записи этого воркера: каждую worker_count-ю, начиная с worker_index"""
+        by_role = {}
+        for account in self.all_accounts:
+            by_role.setdefault(account["role"], []).append(account)
+        self.roles = {
+            role: make_assignment(accounts[worker_index::worker_count], self.skew)
+            for role, accounts in by_role.items()
+            if accounts[worker_index::worker_count]
+        }
+        self.used = set()
+
+    def acquire(self, role):
+        """Возвращает (учетная запись, ключ для release) или None, если записей такой роли нет"""
+        assignment = self.roles.get(role)
+        if assignment is None:
+            return None
+        index = assignment.assign()
+        self.used.add((role, index))
+        return assignment.accounts[index], (role, index)
+
+    def release(self, key):
+        role, index = key
+        self.roles[role].release(index)
+
+    def summary(self):
+        shared = sum(assignment.shared for assignment in self.roles.values())
+        total = sum(len(assignment.accounts) for assignment in self.roles.values())
+        return f"использовано {len(self.used)} из {total} учетных записей, выдано повторно {shared}"
+
+
+IDENTITIES = None
+
+
+@events.init_command_line_parser.add_listener
+def _(parser):
+    parser.add_argument(
+        "--identity-file",
+        default="",
+        help="CSV с учетными записями (username,password,role), например accounts.csv из seed_data.py",
+    )
+    parser.add_argument(
+        "--identity-skew",
+        default="unique",
+        help="Распределение учетных записей по пользователям: unique, zipf:S или hotcold:ДОЛЯ:НАГРУЗКА",
+    )
+
+
+@events.init.add_listener
+def _(environment, **kwargs):
+    global IDENTITIES
+    options = environment.parsed_options
+    if options is None or not options.identity_file or isinstance(environment.runner, MasterRunner):
+        return
+    IDENTITIES = IdentityProvider(read_accounts(options.identity_file), skew=options.identity_skew)
+    logging.info(f"Загружено {len(IDENTITIES.all_accounts)} учетных записей из {options.identity_file}")
+    if isinstance(environment.runner, WorkerRunner):
+        def on_shard(environment, msg, **kwargs):
+            IDENTITIES.shard(environment.runner.worker_index, msg.data)
+
+        environment.runner.register_message(SHARD_MESSAGE, on_shard)
+
+
+@events.test_start.add_listener
+def _(environment, **kwargs):
+    runner = environment.runner
+    if isinstance(runner, MasterRunner) and environment.parsed_options.identity_file:
+        # Как и доля интенсивности в arrival_rate.py, приходит воркерам раньше команды запуска
+        runner.send_message(SHARD_MESSAGE, max(1, runner.worker_count))
+
+
+@events.test_stop.add_listener
+def _(environment, **kwargs):
+    if IDENTITIES is not None:
+        logging.info(f"Учетные записи: {IDENTITIES.summary()}")
@@ -0,0 +1,25 @@
+"""
+Пользователи English Gang, проходящие маршруты из scenarios/journeys.yaml.
+
+    locust -f journey.py
+"""
+from locust import HttpUser
+
+import arrival_rate  # noqa: F401 - открытая модель нагрузки (--arrival-profile)
+import generator_health  # noqa: F401 - самоконтроль генератора нагрузки
+import hdr_stats  # noqa: F401 - HDR-гистограммы по именам запросов
+import run_store  # noqa: F401 - сохранение итогов прогона (--run-store)
+import timing_breakdown  # noqa: F401 - фазы запросов (--timing-breakdown)
+import tracing  # noqa: F401 - X-Request-ID и traceparent (--trace)
+from journeys import JourneyTaskSet
+from scenario_engine import ScenarioUser, load_scenario
+
+JOURNEY_SCENARIO = load_scenario("journeys.yaml")
+
+
+class EnglishGangJourneyUser(ScenarioUser, HttpUser):
+    """Пользователь English Gang, переходящий между страницами и API по цепи Маркова"""
+
+    scenario = JOURNEY_SCENARIO
+    tasks = [JourneyTaskSet]
+    wait_time = JOURNEY_SCENARIO.wait_time
@@ -0,0 +1,200 @@
+"""
+Пользовательские маршруты English Gang как цепи Маркова.
+
+Вместо независимого выбора задач пользователь проходит маршрут:
+состояния - задачи таблицы сценария (``visit_homepage``,
+``visit_courses_page``, ``login_attempt``, ``get_profile_info`` ...), а
+переходы выбираются с заданными вероятностями до состояния ``end``.
+Маршруты описываются в разделе ``journeys`` таблицы сценария:
+
+    journeys:
+      - name: student study session
+        weight: 3
+        start: visit_homepage
+        transitions:
+          visit_homepage: {visit_courses_page: 0.6, end: 0.4}
+          visit_courses_page: {login_attempt: 1.0}
+          ...
+
+Время прохождения маршрута целиком (вместе с паузами между шагами)
+попадает в статистику Locust как запрос типа ``JOURNEY`` с именем
+маршрута; маршрут с хотя бы одним неуспешным запросом считается неуспешным.
+
+Вероятности переходов можно получить из логов сессий:
+    python journeys.py learn --log access.log.gz --scenario all_requests.yaml --out learned.yaml
+"""
+import argparse
+import random
+import time
+from collections import OrderedDict
+
+from locust import TaskSet, events, task
+
+END = "end"
+
+
+class JourneyError(Exception):
+    pass
+
+
+class Journey:
+    """Скомпилированный маршрут: эндпоинты состояний и таблицы переходов"""
+
+    def __init__(self, spec, scenario, max_steps=50):
+        self.name = spec["name"]
+        self.weight = float(spec.get("weight", 1))
+        self.start = spec["start"]
+        self.max_steps = int(spec.get("max_steps", max_steps))
+        self.endpoints = {}
+        self.transitions = {}
+        for state, targets in spec["transitions"].items():
+            self.endpoints[state] = scenario.task_endpoint(state)
+            total = sum(targets.values())
+            if total <= 0:
+                raise ValueError(f"Маршрут '{self.name}': у состояния {state} нет переходов")
+            # Вероятности нормируются, поэтому в таблице допустимы и счетчики
+            self.transitions[state] = (list(targets), [weight / total for weight in targets.values()])
+        for state, (targets, _) in self.transitions.items():
+            for target in targets:
+                if target != END and target not in self.transitions:
+                    raise ValueError(f"Маршрут '{self.name}': из {state} переход в {target} без своих переходов")
+        if self.start not in self.transitions:
+            raise ValueError(f"Маршрут '{self.name}': нет переходов из начального состояния {self.start}")
+
+    def next_state(self, state):
+        targets, weights = self.transitions[state]
+        return random.choices(targets, weights=weights)[0]
+
+
+def load_journeys(scenario):
+    return [Journey(spec, scenario) for spec in scenario.spec.get("journeys", [])]
+
+
+# Скомпилированные маршруты по сценариям, чтобы не разбирать таблицу для каждого пользователя
+_compiled = {}
+
+
+class JourneyTaskSet(TaskSet):
+    """Проходит маршруты из ``user.scenario``; между шагами - обычное время ожидания пользователя"""
+
+    def on_start(self):
+        scenario = self.user.scenario
+        if scenario.source not in _compiled:
+            _compiled[scenario.source] = load_journeys(scenario)
+        self.journeys = _compiled[scenario.source]
+        self.journey_weights = [journey.weight for journey in self.journeys]
+
+    @task
+    def walk(self):
+        journey = random.choices(self.journeys, weights=self.journey_weights)[0]
+        state = {"name": journey.name, "failures": 0}
+        self.user.journey = state
+        started_at = time.time()
+        started = time.perf_counter()
+        steps = 0
+        try:
+            current = journey.start
+            while current != END and steps < journey.max_steps:
+                endpoint = journey.endpoints[current]
+                if endpoint.applicable(self.user):
+                    endpoint.execute(self.user)
+                steps += 1
+                current = journey.next_state(current)
+                if current != END:
+                    self.wait()
+        finally:
+            self.user.journey = None
+
+        exception = JourneyError(f"Неуспешных запросов: {state['failures']}") if state["failures"] else None
+        events.request.fire(
+            request_type="JOURNEY",
+            name=journey.name,
+            response_time=(time.perf_counter() - started) * 1000,
+            response_length=steps,
+            exception=exception,
+            context={},
+            start_time=started_at,
+        )
+
+
+@events.request.add_listener
+def _(exception, context, **kwargs):
+    if exception is not None:
+        journey = context.get("journey")
+        if journey is not None:
+            journey["failures"] += 1
+
+
+def learn(log_path, scenario, min_count=1, session_timeout=1800.0):
+    """
+    Считает переходы между задачами внутри сессий лога и возвращает раздел journeys.
+
+    В памяти держатся только сессии, активные в пределах ``session_timeout``.
+    """
+    from log_replay import RouteMap, iter_log
+
+    route_map = RouteMap(scenario)
+    # Активные сессии в порядке последнего запроса: ключ -> (задача, время)
+    last_state = OrderedDict()
+    counts = {}
+    starts = {}
+
+    def count(source, target):
+        targets = counts.setdefault(source, {})
+        targets[target] = targets.get(target, 0) + 1
+
+    for entry in iter_log(log_path):
+        endpoint = route_map.match(entry.method, entry.path)
+        if endpoint is None:
+            continue
+        while last_state:
+            session, (state, seen) = next(iter(last_state.items()))
+            if entry.timestamp - seen < session_timeout:
+                break
+            del last_state[session]
+            count(state, END)
+
+        previous = last_state.pop(entry.session, None)
+        if previous is None:
+            starts[endpoint.task] = starts.get(endpoint.task, 0) + 1
+        else:
+            count(previous[0], endpoint.task)
+        last_state[entry.session] = (endpoint.task, entry.timestamp)
+    for state, _ in last_state.values():
+        count(state, END)
+
+    transitions = {}
+    for source, targets in sorted(counts.items()):
+        kept = {target: n for target, n in sorted(targets.items()) if n >= min_count}
+        # Все переходы состояния реже min_count: на него могут ссылаться другие, поэтому оно завершает маршрут
+        total = sum(kept.values())
+        transitions[source] = {target: round(n / total, 3) for target, n in kept.items()} if kept else {END: 1.0}
+    start = max(starts, key=starts.get)
+    return [{"name": "learned", "weight": 1, "start": start, "transitions": transitions}]
+
+
+def main():
+    import yaml
+
+    from scenario_engine import load_scenario
+
+    parser = argparse.ArgumentParser(description="Маршруты пользователей English Gang")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    learn_parser = subparsers.add_parser("learn", help="Вычислить вероятности переходов по логу сессий")
+    learn_parser.add_argument("--log", required=True, help="Access-лог nginx или JSON lines")
+    learn_parser.add_argument("--scenario", default="all_requests.yaml", help="Таблица сценария с эндпоинтами")
+    learn_parser.add_argument("--min-count", type=int, default=1, help="Отбрасывать переходы, встреченные реже")
+    learn_parser.add_argument("--out", help="Куда записать YAML; по умолчанию stdout")
+    args = parser.parse_args()
+
+    journeys = learn(args.log, load_scenario(args.scenario), min_count=args.min_count)
+    text = yaml.safe_dump({"journeys": journeys}, allow_unicode=True, sort_keys=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
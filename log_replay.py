@@ -0,0 +1,325 @@
+"""
+Воспроизведение продакшн access-лога на пользователях English Gang.
+
+Лог (nginx combined или JSON lines, можно .gz) читается потоково: в памяти
+держатся только активные сессии и ограниченные очереди запросов, поэтому
+лог размером в несколько гигабайт не загружается целиком. Пути из лога
+сопоставляются с эндпоинтами таблицы сценария (шаблоны вида
+``/api/students/{user_id}``), и запрос выполняется так же, как в обычном
+сценарии, под тем же именем в статистике.
+
+Диспетчер выдерживает исходные интервалы между запросами (ускоренные в
+``--replay-speed`` раз) и закрепляет каждую сессию лога (поле ``session``
+либо IP + User-Agent) за одним пользователем Locust, так что порядок
+запросов внутри сессии сохраняется. Если свободных пользователей нет,
+новая сессия ставится в очередь пользователю самой давней сессии, а
+отставание от расписания попадает в итоговый отчет. Запросы, которые
+пользователю не подходят (другая роль, нет токена), не выполняются и
+считаются в отчете в конце теста как пропущенные.
+
+В распределенном режиме сессии делятся между воркерами по хешу ключа
+сессии; число воркеров мастер сообщает в начале теста.
+
+Пример:
+    locust -f replay.py --replay-log access.log.gz --replay-speed 4 -u 200
+"""
+import gzip
+import json
+import logging
+import re
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+
+import gevent
+from gevent.queue import Queue
+from locust import constant, events
+from locust.runners import LocalRunner, MasterRunner, WorkerRunner
+
+from scenario_engine import ScenarioUser
+
+WORKERS_MESSAGE = "replay_workers"
+
+NGINX_LINE = re.compile(
+    r'(?P<remote_addr>\S+) \S+ \S+ \[(?P<time>[^\]]+)\] "(?P<method>[A-Z]+) (?P<path>\S+)[^"]*" '
+    r'(?P<status>\d{3}) \S+(?: "[^"]*" "(?P<user_agent>[^"]*)")?'
+)
+NGINX_TIME = "%d/%b/%Y:%H:%M:%S %z"
+
+
+class LogEntry:
+    __slots__ = ("timestamp", "session", "method", "path", "status")
+
+    def __init__(self, timestamp, session, method, path, status):
+        self.timestamp = timestamp
+        self.session = session
+        self.method = method
+        self.path = path
+        self.status = status
+
+
+def open_log(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, encoding="utf-8", errors="replace")
+
+
+def _json_timestamp(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def iter_log(path):
+    """Лениво читает лог и возвращает LogEntry; нераспознанные строки пропускаются"""
+    last_time_text, last_timestamp = None, 0.0
+    with open_log(path) as f:
+        for line in f:
+            if line.startswith("{"):
+                try:
+                    record = json.loads(line)
+                    path_value = record.get("path") or record.get("uri") or record["request"].split(" ")[1]
+                    yield LogEntry(
+                        _json_timestamp(record.get("time") or record["timestamp"]),
+                        record.get("session") or f"{record.get('remote_addr')} {record.get('user_agent', '')}",
+                        record.get("method") or record["request"].split(" ")[0],
+                        path_value.split("?", 1)[0],
+                        int(record.get("status", 0)),
+                    )
+                except (KeyError, IndexError, ValueError, AttributeError):
+                    continue
+                continue
+
+            match = NGINX_LINE.match(line)
+            if match is None:
+                continue
+            time_text = match.group("time")
+            # В одной секунде обычно много строк, strptime вызываем только при смене времени
+            if time_text != last_time_text:
+                last_time_text = time_text
+                last_timestamp = datetime.strptime(time_text, NGINX_TIME).timestamp()
+            yield LogEntry(
+                last_timestamp,
+                f"{match.group('remote_addr')} {match.group('user_agent') or ''}",
+                match.group("method"),
+                match.group("path").split("?", 1)[0],
+                int(match.group("status")),
+            )
+
+
+class RouteMap:
+    """Сопоставление (метод, путь) из лога с эндпоинтами сценария"""
+
+    def __init__(self, scenario):
+        self.static = {}
+        self.patterns = []
+        for endpoint in scenario.endpoints:
+            if not endpoint.path:
+                continue
+            if endpoint.templated:
+                regex = re.sub(r"\\\{\w+\\\}", r"[^/]+", re.escape(endpoint.path))
+                self.patterns.append((endpoint.method, re.compile(f"^{regex}/?$"), endpoint))
+            else:
+                self.static.setdefault((endpoint.method, endpoint.path), endpoint)
+                self.static.setdefault((endpoint.method, endpoint.path.rstrip("/") or "/"), endpoint)
+
+    def match(self, method, path):
+        endpoint = self.static.get((method, path))
+        if endpoint is not None:
+            return endpoint
+        for pattern_method, pattern, endpoint in self.patterns:
+            if pattern_method == method and pattern.match(path):
+                return endpoint
+        return None
+
+
+class ReplayDispatcher:
+    """Читает лог и раздает запросы сессий свободным пользователям по расписанию"""
+
+    def __init__(self, entries, route_map, speed=1.0, session_timeout=1800.0,
+                 queue_size=100, worker_index=0, worker_count=1):
+        self.entries = entries
+        self.route_map = route_map
+        self.speed = speed
+        self.session_timeout = session_timeout
+        self.queue_size = queue_size
+        self.worker_index = worker_index
+        self.worker_count = worker_count
+        self.free_inboxes = Queue()
+        self.inboxes = []
+        # Активные сессии в порядке последнего обращения: ключ -> [inbox, время последнего запроса]
+        self.sessions = OrderedDict()
+        self.dispatched = 0
+        self.unmapped = 0
+        self.reassigned = 0
+        # Запросы, не подходящие пользователю сессии (роль, токен); считают пользователи
+        self.skipped = 0
+        self.max_drift = 0.0
+        self.finished = False
+
+    def new_inbox(self):
+        inbox = Queue(maxsize=self.queue_size)
+        self.inboxes.append(inbox)
+        self.free_inboxes.put(inbox)
+        return inbox
+
+    def drained(self):
+        """Все сессии доиграны и пользователи вернулись в пул свободных"""
+        return self.finished and self.free_inboxes.qsize() == len(self.inboxes)
+
+    def _expire_sessions(self, now_log_time):
+        while self.sessions:
+            key, (inbox, last_seen) = next(iter(self.sessions.items()))
+            if now_log_time - last_seen < self.session_timeout:
+                break
+            del self.sessions[key]
+            inbox.put(None)  # конец сессии: пользователь вернется в пул свободных
+
+    def _owned(self, session):
+        return self.worker_count <= 1 or zlib.crc32(session.encode()) % self.worker_count == self.worker_index
+
+    def run(self):
+        first_log_time = wall_start = None
+        for entry in self.entries:
+            if not self._owned(entry.session):
+                continue
+            endpoint = self.route_map.match(entry.method, entry.path)
+            if endpoint is None:
+                self.unmapped += 1
+                continue
+            if first_log_time is None:
+                first_log_time, wall_start = entry.timestamp, time.time()
+
+            target = wall_start + (entry.timestamp - first_log_time) / self.speed
+            delay = target - time.time()
+            if delay > 0:
+                gevent.sleep(delay)
+            else:
+                self.max_drift = max(self.max_drift, -delay)
+
+            self._expire_sessions(entry.timestamp)
+            session = self.sessions.get(entry.session)
+            if session is None:
+                if self.free_inboxes.empty() and self.sessions:
+                    # Свободных пользователей нет: отдаем новую сессию пользователю самой давней.
+                    # Ее оставшиеся запросы уже в очереди, так что порядок в обеих сессиях сохраняется
+                    _, (inbox, _) = self.sessions.popitem(last=False)
+                    self.reassigned += 1
+                else:
+                    inbox = self.free_inboxes.get()
+                session = self.sessions[entry.session] = [inbox, entry.timestamp]
+            else:
+                self.sessions.move_to_end(entry.session)
+                session[1] = entry.timestamp
+            session[0].put(endpoint)
+            self.dispatched += 1
+
+        for inbox, _ in self.sessions.values():
+            inbox.put(None)
+        self.sessions.clear()
+        self.finished = True
+        logging.info(
+            f"Воспроизведение лога завершено: {self.dispatched} запросов, {self.unmapped} без эндпоинта, "
+            f"{self.reassigned} сессий переданы занятым пользователям, "
+            f"максимальное отставание от расписания {self.max_drift * 1000:.0f} мс"
+        )
+
+
+DISPATCHER = None
+# Число воркеров, между которыми делятся сессии; на воркерах его присылает мастер
+WORKER_COUNT = 1
+
+
+class ReplayUser(ScenarioUser):
+    """
+    Пользователь, выполняющий запросы одной сессии лога за другой.
+
+    Подкласс задает ``scenario``: по нему сопоставляются пути и выполняются запросы.
+    """
+
+    abstract = True
+    wait_time = constant(0)
+    inbox = None
+
+    def on_start(self):
+        super().on_start()
+        self.inbox = DISPATCHER.new_inbox() if DISPATCHER is not None else None
+
+    def replay_next(self):
+        if self.inbox is None:
+            gevent.sleep(1)
+            return
+        endpoint = self.inbox.get()
+        if endpoint is None:
+            self.student = None
+            DISPATCHER.free_inboxes.put(self.inbox)
+            return
+        if endpoint.applicable(self):
+            endpoint.execute(self)
+        else:
+            DISPATCHER.skipped += 1
+
+    tasks = [replay_next]
+
+
+@events.init_command_line_parser.add_listener
+def _(parser):
+    parser.add_argument("--replay-log", default="", help="Access-лог nginx или JSON lines (.gz допускается)")
+    parser.add_argument("--replay-speed", type=float, default=1.0, help="Ускорение воспроизведения лога")
+    parser.add_argument("--replay-session-timeout", type=float, default=1800.0,
+                        help="Сессия лога считается завершенной после такой паузы, с")
+
+
+@events.init.add_listener
+def _(environment, **kwargs):
+    options = environment.parsed_options
+    if options is None or not options.replay_log or not isinstance(environment.runner, WorkerRunner):
+        return
+
+    def on_workers(environment, msg, **kwargs):
+        global WORKER_COUNT
+        WORKER_COUNT = msg.data
+
+    environment.runner.register_message(WORKERS_MESSAGE, on_workers)
+
+
+@events.test_start.add_listener
+def _(environment, **kwargs):
+    global DISPATCHER
+    options = environment.parsed_options
+    if options is None or not options.replay_log:
+        return
+    if isinstance(environment.runner, MasterRunner):
+        # Приходит воркерам раньше команды запуска, то есть раньше их test_start
+        environment.runner.send_message(WORKERS_MESSAGE, max(1, environment.runner.worker_count))
+        return
+    replay_classes = [cls for cls in environment.user_classes if issubclass(cls, ReplayUser)]
+    if not replay_classes:
+        return
+    DISPATCHER = ReplayDispatcher(
+        iter_log(options.replay_log),
+        RouteMap(replay_classes[0].scenario),
+        speed=options.replay_speed,
+        session_timeout=options.replay_session_timeout,
+        worker_index=environment.runner.worker_index,
+        worker_count=WORKER_COUNT,
+    )
+
+    def run():
+        DISPATCHER.run()
+        if isinstance(environment.runner, LocalRunner):
+            # Дожидаемся, пока пользователи доиграют свои сессии
+            while not DISPATCHER.drained():
+                gevent.sleep(0.5)
+            environment.runner.quit()
+
+    gevent.spawn(run)
+
+
+@events.test_stop.add_listener
+def _(environment, **kwargs):
+    if DISPATCHER is not None and DISPATCHER.skipped:
+        logging.warning(
+            f"Пропущено {DISPATCHER.skipped} запросов лога: эндпоинт не подходит пользователю сессии (роль или токен)"
+        )
@@ -0,0 +1,477 @@
+"""
+Локальный асинхронный стенд English Gang для офлайн-прогонов нагрузки.
+
+Реализует эндпоинты, которые используют test1.py и test2.py, с теми же
+форматами ответов: ``/api/token``, ``/api/me``, ``/api/students/{id}``,
+``/api/teachers/public``, ``/api/teachers/{id}``, создание студентов и
+преподавателей, а также статические страницы (``/``, ``/team.html``,
+``/Courses.html`` и т.д.) с подресурсами ``/static/...`` и заголовками
+кэширования (ETag, Last-Modified, Cache-Control, ответы 304). Задержку
+и долю ошибок можно настраивать, чтобы на одной машине без сети измерять
+пропускную способность и накладные расходы генератора нагрузки.
+
+Пример:
+    python mock_server.py --port 8089 --latency-ms 5 --jitter-ms 2 --error-rate 0.01
+    python mock_server.py --port 8089 --hash-iterations 20000 --token-ttl 120  # auth.py
+    locust -f test1.py -H http://127.0.0.1:8089
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import random
+import re
+import socket
+import subprocess
+import sys
+import time
+import zlib
+from email.utils import formatdate
+from urllib.parse import parse_qs
+
+SECRET = b"english-gang-mock"
+
+STATUS_TEXT = {
+    200: "OK",
+    201: "Created",
+    304: "Not Modified",
+    400: "Bad Request",
+    401: "Unauthorized",
+    403: "Forbidden",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    422: "Unprocessable Entity",
+    500: "Internal Server Error",
+}
+
+PAGES = {
+    "/": "Главная",
+    "/team.html": "Команда",
+    "/projects.html": "Проекты",
+    "/technical.html": "Техническая информация",
+    "/Courses.html": "Курсы",
+    "/Tests.html": "Тесты",
+}
+
+# Общие для всех страниц подресурсы: путь -> (размер, content-type, Cache-Control)
+SHARED_ASSETS = {
+    "/static/css/site.css": (24 * 1024, "text/css", "public, max-age=3600"),
+    "/static/js/vendor.js": (96 * 1024, "application/javascript", "public, max-age=86400, immutable"),
+    "/static/js/app.js": (32 * 1024, "application/javascript", "public, max-age=300"),
+    "/static/img/logo.png": (6 * 1024, "image/png", "public, max-age=86400"),
+}
+# Картинка, своя для каждой страницы
+PAGE_IMAGE = (40 * 1024, "image/jpeg", "public, max-age=600")
+
+
+class StaticSite:
+    """Страницы и их подресурсы с ETag/Last-Modified; HTML всегда перепроверяется (no-cache)"""
+
+    def __init__(self):
+        self.last_modified = formatdate(time.time(), usegmt=True)
+        self.files = {}
+        for path, (size, content_type, cache_control) in SHARED_ASSETS.items():
+            self.add(path, self.filler(path, size), content_type, cache_control)
+        for path, title in PAGES.items():
+            image = f"/static/img/page{zlib.crc32(path.encode()):08x}.jpg"
+            self.add(image, self.filler(image, PAGE_IMAGE[0]), *PAGE_IMAGE[1:])
+            html = (
+                f"<!DOCTYPE html><html><head><title>English Gang - {title}</title>"
+                '<link rel="stylesheet" href="/static/css/site.css">'
+                '<link rel="icon" href="/static/img/logo.png">'
+                '<script src="/static/js/vendor.js"></script><script src="/static/js/app.js" defer></script>'
+                f'</head><body><img src="/static/img/logo.png" alt="logo"><h1>{title}</h1>'
+                f'<img src="{image}" alt="{title}"></body></html>'
+            )
+            self.add(path, html.encode(), "text/html; charset=utf-8", "no-cache")
+
+    @staticmethod
+    def filler(path, size):
+        return (path.encode() * (size // len(path) + 1))[:size]
+
+    def add(self, path, body, content_type, cache_control):
+        etag = f'"{zlib.crc32(body):08x}"'
+        self.files[path] = (body, content_type, {"Cache-Control": cache_control, "ETag": etag,
+                                                 "Last-Modified": self.last_modified})
+
+    def serve(self, request):
+        """(статус, тело, content-type, заголовки) или None, если такого файла нет"""
+        entry = self.files.get(request.path)
+        if entry is None:
+            return None
+        body, content_type, headers = entry
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            not_modified = headers["ETag"] in (tag.strip() for tag in if_none_match.split(","))
+        else:
+            not_modified = request.headers.get("if-modified-since") == self.last_modified
+        if not_modified:
+            return 304, b"", content_type, headers
+        return 200, body, content_type, headers
+
+
+STUDENT_FIELDS = ("first_name", "last_name", "age", "sex", "email", "level", "vocabulary", "teacher_id")
+TEACHER_FIELDS = ("first_name", "last_name", "age", "sex", "qualification", "email")
+
+
+class HTTPError(Exception):
+    def __init__(self, status, detail):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+class EnglishGangState:
+    """In-memory данные стенда: учетные записи, студенты и преподаватели"""
+
+    def __init__(self, token_ttl=3600):
+        self.token_ttl = token_ttl
+        self.accounts = {}
+        self.students = {}
+        self.teachers = {}
+        self.next_id = 1
+        self._seed()
+
+    def _seed(self):
+        for first, last, qualification, password in (
+            ("John", "Doe", "C2", "teacher123"),
+            ("Jane", "Smith", "C1", "teacher456"),
+        ):
+            self.add_teacher({
+                "first_name": first,
+                "last_name": last,
+                "age": 35,
+                "sex": "M" if first == "John" else "F",
+                "qualification": qualification,
+                "email": f"{first.lower()}.{last.lower()}@example.com",
+                "password": password,
+            })
+        self.add_account("admin@example.com", "admin123", "manager")
+        first_teacher = min(self.teachers)
+        for first, last, password in (("Alice", "Brown", "password123"), ("Bob", "Green", "password456")):
+            self.add_student({
+                "first_name": first,
+                "last_name": last,
+                "age": 21,
+                "sex": "F" if first == "Alice" else "M",
+                "email": f"{first.lower()}@example.com",
+                "level": "B1",
+                "vocabulary": 1500,
+                "teacher_id": first_teacher,
+                "password": password,
+            })
+
+    def _allocate_id(self):
+        entity_id = self.next_id
+        self.next_id += 1
+        return entity_id
+
+    def add_account(self, email, password, role, entity_id=None):
+        if email in self.accounts:
+            raise HTTPError(400, "Email already registered")
+        entity_id = entity_id or self._allocate_id()
+        self.accounts[email] = {"id": entity_id, "password": password, "role": role}
+        return entity_id
+
+    def add_student(self, data):
+        student = {field: data[field] for field in STUDENT_FIELDS}
+        student["id"] = self.add_account(data["email"], data["password"], "student")
+        self.students[student["id"]] = student
+        return student
+
+    def add_teacher(self, data):
+        teacher = {field: data[field] for field in TEACHER_FIELDS}
+        teacher["id"] = self.add_account(data["email"], data["password"], "teacher")
+        self.teachers[teacher["id"]] = teacher
+        return teacher
+
+    def issue_token(self, email):
+        claims = {"sub": email, "exp": int(time.time() + self.token_ttl)}
+        header = base64.urlsafe_b64encode(b'{"alg":"HS256","typ":"JWT"}').rstrip(b"=")
+        payload = base64.urlsafe_b64encode(json.dumps(claims).encode()).rstrip(b"=")
+        signature = base64.urlsafe_b64encode(
+            hmac.new(SECRET, header + b"." + payload, hashlib.sha256).digest()
+        ).rstrip(b"=")
+        return b".".join((header, payload, signature)).decode()
+
+    def account_for_token(self, token):
+        try:
+            header, payload, signature = token.encode().split(b".")
+        except ValueError:
+            raise HTTPError(401, "Could not validate credentials")
+        expected = base64.urlsafe_b64encode(
+            hmac.new(SECRET, header + b"." + payload, hashlib.sha256).digest()
+        ).rstrip(b"=")
+        if not hmac.compare_digest(expected, signature):
+            raise HTTPError(401, "Could not validate credentials")
+        claims = json.loads(base64.urlsafe_b64decode(payload + b"=" * (-len(payload) % 4)))
+        if claims["exp"] < time.time() or claims["sub"] not in self.accounts:
+            raise HTTPError(401, "Could not validate credentials")
+        return claims["sub"], self.accounts[claims["sub"]]
+
+
+class Request:
+    __slots__ = ("method", "path", "headers", "body")
+
+    def __init__(self, method, path, headers, body):
+        self.method = method
+        self.path = path
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        try:
+            return json.loads(self.body)
+        except ValueError:
+            raise HTTPError(422, "Invalid JSON body")
+
+    def form(self):
+        return {key: values[0] for key, values in parse_qs(self.body.decode()).items()}
+
+
+class MockServer:
+    """Маршрутизация и обработка запросов стенда"""
+
+    def __init__(self, state=None, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, seed=None, hash_iterations=0):
+        self.state = state or EnglishGangState()
+        self.hash_iterations = hash_iterations
+        self.site = StaticSite()
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.routes = [
+            ("POST", re.compile(r"^/api/token$"), self.login),
+            ("GET", re.compile(r"^/api/me$"), self.me),
+            ("GET", re.compile(r"^/api/teachers/public$"), self.public_teachers),
+            ("GET", re.compile(r"^/api/teachers/(\d+)$"), self.get_teacher),
+            ("POST", re.compile(r"^/api/teachers/?$"), self.create_teacher),
+            ("GET", re.compile(r"^/api/students/(\d+)$"), self.get_student),
+            ("PUT", re.compile(r"^/api/students/(\d+)$"), self.update_student),
+            ("POST", re.compile(r"^/api/students/?$"), self.create_student),
+        ]
+
+    # --- обработчики ---
+
+    def login(self, request):
+        form = request.form()
+        if self.hash_iterations:
+            # Проверка хэша пароля занимает CPU, как bcrypt/PBKDF2 на настоящем сервере; считается
+            # и для несуществующей учетной записи, чтобы время ответа не выдавало ее отсутствие
+            hashlib.pbkdf2_hmac("sha256", form.get("password", "").encode(), SECRET, self.hash_iterations)
+        account = self.state.accounts.get(form.get("username"))
+        if account is None or account["password"] != form.get("password"):
+            raise HTTPError(401, "Incorrect username or password")
+        return 200, {"access_token": self.state.issue_token(form["username"]), "token_type": "bearer"}
+
+    def me(self, request):
+        email, account = self.authorize(request)
+        if account["role"] == "student":
+            additional_info = dict(self.state.students[account["id"]])
+        elif account["role"] == "teacher":
+            additional_info = dict(self.state.teachers[account["id"]])
+        else:
+            additional_info = {}
+        return 200, {"id": account["id"], "email": email, "role": account["role"], "additional_info": additional_info}
+
+    def public_teachers(self, request):
+        return 200, [
+            {key: teacher[key] for key in ("id", "first_name", "last_name", "qualification")}
+            for teacher in self.state.teachers.values()
+        ]
+
+    def get_teacher(self, request, teacher_id):
+        self.authorize(request)
+        return 200, self.lookup(self.state.teachers, teacher_id, "Teacher")
+
+    def create_teacher(self, request):
+        self.authorize(request, role="manager")
+        return 200, self.state.add_teacher(self.validate(request.json(), TEACHER_FIELDS + ("password",)))
+
+    def get_student(self, request, student_id):
+        self.authorize(request)
+        return 200, self.lookup(self.state.students, student_id, "Student")
+
+    def update_student(self, request, student_id):
+        self.authorize(request)
+        student = self.lookup(self.state.students, student_id, "Student")
+        data = self.validate(request.json(), STUDENT_FIELDS)
+        student.update({field: data[field] for field in STUDENT_FIELDS})
+        return 200, student
+
+    def create_student(self, request):
+        self.authorize(request, role="manager")
+        data = self.validate(request.json(), STUDENT_FIELDS + ("password",))
+        if data["teacher_id"] not in self.state.teachers:
+            raise HTTPError(404, "Teacher not found")
+        return 200, self.state.add_student(data)
+
+    # --- вспомогательные методы ---
+
+    def authorize(self, request, role=None):
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            raise HTTPError(401, "Not authenticated")
+        email, account = self.state.account_for_token(token)
+        if role is not None and account["role"] != role:
+            raise HTTPError(403, "Not enough permissions")
+        return email, account
+
+    @staticmethod
+    def lookup(table, entity_id, kind):
+        entity = table.get(int(entity_id))
+        if entity is None:
+            raise HTTPError(404, f"{kind} not found")
+        return entity
+
+    @staticmethod
+    def validate(data, fields):
+        missing = [field for field in fields if field not in data]
+        if missing:
+            raise HTTPError(422, f"Missing fields: {', '.join(missing)}")
+        return data
+
+    def dispatch(self, request):
+        """Возвращает (статус, тело, content-type, дополнительные заголовки)"""
+        if request.method == "GET":
+            static = self.site.serve(request)
+            if static is not None:
+                return static
+        path_matched = False
+        for method, pattern, handler in self.routes:
+            match = pattern.match(request.path)
+            if match is None:
+                continue
+            path_matched = True
+            if method == request.method:
+                try:
+                    status, payload = handler(request, *match.groups())
+                except HTTPError as e:
+                    status, payload = e.status, {"detail": e.detail}
+                return status, json.dumps(payload).encode(), "application/json", None
+        if path_matched:
+            return 405, b'{"detail":"Method Not Allowed"}', "application/json", None
+        return 404, b'{"detail":"Not Found"}', "application/json", None
+
+    async def respond(self, request):
+        if self.latency_ms or self.jitter_ms:
+            delay = max(0.0, self.random.gauss(self.latency_ms, self.jitter_ms))
+            await asyncio.sleep(delay / 1000)
+        if self.error_rate and self.random.random() < self.error_rate:
+            return 500, b'{"detail":"Injected error"}', "application/json", None
+        return self.dispatch(request)
+
+    # --- HTTP/1.1 ---
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                started = time.perf_counter()
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                body = await reader.readexactly(length) if length else b""
+
+                request = Request(method, target.split("?", 1)[0], headers, body)
+                status, payload, content_type, extra_headers = await self.respond(request)
+                duration_ms = (time.perf_counter() - started) * 1000
+                keep_alive = headers.get("connection", "").lower() != "close"
+                # Идентификатор запроса возвращается клиенту для сопоставления с логами
+                request_id = headers.get("x-request-id")
+                head = (
+                    f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    f"Server-Timing: app;dur={duration_ms:.3f}\r\n"
+                )
+                if request_id:
+                    head += f"X-Request-ID: {request_id}\r\n"
+                if extra_headers:
+                    head += "".join(f"{name}: {value}\r\n" for name, value in extra_headers.items())
+                head += f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                writer.write(head.encode("latin-1") + payload)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle_connection, host, port, backlog=4096)
+        logging.info(f"Стенд English Gang слушает http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Стенд не поднялся на порту {port}")
+
+
+def spawn(port, *args):
+    """Запускает стенд в отдельном процессе и ждет, пока он начнет принимать соединения"""
+    process = subprocess.Popen([sys.executable, __file__, "--port", str(port), *args])
+    try:
+        wait_for_port(port)
+    except RuntimeError:
+        process.terminate()
+        raise
+    return process
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальный стенд English Gang для нагрузочных тестов")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Средняя задержка ответа, мс")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Стандартное отклонение задержки, мс")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Доля ответов 500, от 0 до 1")
+    parser.add_argument("--seed", type=int, help="Seed генератора задержек и ошибок")
+    parser.add_argument("--hash-iterations", type=int, default=0,
+                        help="Итераций PBKDF2 при входе: имитация стоимости проверки пароля")
+    parser.add_argument("--token-ttl", type=int, default=3600, help="Время жизни выдаваемых токенов, с")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    server = MockServer(
+        state=EnglishGangState(token_ttl=args.token_ttl),
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        seed=args.seed,
+        hash_iterations=args.hash_iterations,
+    )
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
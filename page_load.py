@@ -0,0 +1,301 @@
+"""
+Загрузка страниц English Gang целиком, как это делает браузер.
+
+Обычные задачи ``visit_*`` запрашивают только HTML без условных
+заголовков. С ``--page-load`` эндпоинты сценария с ``page: true``
+загружают страницу вместе с подресурсами:
+
+  * HTML разбирается один раз на путь, список CSS, JS и картинок кэшируется
+    для всех пользователей процесса;
+  * подресурсы загружаются параллельно, не больше ``--page-concurrency``
+    одновременно на пользователя (как соединения браузера к одному хосту);
+  * у каждого пользователя свой HTTP-кэш: свежие по Cache-Control (max-age)
+    ответы берутся из кэша без запроса, устаревшие перепроверяются с
+    If-None-Match/If-Modified-Since, и ответ 304 тоже берется из кэша;
+    ``no-store`` не кэшируется, ``no-cache`` всегда перепроверяется.
+
+Полное время загрузки страницы попадает в статистику как запрос типа PAGE
+("GET homepage [page load]"), подресурсы - под именами "GET static css",
+"GET static js" и т.д. В конце теста печатаются переданные байты и
+экономия: байты, взятые из кэша или подтвержденные ответом 304, а также
+байты, отданные CDN (ответы с X-Cache/CF-Cache-Status: HIT или Age > 0).
+"""
+import logging
+import re
+import time
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit
+
+import gevent
+from gevent.pool import Pool
+from locust import events
+from locust.runners import WorkerRunner
+
+ENABLED = False
+CONCURRENCY = 6
+
+MAX_AGE = re.compile(r"max-age=(\d+)")
+ASSET_KINDS = (
+    (re.compile(r"\.css(\?|$)"), "css"),
+    (re.compile(r"\.js(\?|$)"), "js"),
+    (re.compile(r"\.(png|jpe?g|gif|svg|webp|ico)(\?|$)"), "img"),
+    (re.compile(r"\.(woff2?|ttf|otf)(\?|$)"), "font"),
+)
+
+
+class SubresourceParser(HTMLParser):
+    """Собирает ссылки на CSS, JS, картинки и иконки из HTML"""
+
+    def __init__(self):
+        super().__init__()
+        self.urls = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "link" and attrs.get("href"):
+            rel = (attrs.get("rel") or "").lower()
+            if "stylesheet" in rel or "icon" in rel or "preload" in rel:
+                self.urls.append(attrs["href"])
+        elif tag in ("script", "img") and attrs.get("src"):
+            self.urls.append(attrs["src"])
+
+
+# Подресурсы по URL страницы, общие для всех пользователей процесса
+_subresources = {}
+
+
+def subresources(url, html):
+    urls = _subresources.get(url)
+    if urls is None:
+        parser = SubresourceParser()
+        parser.feed(html)
+        # Повторные ссылки (логотип в <link> и <img>) браузер загружает один раз
+        urls = _subresources[url] = list(dict.fromkeys(urljoin(url, link) for link in parser.urls))
+    return urls
+
+
+def asset_kind(url):
+    path = urlsplit(url).path
+    for pattern, kind in ASSET_KINDS:
+        if pattern.search(path):
+            return kind
+    return "other"
+
+
+class CacheEntry:
+    __slots__ = ("etag", "last_modified", "expires_at", "size", "body")
+
+    def __init__(self, etag, last_modified, expires_at, size, body=None):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires_at = expires_at
+        self.size = size
+        self.body = body
+
+
+class HttpCache:
+    """Частный HTTP-кэш одного пользователя"""
+
+    def __init__(self):
+        self.entries = {}
+
+    def lookup(self, url):
+        """(запись, свежая ли) для URL; (None, False), если записи нет"""
+        entry = self.entries.get(url)
+        if entry is None:
+            return None, False
+        return entry, entry.expires_at > time.time()
+
+    @staticmethod
+    def conditional_headers(entry):
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def store(self, url, response, size, keep_body=False):
+        cache_control = (response.headers.get("Cache-Control") or "").lower()
+        if "no-store" in cache_control:
+            self.entries.pop(url, None)
+            return
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        max_age = MAX_AGE.search(cache_control)
+        if "no-cache" in cache_control or max_age is None:
+            expires_at = 0.0
+        else:
+            expires_at = time.time() + int(max_age.group(1))
+        if etag or last_modified or expires_at:
+            body = response.text if keep_body else None
+            self.entries[url] = CacheEntry(etag, last_modified, expires_at, size, body)
+
+    def refresh(self, entry, response):
+        """После 304 запись снова свежая на max-age из ответа"""
+        max_age = MAX_AGE.search((response.headers.get("Cache-Control") or "").lower())
+        if max_age is not None and "no-cache" not in (response.headers.get("Cache-Control") or "").lower():
+            entry.expires_at = time.time() + int(max_age.group(1))
+
+
+class PageStats:
+    """Байты, загрузки и экономия кэша по всем пользователям"""
+
+    FIELDS = ("pages", "requests", "bytes", "fresh_hits", "revalidated", "saved_bytes", "cdn_hits", "cdn_bytes")
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        for field in self.FIELDS:
+            setattr(self, field, 0)
+
+    def take(self):
+        data = {field: getattr(self, field) for field in self.FIELDS}
+        self.reset()
+        return data
+
+    def merge(self, data):
+        for field in self.FIELDS:
+            setattr(self, field, getattr(self, field) + data[field])
+
+    def summary(self):
+        total = self.bytes + self.saved_bytes
+        return (
+            f"{self.pages} страниц, {self.requests} запросов, передано {self.bytes / 2 ** 20:.1f} МиБ; "
+            f"из кэша без запроса {self.fresh_hits}, подтверждено 304 {self.revalidated}, "
+            f"сэкономлено {self.saved_bytes / 2 ** 20:.1f} МиБ ({self.saved_bytes / total if total else 0:.0%}); "
+            f"CDN: {self.cdn_hits} попаданий, {self.cdn_bytes / 2 ** 20:.1f} МиБ"
+        )
+
+
+STATS = PageStats()
+
+
+def is_cdn_hit(response):
+    cache_status = (response.headers.get("X-Cache") or response.headers.get("CF-Cache-Status") or "").upper()
+    if "HIT" in cache_status:
+        return True
+    try:
+        return int(response.headers.get("Age") or 0) > 0
+    except ValueError:
+        return False
+
+
+def fetch(user, cache, url, name, request=None, keep_body=False):
+    """
+    Загружает URL через кэш пользователя. Возвращает (успех, тело или None,
+    переданные байты); тело есть только при ``keep_body``.
+    """
+    entry, fresh = cache.lookup(url)
+    if fresh:
+        STATS.fresh_hits += 1
+        STATS.saved_bytes += entry.size
+        return True, entry.body, 0
+
+    headers = cache.conditional_headers(entry)
+    if request is None:
+        context = user.client.get(url, headers=headers, name=name, catch_response=True)
+    else:
+        context = request(headers)
+    with context as response:
+        STATS.requests += 1
+        if response.status_code == 304 and entry is not None:
+            response.success()
+            cache.refresh(entry, response)
+            STATS.revalidated += 1
+            STATS.saved_bytes += entry.size
+            return True, entry.body, 0
+        if response.status_code != 200:
+            response.failure(f"Ошибка загрузки {url}: {response.status_code}")
+            return False, None, 0
+        response.success()
+        size = len(response.content or b"")
+        STATS.bytes += size
+        if is_cdn_hit(response):
+            STATS.cdn_hits += 1
+            STATS.cdn_bytes += size
+        cache.store(url, response, size, keep_body=keep_body)
+        return True, response.text if keep_body else None, size
+
+
+def load_page(user, endpoint):
+    """Загружает страницу эндпоинта с подресурсами и пишет полное время загрузки"""
+    cache = user.page_cache
+    if cache is None:
+        cache = user.page_cache = HttpCache()
+    page_url = urljoin(user.host, endpoint.path)
+    started_at = time.time()
+    started = time.perf_counter()
+
+    # Байты считаются по ответам этой страницы: STATS общий для всех пользователей процесса
+    ok, html, page_bytes = fetch(
+        user, cache, page_url, endpoint.name, keep_body=True,
+        request=lambda headers: endpoint.request(user, headers=headers),
+    )
+    failed = 0 if ok else 1
+    if ok and html:
+        pool = Pool(CONCURRENCY)
+        jobs = [
+            pool.spawn(fetch, user, cache, url, f"GET static {asset_kind(url)}")
+            for url in subresources(page_url, html)
+        ]
+        gevent.joinall(jobs)
+        for job in jobs:
+            if job.successful() and job.value[0]:
+                page_bytes += job.value[2]
+            else:
+                failed += 1
+
+    STATS.pages += 1
+    events.request.fire(
+        request_type="PAGE",
+        name=f"{endpoint.name} [page load]",
+        response_time=(time.perf_counter() - started) * 1000,
+        response_length=page_bytes,
+        exception=RuntimeError(f"Не загружено ресурсов: {failed}") if failed else None,
+        context={},
+        start_time=started_at,
+    )
+
+
+@events.init_command_line_parser.add_listener
+def _(parser):
+    parser.add_argument("--page-load", action="store_true", default=False,
+                        help="Загружать страницы (page: true в сценарии) вместе с CSS, JS и картинками")
+    parser.add_argument("--page-concurrency", type=int, default=6,
+                        help="Одновременных загрузок подресурсов на пользователя")
+
+
+@events.init.add_listener
+def _(environment, **kwargs):
+    global ENABLED, CONCURRENCY
+    options = environment.parsed_options
+    if options is None:
+        return
+    ENABLED = options.page_load
+    CONCURRENCY = options.page_concurrency
+
+
+@events.report_to_master.add_listener
+def _(client_id, data):
+    if STATS.pages:
+        data["page_load"] = STATS.take()
+
+
+@events.worker_report.add_listener
+def _(client_id, data):
+    if "page_load" in data:
+        STATS.merge(data["page_load"])
+
+
+@events.reset_stats.add_listener
+def _():
+    STATS.reset()
+
+
+@events.quitting.add_listener
+def _(environment, **kwargs):
+    if STATS.pages and not isinstance(environment.runner, WorkerRunner):
+        logging.info(f"Загрузка страниц: {STATS.summary()}")
@@ -0,0 +1,20 @@
+"""
+Воспроизведение access-лога на сценарии English Gang (GET, PUT и POST запросы).
+
+    locust -f replay.py --replay-log access.log.gz --replay-speed 4 -u 200 -r 50
+"""
+from locust import HttpUser
+
+import generator_health  # noqa: F401 - самоконтроль генератора нагрузки
+import hdr_stats  # noqa: F401 - HDR-гистограммы по именам запросов
+import run_store  # noqa: F401 - сохранение итогов прогона (--run-store)
+import timing_breakdown  # noqa: F401 - фазы запросов (--timing-breakdown)
+import tracing  # noqa: F401 - X-Request-ID и traceparent (--trace)
+from log_replay import ReplayUser
+from scenario_engine import load_scenario
+
+
+class EnglishGangReplayUser(ReplayUser, HttpUser):
+    """Пользователь English Gang, повторяющий сессии из --replay-log"""
+
+    scenario = load_scenario("all_requests.yaml")
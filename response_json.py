@@ -0,0 +1,165 @@
+"""
+Разбор и проверка JSON-ответов с минимальной нагрузкой на генератор.
+
+``parse(response)`` разбирает тело не больше одного раза на ответ
+(результат запоминается на объекте ответа) и декодирует байты тела
+напрямую через orjson, если он установлен, - без промежуточного
+``response.text``, который у FastHttpUser еще и определяет кодировку.
+
+Проверка содержимого ответа задается полем ``validate`` в таблице
+сценария (список обязательных ключей) и выполняется только для доли
+ответов ``--validate-sample`` (по умолчанию 1%): остальные ответы
+проверяются лишь по статусу и не разбираются вовсе. В конце теста
+печатается, сколько времени генератора ушло на разбор, сколько ответов
+проверено и пропущено, и сэкономленное время: повторные вызовы ``parse``
+для уже разобранного ответа и пропущенные проверки, умноженные на среднее
+время одного разбора.
+"""
+import json
+import logging
+import random
+import time
+
+from locust import events
+from locust.runners import WorkerRunner
+
+try:
+    import orjson
+except ImportError:  # orjson не входит в зависимости Locust
+    orjson = None
+
+if orjson is not None:
+    loads = orjson.loads
+else:
+    loads = json.loads
+
+_MISSING = object()
+
+
+class ParseStats:
+    """Счетчики разборов и пропущенных проверок"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.parsed = 0
+        self.hits = 0
+        self.parse_seconds = 0.0
+        self.bytes = 0
+        self.validated = 0
+        self.skipped = 0
+
+    def take(self):
+        data = {
+            "parsed": self.parsed,
+            "hits": self.hits,
+            "parse_seconds": self.parse_seconds,
+            "bytes": self.bytes,
+            "validated": self.validated,
+            "skipped": self.skipped,
+        }
+        self.reset()
+        return data
+
+    def merge(self, data):
+        self.parsed += data["parsed"]
+        self.hits += data["hits"]
+        self.parse_seconds += data["parse_seconds"]
+        self.bytes += data["bytes"]
+        self.validated += data["validated"]
+        self.skipped += data["skipped"]
+
+    def summary(self):
+        average = self.parse_seconds / self.parsed if self.parsed else 0.0
+        return (
+            f"разобрано {self.parsed} ответов ({self.bytes / 1024:.0f} КиБ) за {self.parse_seconds * 1000:.0f} мс CPU, "
+            f"{average * 1e6:.1f} мкс на ответ ({'orjson' if orjson is not None else 'json'}); "
+            f"проверено {self.validated}, пропущено {self.skipped} проверок, повторных разборов избежано "
+            f"{self.hits}; сэкономлено около {(self.hits + self.skipped) * average * 1000:.0f} мс CPU"
+        )
+
+
+STATS = ParseStats()
+# Доля ответов, содержимое которых проверяется (--validate-sample)
+SAMPLE_RATE = 0.01
+
+
+def parse(response):
+    """JSON тела ответа; повторные вызовы для того же ответа не разбирают тело заново"""
+    data = getattr(response, "_parsed_json", _MISSING)
+    if data is _MISSING:
+        content = response.content
+        started = time.perf_counter()
+        data = loads(content)
+        STATS.parse_seconds += time.perf_counter() - started
+        STATS.parsed += 1
+        STATS.bytes += len(content)
+        response._parsed_json = data
+    else:
+        STATS.hits += 1
+    return data
+
+
+def sampled():
+    """Нужно ли проверять содержимое этого ответа"""
+    if SAMPLE_RATE >= 1.0 or random.random() < SAMPLE_RATE:
+        STATS.validated += 1
+        return True
+    STATS.skipped += 1
+    return False
+
+
+def missing_keys(response, keys):
+    """Обязательные ключи, которых нет в ответе (для списка - в первом элементе)"""
+    try:
+        data = parse(response)
+    except ValueError:
+        return ["<не JSON>"]
+    if isinstance(data, list):
+        if not data:
+            return []
+        data = data[0]
+    if not isinstance(data, dict):
+        return list(keys)
+    return [key for key in keys if key not in data]
+
+
+@events.init_command_line_parser.add_listener
+def _(parser):
+    parser.add_argument(
+        "--validate-sample",
+        type=float,
+        default=0.01,
+        help="Доля ответов, содержимое которых проверяется по полю validate сценария (1 - все)",
+    )
+
+
+@events.init.add_listener
+def _(environment, **kwargs):
+    global SAMPLE_RATE
+    if environment.parsed_options is not None:
+        SAMPLE_RATE = environment.parsed_options.validate_sample
+
+
+@events.report_to_master.add_listener
+def _(client_id, data):
+    if STATS.parsed or STATS.hits or STATS.skipped:
+        data["response_json"] = STATS.take()
+
+
+@events.worker_report.add_listener
+def _(client_id, data):
+    if "response_json" in data:
+        STATS.merge(data["response_json"])
+
+
+@events.reset_stats.add_listener
+def _():
+    STATS.reset()
+
+
+@events.quitting.add_listener
+def _(environment, **kwargs):
+    if (STATS.parsed or STATS.hits or STATS.skipped) and not isinstance(environment.runner, WorkerRunner):
+        logging.info(f"JSON-ответы: {STATS.summary()}")
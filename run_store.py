@@ -0,0 +1,279 @@
+"""
+Хранилище результатов прогонов и проверка на регрессии.
+
+С ``--run-store DIR`` в конце прогона мастер (или локальный раннер)
+сохраняет в ``DIR/<время>_<--run-label>.egr`` компактный файл: таблицу
+статистики по именам запросов по столбцам (метод, запросов, ошибок,
+запросов/с) и HDR-гистограммы времени ответа (см. hdr_stats.py).
+
+Сравнение с базовым прогоном:
+    python run_store.py compare runs/baseline.egr runs/current.egr
+
+Для каждого запроса (метод и имя) выводятся p50/p90/p99, интенсивность и
+доля ошибок обоих прогонов. Замедление проверяется односторонним критерием
+Манна-Уитни по гистограммам (устойчив к выбросам и не требует
+нормальности), рост ошибок - z-критерием для двух долей. Регрессией
+считается статистически значимое (``--alpha``) и заметное
+(``--min-slowdown``, ``--min-error-increase``) ухудшение, а также падение
+интенсивности запросов больше чем на ``--max-rps-drop``; при регрессиях
+команда завершается с кодом 1 и может служить воротами релиза.
+"""
+import argparse
+import json
+import math
+import os
+import struct
+import sys
+import time
+import zlib
+
+from locust import events
+from locust.runners import WorkerRunner
+
+import hdr_stats
+from hdr_stats import Histogram, decode_histograms, encode_histograms
+
+MAGIC = b"EGR1"
+COLUMNS = ("name", "method", "requests", "failures", "rps")
+
+
+class RunResult:
+    """Итоги одного прогона: столбцы статистики и гистограммы по именам запросов"""
+
+    def __init__(self, meta, columns, histograms):
+        self.meta = meta
+        self.columns = columns
+        self.histograms = histograms
+
+    def rows(self):
+        """Словари по запросам: (method, name) -> {method, requests, failures, rps}"""
+        names = self.columns["name"]
+        return {
+            (self.columns["method"][i], name): {column: self.columns[column][i] for column in COLUMNS[1:]}
+            for i, name in enumerate(names)
+        }
+
+    def encode(self):
+        header = zlib.compress(json.dumps({"meta": self.meta, "columns": self.columns}).encode())
+        return MAGIC + struct.pack(">I", len(header)) + header + encode_histograms(self.histograms)
+
+    @classmethod
+    def decode(cls, data):
+        if data[:4] != MAGIC:
+            raise ValueError("Неизвестный формат файла прогона")
+        (length,) = struct.unpack_from(">I", data, 4)
+        header = json.loads(zlib.decompress(data[8:8 + length]))
+        return cls(header["meta"], header["columns"], decode_histograms(data[8 + length:]))
+
+    @classmethod
+    def read(cls, path):
+        with open(path, "rb") as f:
+            return cls.decode(f.read())
+
+    def write(self, path):
+        with open(path, "wb") as f:
+            f.write(self.encode())
+
+
+def collect(environment, label=""):
+    """Собирает итоги текущего прогона из статистики Locust и HDR-гистограмм"""
+    columns = {column: [] for column in COLUMNS}
+    for (name, method), entry in sorted(environment.stats.entries.items()):
+        columns["name"].append(name)
+        columns["method"].append(method)
+        columns["requests"].append(entry.num_requests)
+        columns["failures"].append(entry.num_failures)
+        columns["rps"].append(round(entry.total_rps, 3))
+
+    # Накопленные гистограммы плюс еще не выгруженный интервал, не трогая сам RECORDER
+    histograms = {}
+    for source in (hdr_stats.RECORDER.total, hdr_stats.RECORDER.interval):
+        for name, histogram in source.items():
+            merged = histograms.get(name)
+            if merged is None:
+                merged = histograms[name] = Histogram(histogram.digits)
+            merged.merge(histogram)
+
+    meta = {
+        "label": label,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "host": environment.host,
+        "user_classes": [user_class.__name__ for user_class in environment.user_classes],
+        "duration": round(environment.stats.total.last_request_timestamp - environment.stats.total.start_time, 1)
+        if environment.stats.total.last_request_timestamp else 0,
+    }
+    return RunResult(meta, columns, histograms)
+
+
+# --- Статистические критерии ---
+
+
+def normal_sf(z):
+    """P(Z > z) для стандартного нормального распределения"""
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+def mann_whitney_greater(baseline, candidate):
+    """
+    Односторонний критерий Манна-Уитни по гистограммам: p-значение гипотезы
+    "значения candidate стохастически больше baseline" (нормальное
+    приближение с поправкой на связи) и вероятность превосходства P(C > B).
+    """
+    n_base, n_cand = baseline.total, candidate.total
+    if not n_base or not n_cand:
+        return 1.0, 0.5
+    base_counts = dict(baseline.items())
+    cand_counts = dict(candidate.items())
+    total = n_base + n_cand
+    rank = 0
+    rank_sum = 0.0
+    ties = 0.0
+    for value in sorted(set(base_counts) | set(cand_counts)):
+        a = base_counts.get(value, 0)
+        b = cand_counts.get(value, 0)
+        t = a + b
+        # Средний ранг для группы совпадающих значений
+        rank_sum += b * (rank + (t + 1) / 2)
+        rank += t
+        ties += t ** 3 - t
+    u = rank_sum - n_cand * (n_cand + 1) / 2
+    mean = n_base * n_cand / 2
+    variance = n_base * n_cand / 12 * ((total + 1) - ties / (total * (total - 1)))
+    superiority = u / (n_base * n_cand)
+    if variance <= 0:
+        return 1.0, superiority
+    return normal_sf((u - mean) / math.sqrt(variance)), superiority
+
+
+def two_proportion_greater(failures_base, n_base, failures_cand, n_cand):
+    """Односторонний z-критерий: p-значение гипотезы "доля ошибок candidate выше" """
+    if not n_base or not n_cand:
+        return 1.0
+    pooled = (failures_base + failures_cand) / (n_base + n_cand)
+    variance = pooled * (1 - pooled) * (1 / n_base + 1 / n_cand)
+    if variance <= 0:
+        return 1.0
+    z = (failures_cand / n_cand - failures_base / n_base) / math.sqrt(variance)
+    return normal_sf(z)
+
+
+def compare(baseline, candidate, alpha=0.01, min_slowdown=0.05, min_error_increase=0.005, max_rps_drop=0.1,
+            names=None):
+    """Строки сравнения по запросам (метод, имя) и список найденных регрессий"""
+    base_rows, cand_rows = baseline.rows(), candidate.rows()
+    lines, regressions = [], []
+    for key in sorted(set(base_rows) & set(cand_rows)):
+        method, name = key
+        if names and name not in names:
+            continue
+        base, cand = base_rows[key], cand_rows[key]
+        line = {"name": name, "method": method}
+        # Гистограммы ведутся по имени запроса (см. hdr_stats.py)
+        base_hist, cand_hist = baseline.histograms.get(name), candidate.histograms.get(name)
+        if base_hist is not None and cand_hist is not None and base_hist.total and cand_hist.total:
+            base_p = base_hist.percentiles((0.5, 0.9, 0.99))
+            cand_p = cand_hist.percentiles((0.5, 0.9, 0.99))
+            p_value, superiority = mann_whitney_greater(base_hist, cand_hist)
+            line.update(
+                {f"p{int(q * 100)}": (base_p[q] / 1000, cand_p[q] / 1000) for q in (0.5, 0.9, 0.99)},
+                mw_p=p_value,
+                superiority=superiority,
+            )
+            slowdown = max(cand_p[q] / base_p[q] - 1 if base_p[q] else 0.0 for q in (0.5, 0.9))
+            if p_value < alpha and slowdown > min_slowdown:
+                regressions.append(f"{method} {name}: медленнее на {slowdown:.1%} (Манн-Уитни p={p_value:.2g})")
+
+        base_rate = base["failures"] / base["requests"] if base["requests"] else 0.0
+        cand_rate = cand["failures"] / cand["requests"] if cand["requests"] else 0.0
+        error_p = two_proportion_greater(base["failures"], base["requests"], cand["failures"], cand["requests"])
+        line.update(errors=(base_rate, cand_rate), errors_p=error_p, rps=(base["rps"], cand["rps"]))
+        if error_p < alpha and cand_rate - base_rate > min_error_increase:
+            regressions.append(f"{method} {name}: доля ошибок {base_rate:.2%} -> {cand_rate:.2%} (p={error_p:.2g})")
+        if base["rps"] and cand["rps"] < base["rps"] * (1 - max_rps_drop):
+            regressions.append(
+                f"{method} {name}: интенсивность {base['rps']:.1f} -> {cand['rps']:.1f} запросов/с "
+                f"({cand['rps'] / base['rps'] - 1:+.1%})"
+            )
+        lines.append(line)
+    return lines, regressions
+
+
+def print_comparison(lines):
+    print(f"{'Method':<8} {'Name':<32} {'p50, ms':>17} {'p90, ms':>17} {'p99, ms':>17} {'MW p':>8} {'errors':>15} {'req/s':>15}")
+    for line in lines:
+        cells = []
+        for key in ("p50", "p90", "p99"):
+            base, cand = line.get(key, (None, None))
+            cells.append(f"{base:>8.1f}/{cand:<8.1f}" if base is not None else f"{'-':>17}")
+        mw = f"{line['mw_p']:>8.2g}" if "mw_p" in line else f"{'-':>8}"
+        errors = f"{line['errors'][0]:>6.2%}/{line['errors'][1]:<7.2%}"
+        rps = f"{line['rps'][0]:>7.1f}/{line['rps'][1]:<7.1f}"
+        print(f"{line['method']:<8} {line['name'][:32]:<32} {' '.join(cells)} {mw} {errors} {rps}")
+
+
+@events.init_command_line_parser.add_listener
+def _(parser):
+    parser.add_argument("--run-store", default="", help="Каталог, куда сохранять итоги прогона для сравнения")
+    parser.add_argument("--run-label", default="", help="Метка прогона в имени файла, например версия сборки")
+
+
+@events.quitting.add_listener
+def _(environment, **kwargs):
+    options = environment.parsed_options
+    if options is None or not options.run_store or isinstance(environment.runner, WorkerRunner):
+        return
+    os.makedirs(options.run_store, exist_ok=True)
+    suffix = f"_{options.run_label}" if options.run_label else ""
+    path = os.path.join(options.run_store, f"{time.strftime('%Y%m%d-%H%M%S')}{suffix}.egr")
+    collect(environment, options.run_label).write(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Прогоны English Gang: просмотр и проверка на регрессии")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    compare_parser = subparsers.add_parser("compare", help="Сравнить прогон с базовым")
+    compare_parser.add_argument("baseline", help="Файл базового прогона (.egr)")
+    compare_parser.add_argument("candidate", help="Файл проверяемого прогона (.egr)")
+    compare_parser.add_argument("--name", action="append", default=[], help="Проверять только эти имена запросов")
+    compare_parser.add_argument("--alpha", type=float, default=0.01, help="Уровень значимости")
+    compare_parser.add_argument("--min-slowdown", type=float, default=0.05,
+                                help="Минимальное относительное замедление p50/p90, считающееся регрессией")
+    compare_parser.add_argument("--min-error-increase", type=float, default=0.005,
+                                help="Минимальный абсолютный рост доли ошибок, считающийся регрессией")
+    compare_parser.add_argument("--max-rps-drop", type=float, default=0.1,
+                                help="Относительное падение интенсивности запросов, считающееся регрессией")
+
+    show_parser = subparsers.add_parser("show", help="Показать итоги прогона")
+    show_parser.add_argument("path")
+
+    args = parser.parse_args()
+    if args.command == "show":
+        run = RunResult.read(args.path)
+        print(json.dumps(run.meta, ensure_ascii=False))
+        for (_, name), row in run.rows().items():
+            histogram = run.histograms.get(name)
+            p99 = f"{histogram.value_at(0.99) / 1000:.1f}" if histogram is not None and histogram.total else "-"
+            print(f"{row['method']:<8} {name[:40]:<40} {row['requests']:>9} {row['failures']:>7} {row['rps']:>9.1f} p99 {p99}")
+        return
+
+    lines, regressions = compare(
+        RunResult.read(args.baseline),
+        RunResult.read(args.candidate),
+        alpha=args.alpha,
+        min_slowdown=args.min_slowdown,
+        min_error_increase=args.min_error_increase,
+        max_rps_drop=args.max_rps_drop,
+        names=set(args.name),
+    )
+    print_comparison(lines)
+    if regressions:
+        print("\nРегрессии:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print("\nРегрессий не найдено")
+
+
+if __name__ == "__main__":
+    main()
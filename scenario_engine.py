@@ -0,0 +1,435 @@
+"""
+Декларативный движок сценариев English Gang.
+
+Эндпоинты, веса, теги, требования к авторизации и ожидаемые статусы
+описываются таблицей в YAML или JSON (каталог ``scenarios/``) и
+компилируются в задачи Locust. Для каждой записи заранее вычисляются имя,
+метод, шаблон пути и множество ожидаемых статусов, поэтому задача
+сводится к одному вызову клиента и проверке статуса. Словарь
+``{задача: вес}`` Locust разворачивает в готовую таблицу выбора задач.
+
+Запросы, которым нужен код (обновление студента, регистрация и т.д.),
+описываются полем ``action`` и реализуются функциями с декоратором
+``@action``.
+"""
+import json
+import logging
+import os
+import random
+import uuid
+
+from locust import User, between, constant, constant_pacing, constant_throughput, events, tag
+
+import cluster_data
+import identities
+import page_load
+import response_json
+from seed_data import IdIndex
+from student_snapshot import READ_BEFORE_WRITE_NAME, read_before_write, snapshot_after_update, student_update
+from token_pool import TOKEN_POOL
+
+try:
+    import yaml
+except ImportError:  # PyYAML не входит в зависимости Locust
+    yaml = None
+
+SCENARIO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scenarios")
+
+WAIT_TIMES = {
+    "between": between,
+    "constant": constant,
+    "constant_pacing": constant_pacing,
+    "constant_throughput": constant_throughput,
+}
+
+# Зарегистрированные действия: имя -> функция(user, endpoint)
+ACTIONS = {}
+
+# Id загруженных seed_data.py сущностей: "student"/"teacher" -> IdIndex (см. --seed-dir)
+SEED_IDS = {}
+
+
+def action(name):
+    """Регистрирует функцию как действие, на которое можно сослаться из таблицы сценария"""
+    def decorator(func):
+        ACTIONS[name] = func
+        return func
+    return decorator
+
+
+class _UserFields:
+    """Подстановка атрибутов пользователя в шаблон пути: /api/students/{user_id}"""
+
+    __slots__ = ("user",)
+
+    def __init__(self, user):
+        self.user = user
+
+    def __getitem__(self, key):
+        return getattr(self.user, key)
+
+
+class Endpoint:
+    """Одна строка таблицы сценария с заранее вычисленными параметрами запроса"""
+
+    def __init__(self, spec):
+        self.task = spec["task"]
+        self.name = spec["name"]
+        self.method = spec.get("method", "GET").upper()
+        self.path = spec.get("path", "")
+        self.templated = "{" in self.path
+        self.weight = int(spec.get("weight", 1))
+        self.tags = tuple(spec.get("tags", ()))
+        self.auth = bool(spec.get("auth", False))
+        self.requires = tuple(spec.get("requires", ()))
+        self.role = spec.get("role")
+        self.expect = frozenset(spec.get("expect", (200,)))
+        self.error = spec.get("error", f"Ошибка запроса {self.name}")
+        self.error_body = bool(spec.get("error_body", False))
+        self.store = spec.get("store")
+        # Обязательные ключи тела ответа; проверяются на доле ответов --validate-sample
+        self.validate = tuple(spec.get("validate", ()))
+        # Страница сайта: с --page-load загружается вместе с CSS, JS и картинками
+        self.page = bool(spec.get("page", False))
+        self.params = spec.get("params", {})
+        self.action = spec.get("action")
+        if self.action is not None and self.action not in ACTIONS:
+            raise ValueError(f"Неизвестное действие '{self.action}' в задаче {self.task}")
+
+    def applicable(self, user):
+        """Проверки, которые раньше делались в начале каждой задачи"""
+        if self.role is not None and user.role != self.role:
+            return False
+        if self.auth and not user.token:
+            return False
+        for attribute in self.requires:
+            if not getattr(user, attribute):
+                return False
+        return True
+
+    def request(self, user, path=None, **kwargs):
+        """Запрос с catch_response и именем эндпоинта; используется как контекстный менеджер"""
+        if path is None:
+            path = self.path.format_map(_UserFields(user)) if self.templated else self.path
+        if self.auth:
+            kwargs["headers"] = user.auth_headers()
+        return user.client.request(self.method, path, name=self.name, catch_response=True, **kwargs)
+
+    def check(self, response, user=None):
+        """
+        Отмечает ответ успешным или неуспешным по списку ожидаемых статусов.
+        На 401 эндпоинта с авторизацией токен пользователя ``user`` сбрасывается в пуле
+        """
+        if response.status_code in self.expect:
+            if self.validate and response_json.sampled():
+                missing = response_json.missing_keys(response, self.validate)
+                if missing:
+                    response.failure(f"{self.error}: в ответе нет {', '.join(missing)}")
+                    return False
+            response.success()
+            return True
+        if response.status_code == 401 and self.auth and user is not None:
+            user.token_rejected()
+        if self.error_body:
+            response.failure(f"{self.error}: {response.status_code}, {response.text}")
+        else:
+            response.failure(f"{self.error}: {response.status_code}")
+        return False
+
+    def perform(self, user):
+        if self.page and page_load.ENABLED:
+            page_load.load_page(user, self)
+            return
+        with self.request(user) as response:
+            if self.check(response, user) and self.store:
+                setattr(user, self.store, response_json.parse(response))
+
+    def execute(self, user):
+        """Выполняет запрос эндпоинта: зарегистрированным действием или напрямую"""
+        if self.action:
+            ACTIONS[self.action](user, self)
+        else:
+            self.perform(user)
+
+    def compile(self):
+        """Создает функцию-задачу Locust с тегами эндпоинта"""
+        handler = ACTIONS[self.action] if self.action else None
+        endpoint = self
+
+        if handler is None:
+            def run(user):
+                if endpoint.applicable(user):
+                    endpoint.perform(user)
+        else:
+            def run(user):
+                if endpoint.applicable(user):
+                    handler(user, endpoint)
+
+        run.__name__ = run.__qualname__ = self.task
+        run.__doc__ = self.name
+        return tag(*self.tags)(run) if self.tags else run
+
+
+class Scenario:
+    """Загруженная таблица сценария: задачи, время ожидания и учетные записи"""
+
+    def __init__(self, spec, source=None):
+        self.spec = spec
+        self.source = source
+        self.endpoints = [Endpoint(entry) for entry in spec["endpoints"]]
+        self.tasks = {endpoint.compile(): endpoint.weight for endpoint in self.endpoints if endpoint.weight > 0}
+
+        wait = spec.get("wait_time", {"between": [1.0, 5.0]})
+        (kind, args), = wait.items()
+        self.wait_time = WAIT_TIMES[kind](*(args if isinstance(args, list) else [args]))
+
+        self.accounts = spec.get("accounts", [])
+        self._account_weights = [float(account.get("weight", 1)) for account in self.accounts]
+
+    def endpoint(self, name):
+        for endpoint in self.endpoints:
+            if endpoint.name == name:
+                return endpoint
+        raise KeyError(name)
+
+    def task_endpoint(self, task):
+        for endpoint in self.endpoints:
+            if endpoint.task == task:
+                return endpoint
+        raise KeyError(task)
+
+    def choose_account(self):
+        return random.choices(self.accounts, weights=self._account_weights)[0]
+
+
+def load_scenario(path):
+    """Загружает сценарий из YAML/JSON; относительные пути ищутся в каталоге scenarios/"""
+    if not os.path.isabs(path) and not os.path.exists(path):
+        path = os.path.join(SCENARIO_DIR, path)
+    with open(path, encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            if yaml is None:
+                raise RuntimeError(f"Для чтения {path} нужен PyYAML (pip install pyyaml) либо сценарий в JSON")
+            spec = yaml.safe_load(f)
+        else:
+            spec = json.load(f)
+    return Scenario(spec, source=path)
+
+
+class ScenarioUser(User):
+    """
+    Базовый пользователь English Gang, задачи которого берутся из таблицы сценария.
+
+    Подклассы задают ``scenario``, ``tasks = scenario.tasks`` и
+    ``wait_time = scenario.wait_time`` и подмешивают HttpUser или FastHttpUser.
+    """
+
+    abstract = True
+    scenario = None
+
+    # Данные авторизации из общего пула токенов
+    credentials = None
+    account = None
+    role = None
+    user_id = None
+    teacher_id = None
+    # Снимок данных студента для PUT-запросов
+    student = None
+    # Плановое время старта задачи в открытой модели (см. arrival_rate.py)
+    intended_start = None
+    # Состояние маршрута, по которому сейчас идет пользователь (см. journeys.py)
+    journey = None
+    # HTTP-кэш браузера пользователя для --page-load
+    page_cache = None
+
+    # Ключ учетной записи, выданной identities.IDENTITIES
+    _identity = None
+    _auth_token = None
+    _auth_headers = None
+
+    @property
+    def token(self):
+        """Актуальный токен; при истечении срока действия обновляется через пул"""
+        if self.credentials is None:
+            return None
+        if not self.credentials.is_fresh(TOKEN_POOL.refresh_margin):
+            self.credentials = (
+                TOKEN_POOL.acquire(self.client, self.account["username"], self.account["password"])
+                or self.credentials
+            )
+        return self.credentials.access_token
+
+    @property
+    def is_manager(self):
+        return self.role == "manager"
+
+    @property
+    def random_student_id(self):
+        """Случайный студент из загруженных данных, иначе собственный id"""
+        index = SEED_IDS.get("student")
+        return index.random() if index else self.user_id
+
+    @property
+    def random_teacher_id(self):
+        """Случайный преподаватель из загруженных данных, иначе преподаватель пользователя"""
+        index = SEED_IDS.get("teacher")
+        return index.random() if index else self.teacher_id
+
+    @property
+    def created_student_id(self):
+        """Студент, созданный за тест любым воркером (см. cluster_data.py)"""
+        return cluster_data.random_created("student")
+
+    @property
+    def created_teacher_id(self):
+        """Преподаватель, созданный за тест любым воркером"""
+        return cluster_data.random_created("teacher")
+
+    def token_rejected(self):
+        """Сервер отклонил токен (401): следующий запрос с авторизацией получит новый через пул"""
+        if self.credentials is not None:
+            TOKEN_POOL.invalidate(self.account["username"], self.credentials.access_token)
+
+    def auth_headers(self):
+        """Заголовок Authorization; словарь пересоздается только при смене токена"""
+        token = self.token
+        if token != self._auth_token:
+            self._auth_token = token
+            self._auth_headers = {"Authorization": f"Bearer {token}"}
+        return self._auth_headers
+
+    def context(self):
+        """
+        Контекст события request: плановое время старта (только с первым
+        запросом задачи) и состояние текущего маршрута (см. journeys.py)
+        """
+        context = {}
+        if self.intended_start is not None:
+            context["intended_start"] = self.intended_start
+            self.intended_start = None
+        if self.journey is not None:
+            context["journey"] = self.journey
+        return context
+
+    def on_start(self):
+        """Действия при старте тестирования - авторизуемся под учетной записью из сценария"""
+        if not self.scenario.accounts:
+            return
+        try:
+            self.account = self.scenario.choose_account()
+            self.role = self.account.get("role", "student")
+            # Запись этой роли из --identity-file вместо общей для всех учетной записи сценария
+            if identities.IDENTITIES is not None:
+                acquired = identities.IDENTITIES.acquire(self.role)
+                if acquired is not None:
+                    self.account, self._identity = acquired
+            # Токен и профиль берутся из общего пула: HTTP-запросы выполняются один раз на учетную запись
+            self.credentials = TOKEN_POOL.acquire(self.client, self.account["username"], self.account["password"])
+            if self.credentials is not None:
+                self.user_id = self.credentials.user_id
+                if self.role == "student":
+                    self.teacher_id = self.credentials.teacher_id
+                logging.info(f"Успешная авторизация как {self.role}. User ID: {self.user_id}, Teacher ID: {self.teacher_id}")
+        except Exception as e:
+            logging.error(f"Ошибка при авторизации: {str(e)}")
+
+    def on_stop(self):
+        if self._identity is not None:
+            identities.IDENTITIES.release(self._identity)
+            self._identity = None
+
+
+# --- Действия English Gang ---
+
+
+@action("update_student")
+def update_student(user, endpoint):
+    """PUT студента по локальному снимку; GET только при первом обращении или с --read-before-write"""
+    if user.student is None or read_before_write(user.environment):
+        with user.client.get(
+            f"/api/students/{user.user_id}",
+            headers=user.auth_headers(),
+            catch_response=True,
+            name=READ_BEFORE_WRITE_NAME,
+        ) as response:
+            if response.status_code != 200:
+                if response.status_code == 401:
+                    user.token_rejected()
+                response.failure(f"Не удалось получить информацию о студенте: {response.status_code}")
+                return
+            user.student = response_json.parse(response)
+
+    # Небольшое изменение словарного запаса
+    update_data = student_update(user.student, random.randint(-10, 10), user.account["password"])
+    with endpoint.request(user, json=update_data) as response:
+        if endpoint.check(response, user):
+            user.student = snapshot_after_update(response, update_data)
+        else:
+            # Снимок мог устареть: в следующий раз перечитаем студента
+            user.student = None
+
+
+@action("login_attempt")
+def login_attempt(user, endpoint):
+    """POST /api/token со случайными учетными данными из params.credentials"""
+    with endpoint.request(user, data=random.choice(endpoint.params["credentials"])) as response:
+        endpoint.check(response)
+
+
+@action("register_student")
+def register_student(user, endpoint):
+    """Регистрация студента со случайными данными"""
+    unique_id = uuid.uuid4().hex[:8]
+    student_data = {
+        "first_name": f"Test{unique_id}",
+        "last_name": f"Student{unique_id}",
+        "age": random.randint(18, 45),
+        "sex": random.choice(["M", "F"]),
+        "email": f"test.student{unique_id}@example.com",
+        "level": random.choice(["A1", "A2", "B1", "B2", "C1", "C2"]),
+        "vocabulary": random.randint(500, 3000),
+        "teacher_id": SEED_IDS["teacher"].random() if SEED_IDS.get("teacher") else endpoint.params.get("teacher_id", 1),
+        "password": "testpassword123",
+    }
+    with endpoint.request(user, json=student_data) as response:
+        if endpoint.check(response, user):
+            cluster_data.record_created("student", response_json.parse(response)["id"])
+
+
+@action("create_teacher")
+def create_teacher(user, endpoint):
+    """Создание преподавателя со случайными данными"""
+    unique_id = uuid.uuid4().hex[:8]
+    teacher_data = {
+        "first_name": f"Teacher{unique_id}",
+        "last_name": f"Last{unique_id}",
+        "age": random.randint(25, 60),
+        "sex": random.choice(["M", "F"]),
+        "qualification": random.choice(["B2", "C1", "C2"]),
+        "email": f"teacher{unique_id}@example.com",
+        "password": "teacherpass123",
+    }
+    with endpoint.request(user, json=teacher_data) as response:
+        if endpoint.check(response, user):
+            cluster_data.record_created("teacher", response_json.parse(response)["id"])
+
+
+@events.init_command_line_parser.add_listener
+def _(parser):
+    parser.add_argument(
+        "--seed-dir",
+        default="",
+        help="Каталог с teacher_ids.u32/student_ids.u32 из seed_data.py для выбора существующих id",
+    )
+
+
+@events.init.add_listener
+def _(environment, **kwargs):
+    options = environment.parsed_options
+    if options is None or not options.seed_dir:
+        return
+    for kind in ("student", "teacher"):
+        path = os.path.join(options.seed_dir, f"{kind}_ids.u32")
+        if os.path.exists(path):
+            SEED_IDS[kind] = IdIndex(path)
+            logging.info(f"Загружено {len(SEED_IDS[kind])} id ({kind}) из {path}")
@@ -0,0 +1,31 @@
+"""
+Произвольная смесь запросов English Gang без изменения кода.
+
+Путь к таблице сценария берется из переменной окружения SCENARIO_FILE
+(по умолчанию scenarios/all_requests.yaml), клиент - из SCENARIO_CLIENT
+(requests или fasthttp):
+
+    SCENARIO_FILE=my_mix.yaml SCENARIO_CLIENT=fasthttp locust -f scenario_mix.py
+"""
+import os
+
+from locust import FastHttpUser, HttpUser
+
+import arrival_rate  # noqa: F401 - открытая модель нагрузки (--arrival-profile)
+import generator_health  # noqa: F401 - самоконтроль генератора нагрузки
+import hdr_stats  # noqa: F401 - HDR-гистограммы по именам запросов
+import run_store  # noqa: F401 - сохранение итогов прогона (--run-store)
+import timing_breakdown  # noqa: F401 - фазы запросов (--timing-breakdown)
+import tracing  # noqa: F401 - X-Request-ID и traceparent (--trace)
+from scenario_engine import ScenarioUser, load_scenario
+
+SCENARIO = load_scenario(os.environ.get("SCENARIO_FILE", "all_requests.yaml"))
+CLIENT_USER = FastHttpUser if os.environ.get("SCENARIO_CLIENT") == "fasthttp" else HttpUser
+
+
+class EnglishGangScenarioUser(ScenarioUser, CLIENT_USER):
+    """Пользователь English Gang со смесью запросов из SCENARIO_FILE"""
+
+    scenario = SCENARIO
+    tasks = SCENARIO.tasks
+    wait_time = SCENARIO.wait_time
@@ -0,0 +1,354 @@
+"""
+Предварительная генерация и массовая загрузка тестовых данных English Gang.
+
+Чтобы нагружать чтение на реалистичном объеме данных (100k студентов, 5k
+преподавателей), данные сначала генерируются в компактные файлы, а затем
+загружаются через API пулом потоков с повторами и отчетом о прогрессе:
+
+    python seed_data.py generate --students 100000 --teachers 5000 --out seed
+    python seed_data.py load --host http://127.0.0.1:8089 --out seed --concurrency 32
+
+После загрузки в каталоге лежат:
+
+  * ``teacher_ids.u32`` и ``student_ids.u32`` - id созданных сущностей
+    (массив uint32), которые пользователи Locust читают через mmap
+    (``IdIndex``, опция ``--seed-dir``) вместо захардкоженного ``teacher_id: 1``;
+  * ``accounts.csv`` - учетные записи созданных студентов и преподавателей.
+"""
+import argparse
+import csv
+import gzip
+import logging
+import mmap
+import os
+import random
+import sys
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+FIRST_NAMES = ("Alice", "Bob", "Maria", "Ivan", "Olga", "Peter", "Anna", "Dmitry", "Elena", "Sergey", "Kate", "Nick")
+LAST_NAMES = ("Smith", "Brown", "Ivanov", "Petrova", "Green", "Sokolov", "White", "Kuznetsova", "Black", "Orlov")
+LEVELS = ("A1", "A2", "B1", "B2", "C1", "C2")
+QUALIFICATIONS = ("B2", "C1", "C2")
+
+TEACHER_FIELDS = ("first_name", "last_name", "age", "sex", "qualification", "email", "password")
+STUDENT_FIELDS = ("first_name", "last_name", "age", "sex", "email", "level", "vocabulary", "teacher_index", "password")
+
+# Статусы, при которых запрос стоит повторить
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+
+
+class IdIndex:
+    """
+    Id созданных сущностей, отображенные в память (массив uint32).
+
+    Файл не читается целиком: страницы подгружаются ОС по мере обращения,
+    и все процессы на машине разделяют одну копию.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        if size:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.ids = memoryview(self._mmap).cast("I")
+        else:
+            self._mmap = None
+            self.ids = ()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def random(self, rng=random):
+        return self.ids[rng.randrange(len(self.ids))]
+
+    @staticmethod
+    def write(path, ids):
+        with open(path, "wb") as f:
+            array("I", ids).tofile(f)
+
+
+def generate(out_dir, students, teachers, seed=None):
+    """Генерирует преподавателей и студентов в teachers.csv.gz и students.csv.gz"""
+    rng = random.Random(seed)
+    run_tag = f"{rng.getrandbits(32):08x}"
+    os.makedirs(out_dir, exist_ok=True)
+
+    with gzip.open(os.path.join(out_dir, "teachers.csv.gz"), "wt", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(TEACHER_FIELDS)
+        for number in range(teachers):
+            writer.writerow((
+                rng.choice(FIRST_NAMES),
+                rng.choice(LAST_NAMES),
+                rng.randint(25, 60),
+                rng.choice("MF"),
+                rng.choice(QUALIFICATIONS),
+                f"teacher{number}.{run_tag}@seed.example.com",
+                "seedteacher123",
+            ))
+
+    with gzip.open(os.path.join(out_dir, "students.csv.gz"), "wt", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(STUDENT_FIELDS)
+        for number in range(students):
+            writer.writerow((
+                rng.choice(FIRST_NAMES),
+                rng.choice(LAST_NAMES),
+                rng.randint(18, 45),
+                rng.choice("MF"),
+                f"student{number}.{run_tag}@seed.example.com",
+                rng.choice(LEVELS),
+                rng.randint(500, 3000),
+                rng.randrange(teachers),
+                "seedstudent123",
+            ))
+    logging.info(f"Сгенерировано {teachers} преподавателей и {students} студентов в {out_dir}")
+
+
+def read_records(path):
+    with gzip.open(path, "rt", newline="") as f:
+        yield from csv.DictReader(f)
+
+
+class Progress:
+    """Периодический отчет о ходе загрузки"""
+
+    def __init__(self, label, total, interval=2.0):
+        self.label = label
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self.failed = 0
+        self.retries = 0
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def add(self, ok):
+        with self._lock:
+            self.done += 1
+            if not ok:
+                self.failed += 1
+
+    def add_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def report(self):
+        elapsed = max(time.time() - self.started, 1e-6)
+        rate = self.done / elapsed
+        eta = (self.total - self.done) / rate if rate else 0
+        logging.info(
+            f"{self.label}: {self.done}/{self.total} ({self.done / max(self.total, 1):.1%}), "
+            f"{rate:.0f}/с, ошибок {self.failed}, повторов {self.retries}, осталось ~{eta:.0f} с"
+        )
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.report()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.report()
+
+
+class BulkLoader:
+    """Создание сущностей через API пулом потоков с повторами"""
+
+    def __init__(self, host, username, password, concurrency=32, retries=5):
+        # requests входит в зависимости Locust; импортируем здесь, чтобы generate работал и без него
+        import requests
+
+        self.requests = requests
+        self.host = host.rstrip("/")
+        self.username = username
+        self.password = password
+        self.concurrency = concurrency
+        self.retries = retries
+        self._local = threading.local()
+        self._token_lock = threading.Lock()
+        self._token = None
+        self.login()
+
+    def session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = self.requests.Session()
+        return session
+
+    def login(self, stale_token=None):
+        with self._token_lock:
+            # Токен уже обновил другой поток
+            if stale_token is not None and self._token != stale_token:
+                return
+            response = self.requests.post(
+                f"{self.host}/api/token", data={"username": self.username, "password": self.password}
+            )
+            response.raise_for_status()
+            self._token = response.json()["access_token"]
+
+    def get(self, path):
+        """GET с авторизацией; возвращает разобранный JSON или None"""
+        for _ in range(2):
+            token = self._token
+            response = self.session().get(f"{self.host}{path}", headers={"Authorization": f"Bearer {token}"}, timeout=30)
+            if response.status_code == 401:
+                self.login(stale_token=token)
+                continue
+            if response.status_code == 200:
+                return response.json()
+            break
+        logging.warning(f"Не удалось получить {path}: {response.status_code}")
+        return None
+
+    def create(self, path, payload, progress):
+        """POST с повторами; возвращает id созданной сущности или None"""
+        for attempt in range(self.retries + 1):
+            token = self._token
+            try:
+                response = self.session().post(
+                    f"{self.host}{path}", json=payload, headers={"Authorization": f"Bearer {token}"}, timeout=30
+                )
+            except self.requests.RequestException as e:
+                status, detail = None, str(e)
+            else:
+                if response.status_code == 200:
+                    return response.json()["id"]
+                status, detail = response.status_code, response.text[:200]
+                if status == 401:
+                    self.login(stale_token=token)
+                    continue
+                if status not in RETRY_STATUSES:
+                    break
+            if attempt < self.retries:
+                progress.add_retry()
+                time.sleep(min(5.0, 0.1 * 2 ** attempt) * (0.5 + random.random()))
+        logging.warning(f"Не удалось создать {payload.get('email')}: {status}, {detail}")
+        return None
+
+    def load(self, path, records, total, label, build_payload):
+        """
+        Загружает записи, не держа в очереди больше 2 * concurrency задач; возвращает id по порядку.
+        Исключения задач не теряются: после загрузки они завершают работу с SystemExit
+        """
+        ids = [0] * total
+        slots = threading.BoundedSemaphore(self.concurrency * 2)
+        pending = set()
+        errors = []
+
+        def collect(futures):
+            for future in futures:
+                pending.discard(future)
+                error = future.exception()
+                if error is not None:
+                    errors.append(error)
+
+        with Progress(label, total) as progress, ThreadPoolExecutor(self.concurrency) as executor:
+            def submit(position, record):
+                def work():
+                    try:
+                        entity_id = self.create(path, build_payload(record), progress)
+                        if entity_id is not None:
+                            ids[position] = entity_id
+                        progress.add(entity_id is not None)
+                    except Exception:
+                        progress.add(False)
+                        raise
+                    finally:
+                        slots.release()
+
+                slots.acquire()
+                pending.add(executor.submit(work))
+                # Завершенные задачи проверяем сразу, чтобы не копить их до конца загрузки
+                collect([future for future in pending if future.done()])
+
+            for position, record in enumerate(records):
+                submit(position, record)
+            collect(as_completed(list(pending)))
+
+        if errors:
+            raise SystemExit(f"{label}: {len(errors)} записей не загружены из-за ошибок, первая: {errors[0]!r}")
+        return ids
+
+
+def count_records(path):
+    with gzip.open(path, "rt") as f:
+        return sum(1 for _ in f) - 1
+
+
+def load(out_dir, host, username, password, concurrency, retries):
+    loader = BulkLoader(host, username, password, concurrency=concurrency, retries=retries)
+    teachers_path = os.path.join(out_dir, "teachers.csv.gz")
+    students_path = os.path.join(out_dir, "students.csv.gz")
+
+    def teacher_payload(record):
+        return dict(record, age=int(record["age"]))
+
+    teacher_ids = loader.load(
+        "/api/teachers/", read_records(teachers_path), count_records(teachers_path), "Преподаватели", teacher_payload
+    )
+    created_teachers = [teacher_id for teacher_id in teacher_ids if teacher_id]
+    if not created_teachers:
+        raise SystemExit("Не создано ни одного преподавателя, студентов загружать не к кому")
+
+    def student_payload(record):
+        payload = {field: record[field] for field in STUDENT_FIELDS if field != "teacher_index"}
+        payload["age"] = int(record["age"])
+        payload["vocabulary"] = int(record["vocabulary"])
+        # Если нужный преподаватель не создался, берем любого созданного
+        payload["teacher_id"] = teacher_ids[int(record["teacher_index"])] or created_teachers[0]
+        return payload
+
+    student_ids = loader.load(
+        "/api/students/", read_records(students_path), count_records(students_path), "Студенты", student_payload
+    )
+
+    IdIndex.write(os.path.join(out_dir, "teacher_ids.u32"), created_teachers)
+    IdIndex.write(os.path.join(out_dir, "student_ids.u32"), [student_id for student_id in student_ids if student_id])
+    with open(os.path.join(out_dir, "accounts.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(("username", "password", "role", "id"))
+        for path, ids, role in ((teachers_path, teacher_ids, "teacher"), (students_path, student_ids, "student")):
+            for record, entity_id in zip(read_records(path), ids):
+                if entity_id:
+                    writer.writerow((record["email"], record["password"], role, entity_id))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Генерация и загрузка тестовых данных English Gang")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = subparsers.add_parser("generate", help="Сгенерировать данные в файлы")
+    generate_parser.add_argument("--students", type=int, default=100000)
+    generate_parser.add_argument("--teachers", type=int, default=5000)
+    generate_parser.add_argument("--seed", type=int, help="Seed генератора для воспроизводимых данных")
+    generate_parser.add_argument("--out", default="seed", help="Каталог с данными")
+
+    load_parser = subparsers.add_parser("load", help="Загрузить сгенерированные данные через API")
+    load_parser.add_argument("--host", required=True, help="Адрес English Gang, например http://127.0.0.1:8089")
+    load_parser.add_argument("--out", default="seed", help="Каталог с данными")
+    load_parser.add_argument("--username", default="admin@example.com", help="Учетная запись менеджера")
+    load_parser.add_argument("--password", default="admin123")
+    load_parser.add_argument("--concurrency", type=int, default=32, help="Число параллельных запросов")
+    load_parser.add_argument("--retries", type=int, default=5, help="Повторов на запрос при 5xx/429/ошибках сети")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s", stream=sys.stdout)
+    if args.command == "generate":
+        generate(args.out, args.students, args.teachers, seed=args.seed)
+    else:
+        load(args.out, args.host, args.username, args.password, args.concurrency, args.retries)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Кэш данных студента для update_student_info.
+
+Раньше перед каждым ``PUT /api/students/{id}`` выполнялся скрытый
+``GET`` только для того, чтобы скопировать те же поля обратно. Теперь
+пользователь хранит снимок студента: он заполняется при первом чтении
+(или из ответа "GET student info") и обновляется из ответа на ``PUT``.
+
+С ``--read-before-write`` GET перед каждым PUT возвращается, но
+учитывается в статистике под именем "GET student before update".
+"""
+from locust import events
+
+from response_json import parse
+
+STUDENT_FIELDS = ("first_name", "last_name", "age", "sex", "email", "level", "vocabulary", "teacher_id")
+
+# Имя в статистике для чтения студента перед обновлением
+READ_BEFORE_WRITE_NAME = "GET student before update"
+
+
+def read_before_write(environment):
+    """Включен ли режим чтения студента перед каждым PUT"""
+    options = environment.parsed_options
+    return bool(options is not None and getattr(options, "read_before_write", False))
+
+
+def student_update(snapshot, vocabulary_delta, password):
+    """
+    Тело PUT-запроса, построенное по локальному снимку студента.
+
+    PUT заменяет профиль целиком, поэтому ``password`` - текущий пароль
+    учетной записи: любой другой сбросил бы его для следующих входов.
+    """
+    update_data = {field: snapshot[field] for field in STUDENT_FIELDS}
+    update_data["vocabulary"] += vocabulary_delta
+    update_data["password"] = password
+    return update_data
+
+
+def snapshot_after_update(response, update_data):
+    """Новый снимок: тело ответа на PUT, если сервер его вернул, иначе отправленные данные"""
+    try:
+        data = parse(response)
+    except ValueError:
+        data = None
+    if isinstance(data, dict) and all(field in data for field in STUDENT_FIELDS):
+        return data
+    return {field: update_data[field] for field in STUDENT_FIELDS}
+
+
+@events.init_command_line_parser.add_listener
+def _(parser):
+    parser.add_argument(
+        "--read-before-write",
+        action="store_true",
+        default=False,
+        help="Запрашивать студента перед каждым PUT (учитывается как 'GET student before update')",
+    )
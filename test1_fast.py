@@ -0,0 +1,11 @@
+from locust import FastHttpUser
+
+from test1 import EnglishGangGETPUTTasks
+
+
+class EnglishGangUserGETPUTFast(EnglishGangGETPUTTasks, FastHttpUser):
+    """
+    Класс для эмуляции пользователя системы English Gang (только GET и PUT запросы)
+    на клиенте geventhttpclient: те же задачи, веса и теги, что в test1.py,
+    но в несколько раз меньше накладных расходов CPU на запрос
+    """
@@ -0,0 +1,11 @@
+from locust import FastHttpUser
+
+from test2 import EnglishGangAllRequestsTasks
+
+
+class EnglishGangUserAllRequestsFast(EnglishGangAllRequestsTasks, FastHttpUser):
+    """
+    Класс для эмуляции пользователя системы English Gang (GET, PUT и POST запросы)
+    на клиенте geventhttpclient: те же задачи, веса и теги, что в test2.py,
+    но в несколько раз меньше накладных расходов CPU на запрос
+    """
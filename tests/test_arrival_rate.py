@@ -0,0 +1,86 @@
+import pytest
+
+import arrival_rate
+import hdr_stats
+from arrival_rate import (
+    ArrivalScheduler, ConstantSchedule, RampSchedule, SpikeSchedule, StepSchedule, parse_profile,
+)
+
+
+def test_parse_constant_and_ramp():
+    assert parse_profile("constant:50").rate(123) == 50
+    ramp = parse_profile("ramp:10:200:100")
+    assert isinstance(ramp, RampSchedule)
+    assert [ramp.rate(t) for t in (0, 50, 100, 500)] == [10, 105, 200, 200]
+
+
+def test_parse_step():
+    step = parse_profile("step:50@60,100@60,200@120")
+    assert isinstance(step, StepSchedule)
+    assert [step.rate(t) for t in (0, 59.9, 60, 119, 120, 1000)] == [50, 50, 100, 100, 200, 200]
+
+
+def test_parse_spike():
+    spike = parse_profile("spike:50:500:120:10")
+    assert isinstance(spike, SpikeSchedule)
+    assert [spike.rate(t) for t in (119, 120, 129.9, 130)] == [50, 500, 500, 50]
+
+
+def test_parse_replay(tmp_path):
+    rates = tmp_path / "rates.csv"
+    rates.write_text("# second,rate\n30,20\n0,5\n")
+    schedule = parse_profile(f"replay:{rates}")
+    assert [schedule.rate(t) for t in (0, 29, 30, 90)] == [5, 5, 20, 20]
+
+
+def test_unknown_profile():
+    with pytest.raises(ValueError):
+        parse_profile("poisson:5")
+
+
+def test_claims_are_spaced_by_rate_and_share():
+    scheduler = ArrivalScheduler(ConstantSchedule(10), share=0.5)
+    scheduler.start()
+    slots = [scheduler.claim() for _ in range(4)]
+    gaps = [round(b - a, 6) for a, b in zip(slots, slots[1:])]
+    assert gaps == [0.2, 0.2, 0.2]
+
+
+def test_zero_rate_does_not_stop_the_schedule():
+    scheduler = ArrivalScheduler(ConstantSchedule(0))
+    first, second = scheduler.claim(), scheduler.claim()
+    assert second - first == pytest.approx(1 / arrival_rate.MIN_RATE)
+
+
+class FakeUser:
+    started = False
+
+    def on_start(self):
+        self.started = True
+
+
+def test_first_task_waits_for_a_slot_and_tasks_are_counted(monkeypatch):
+    scheduler = ArrivalScheduler(ConstantSchedule(1))
+    scheduler.start()
+    monkeypatch.setattr(arrival_rate, "SCHEDULER", scheduler)
+    recorder = hdr_stats.HdrRecorder()
+    monkeypatch.setattr(hdr_stats, "RECORDER", recorder)
+    sleeps = []
+    monkeypatch.setattr(arrival_rate.gevent, "sleep", sleeps.append)
+
+    # Первый слот занимает первый пользователь, второй - с ожиданием около секунды
+    first, user = FakeUser(), FakeUser()
+    arrival_rate.scheduled_start(FakeUser.on_start)(first)
+    arrival_rate.scheduled_start(FakeUser.on_start)(user)
+    assert first.started and user.started
+    assert sleeps[1] == pytest.approx(1.0, abs=0.05)
+    assert user.intended_start == pytest.approx(scheduler.started_at + 1.0)
+    # До первой задачи выполненных задач нет
+    assert arrival_rate.TASK_HISTOGRAM not in recorder.interval
+
+    # gevent.sleep подменен, поэтому считаем, что пользователь доспал до слота и выполнил задачу
+    user.task_started -= 1.5
+    arrival_rate.arrival_wait_time(user)
+    tasks = recorder.interval[arrival_rate.TASK_HISTOGRAM]
+    assert tasks.total == 1
+    assert tasks.min > 0
@@ -0,0 +1,116 @@
+import json
+
+import pytest
+
+import auth_bench
+from auth_bench import AuthStats, incomparable, latest_results, refresh_margin, reuse_gain
+from token_pool import TOKEN_POOL
+
+
+@pytest.fixture
+def margin(monkeypatch):
+    def set_margin(value):
+        monkeypatch.setattr(auth_bench, "REFRESH_MARGIN", value)
+        monkeypatch.setattr(auth_bench, "_margin_warned", False)
+    return set_margin
+
+
+def test_refresh_margin_is_capped_at_half_the_token_lifetime(margin):
+    margin(30.0)
+    assert refresh_margin(1800) == 30.0
+    assert refresh_margin(40) == 20.0
+    margin(0.0)
+    assert refresh_margin(40) == 0.0
+
+
+class FakeResponse:
+    status_code = 200
+    text = ""
+
+    def __init__(self, data=None):
+        self.content = json.dumps(data).encode()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class FakeClient:
+    def __init__(self):
+        self.logins = 0
+
+    def post(self, path, data, name, catch_response):
+        self.logins += 1
+        return FakeResponse({"access_token": f"token-{self.logins}"})
+
+
+class FakeEndpoint:
+    params = {"credentials": [{"username": "alice@example.com", "password": "password123"}]}
+
+    def __init__(self):
+        self.tokens = []
+
+    def request(self, user, headers):
+        self.tokens.append(headers["Authorization"])
+        return FakeResponse()
+
+    def check(self, response):
+        return True
+
+
+class FakeUser:
+    auth_account = None
+    auth_credentials = None
+    auth_refresh_at = 0.0
+
+    def __init__(self):
+        self.client = FakeClient()
+
+
+def test_reuse_does_not_log_in_every_iteration_with_short_tokens(margin, monkeypatch):
+    # Токен живет 40 с, а запас 30 с: без ограничения запаса вход был бы на каждой итерации
+    margin(30.0)
+    monkeypatch.setattr(TOKEN_POOL, "ttl", 40.0)
+    user, endpoint = FakeUser(), FakeEndpoint()
+    for _ in range(5):
+        auth_bench.auth_reuse(user, endpoint)
+    assert user.client.logins == 1
+    assert endpoint.tokens == ["Bearer token-1"] * 5
+
+
+def test_gain_only_for_comparable_runs():
+    fresh = {"host": "http://a", "users": 50, "me_per_second": 100.0}
+    reuse = {"host": "http://a", "users": 50, "me_per_second": 250.0}
+    assert incomparable(fresh, reuse) is None
+    assert reuse_gain(fresh, reuse) == 2.5
+    assert "пользователей" in incomparable(fresh, dict(reuse, users=100))
+    assert "хосты" in incomparable(fresh, dict(reuse, host="http://b"))
+    assert reuse_gain(fresh, dict(reuse, me_per_second=0)) is None
+
+
+def test_latest_results_keeps_last_line_per_profile(tmp_path):
+    path = tmp_path / "auth_results.jsonl"
+    path.write_text(
+        '{"profile": "fresh", "users": 10}\nnot json\n{"profile": "fresh", "users": 20}\n{"profile": "reuse", "users": 20}\n'
+    )
+    latest = latest_results(str(path))
+    assert latest["fresh"]["users"] == 20
+    assert set(latest) == {"fresh", "reuse"}
+    assert latest_results(str(tmp_path / "missing.jsonl")) == {}
+
+
+def test_saturation_is_the_first_window_near_the_peak():
+    stats = AuthStats()
+    stats.windows["fresh"] = [
+        {"users": 0, "rps": 0.0},
+        {"users": 10, "rps": 50.0},
+        {"users": 20, "rps": 96.0},
+        {"users": 30, "rps": 100.0},
+        {"users": 40, "rps": 98.0},
+    ]
+    knee, last = stats.saturation("fresh")
+    assert knee["users"] == 20
+    assert last["users"] == 40
+    assert stats.saturation("invalid") == (None, None)
@@ -0,0 +1,79 @@
+from argparse import Namespace
+
+import pytest
+
+from arrival_rate import TASK_HISTOGRAM
+from capacity_search import CapacitySearch, RunResult, co_corrected_p99, executed_tasks
+from hdr_stats import Histogram, encode_histograms
+
+
+def make_args(**overrides):
+    args = dict(
+        p99_ms=200.0, max_error_rate=0.01, min_achieved=0.9, search="binary", start_rate=10.0,
+        max_rate=10000.0, step=10.0, precision=0.05, min_step=1.0,
+    )
+    args.update(overrides)
+    return Namespace(**args)
+
+
+class FakeSearch(CapacitySearch):
+    """Сервер держит интенсивность до knee задач/с, выше p99 резко растет"""
+
+    def __init__(self, args, knee):
+        super().__init__(args, [])
+        self.knee = knee
+
+    def run(self, rate):
+        p99 = 50.0 if rate <= self.knee else 5000.0
+        result = RunResult(rate, 1000, 0, rate, p99, achieved=rate)
+        result.reason = self.violation(result)
+        self.runs.append(result)
+        return result
+
+
+def test_binary_search_finds_the_knee():
+    search = FakeSearch(make_args(), knee=437)
+    max_rate = search.search()
+    assert 437 * (1 - 0.05) <= max_rate <= 437
+    assert [run.rate for run in search.runs][:7] == [10, 20, 40, 80, 160, 320, 640]
+    assert search.result(max_rate)["max_rate"] == max_rate
+
+
+def test_step_search_stops_at_the_first_violation():
+    search = FakeSearch(make_args(search="step", start_rate=100.0, step=100.0), knee=450)
+    assert search.search() == 400
+    assert [run.rate for run in search.runs] == [100, 200, 300, 400, 500]
+
+
+def test_no_passing_rate():
+    search = FakeSearch(make_args(start_rate=100.0), knee=50)
+    assert search.search() is None
+    assert search.result(None)["max_rps"] is None
+
+
+def test_violation_checks_executed_tasks_not_requests():
+    search = CapacitySearch(make_args(), [])
+    # Задачи менеджера у студентов не отправляют запросов: запросов меньше, чем задач
+    healthy = RunResult(100, 800, 0, 80.0, 20.0, achieved=97.0)
+    assert search.violation(healthy) is None
+    behind = RunResult(100, 800, 0, 80.0, 20.0, achieved=70.0)
+    assert "задач/с" in search.violation(behind)
+    assert "ошибок" in search.violation(RunResult(100, 100, 5, 100.0, 20.0, achieved=100.0))
+
+
+def test_executed_tasks_and_co_p99_from_hdr_file(tmp_path):
+    tasks, corrected, plain = Histogram(), Histogram(), Histogram()
+    for _ in range(250):
+        tasks.record(3000)
+    for value_ms in range(1, 101):
+        corrected.record(value_ms * 1000 * 2)
+        plain.record(value_ms * 1000)
+    path = tmp_path / "run_hdr.bin"
+    path.write_bytes(encode_histograms({
+        TASK_HISTOGRAM: tasks, "GET homepage [CO-corrected]": corrected, "GET homepage": plain,
+    }))
+    assert executed_tasks(str(path)) == 250
+    assert executed_tasks(str(tmp_path / "missing.bin")) == 0
+    # Берется исправленная гистограмма, а не обычная (p99 которой 99 мс)
+    assert co_corrected_p99(str(path), "GET homepage") == pytest.approx(198, rel=0.001)
+    assert co_corrected_p99(str(path), "Aggregated") == pytest.approx(198, rel=0.001)
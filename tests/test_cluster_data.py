@@ -0,0 +1,70 @@
+import json
+import time
+
+import gevent
+
+import token_pool
+from cluster_data import SharedData
+from token_pool import Credentials, TokenPool
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.status_code = 200
+        self.content = json.dumps(data).encode()
+
+
+class FakeClient:
+    def __init__(self):
+        self.logins = 0
+
+    def post(self, path, data):
+        self.logins += 1
+        return FakeResponse({"access_token": f"local{self.logins}"})
+
+    def get(self, path, headers):
+        return FakeResponse({"id": 1})
+
+
+def test_acquire_waits_for_the_cluster_snapshot():
+    pool, client = TokenPool(ttl=600), FakeClient()
+    pool.shared_ready.clear()
+    waiting = gevent.spawn(pool.acquire, client, "alice", "secret")
+    gevent.sleep(0.01)
+    assert not waiting.ready()
+
+    # Снимок мастера принес токен, полученный другим воркером
+    pool.put(Credentials("alice", "from-worker-2", user_id=5, expires_at=time.time() + 600))
+    pool.shared_ready.set()
+    assert waiting.get(timeout=1).access_token == "from-worker-2"
+    assert client.logins == 0
+
+
+def test_acquire_logs_in_itself_when_the_snapshot_is_late(monkeypatch):
+    monkeypatch.setattr(token_pool, "SHARED_WAIT_TIMEOUT", 0.01)
+    pool, client = TokenPool(ttl=600), FakeClient()
+    pool.shared_ready.clear()
+    assert pool.acquire(client, "alice", "secret").access_token == "local1"
+    assert pool.shared_ready.is_set()
+
+
+def test_put_keeps_the_longest_living_token():
+    pool = TokenPool()
+    pool.put(Credentials("alice", "new", expires_at=200.0))
+    pool.put(Credentials("alice", "old", expires_at=100.0))
+    assert pool._entries["alice"].access_token == "new"
+
+
+def test_shared_data_publishes_only_local_additions():
+    shared = SharedData(max_ids=3)
+    shared.publishing = True
+    for entity_id in (1, 2, 3, 4):
+        shared.add_id("student", entity_id)
+    shared.merge({"ids": {"teacher": [7]}, "tokens": [{"username": "bob", "expires_at": 1.0}]})
+
+    assert list(shared.ids["student"]) == [2, 3, 4]
+    assert shared.take_outbox() == {"ids": {"student": [1, 2, 3, 4]}, "tokens": []}
+    assert shared.take_outbox() is None
+    snapshot = shared.snapshot()
+    assert snapshot["ids"]["teacher"] == [7]
+    assert snapshot["tokens"] == [{"username": "bob", "expires_at": 1.0}]
@@ -0,0 +1,74 @@
+import socket
+
+import pytest
+
+import arrival_rate
+import generator_health
+from arrival_rate import ArrivalScheduler, ConstantSchedule
+from generator_health import HealthLog, HealthMonitor, HealthSample
+
+
+class FakeEnvironment:
+    runner = None
+
+
+class OldProcess:
+    """Process из psutil до 6.0: есть только connections"""
+
+    def __init__(self, count):
+        self.count = count
+
+    def connections(self, kind):
+        assert kind == "tcp"
+        return [object()] * self.count
+
+
+def monitor(**kwargs):
+    return HealthMonitor(FakeEnvironment(), **kwargs)
+
+
+def test_sockets_with_current_psutil():
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen()
+    try:
+        assert monitor().sockets() >= 1
+    finally:
+        listener.close()
+
+
+def test_sockets_fall_back_to_connections_on_old_psutil():
+    health = monitor()
+    health.process = OldProcess(3)
+    assert health.sockets() == 3
+
+
+def test_throttle_goes_down_when_saturated_and_recovers(monkeypatch):
+    scheduler = ArrivalScheduler(ConstantSchedule(100))
+    monkeypatch.setattr(arrival_rate, "SCHEDULER", scheduler)
+    health = monitor(throttle=True)
+    assert health.adjust_throttle(True) == pytest.approx(generator_health.THROTTLE_DOWN)
+    for _ in range(100):
+        health.adjust_throttle(True)
+    assert scheduler.throttle == generator_health.MIN_THROTTLE
+    for _ in range(200):
+        health.adjust_throttle(False)
+    assert scheduler.throttle == 1.0
+
+
+def test_throttle_is_off_by_default(monkeypatch):
+    scheduler = ArrivalScheduler(ConstantSchedule(100))
+    monkeypatch.setattr(arrival_rate, "SCHEDULER", scheduler)
+    assert monitor().adjust_throttle(True) == 1.0
+    assert scheduler.throttle == 1.0
+
+
+def test_health_log_summary_and_csv(tmp_path):
+    path = tmp_path / "health.csv"
+    log = HealthLog(str(path))
+    log.add(HealthSample(1.0, "worker-0", 95.0, 10.0, 12, 2 ** 20, 50, True, 0.8))
+    log.add(HealthSample(2.0, "worker-1", 40.0, 70.0, 12, 2 ** 20, 50, False, 1.0))
+    assert (log.samples, log.saturated, log.max_cpu, log.max_lag_ms, log.min_throttle) == (2, 1, 95.0, 70.0, 0.8)
+    assert len(path.read_text().splitlines()) == 3
+    sample = HealthSample.from_dict(HealthSample(1.0, "local", 1.0, 2.0, 3, 4, 5, False, 1.0).to_dict())
+    assert sample.node == "local"
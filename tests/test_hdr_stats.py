@@ -0,0 +1,59 @@
+import random
+
+from hdr_stats import Histogram, decode_histograms, encode_histograms
+
+
+def test_percentiles_of_uniform_values_are_exact_below_the_precision_limit():
+    histogram = Histogram(digits=3)
+    for value in range(1, 1001):
+        histogram.record(value)
+    percentiles = histogram.percentiles((0.5, 0.9, 0.99))
+    assert percentiles == {0.5: 500, 0.9: 900, 0.99: 990}
+    assert (histogram.total, histogram.min, histogram.max) == (1000, 1, 1000)
+
+
+def test_relative_error_stays_within_digits():
+    rng = random.Random(1)
+    values = sorted(int(rng.lognormvariate(10, 1.5)) + 1 for _ in range(20000))
+    histogram = Histogram(digits=2)
+    for value in values:
+        histogram.record(value)
+    for fraction in (0.5, 0.9, 0.99, 0.999):
+        exact = values[int(len(values) * fraction) - 1]
+        assert abs(histogram.value_at(fraction) - exact) <= exact * 0.02
+
+
+def test_empty_histogram():
+    histogram = Histogram()
+    assert histogram.value_at(0.99) == 0
+    assert list(histogram.items()) == []
+
+
+def test_merge_matches_recording_into_one_histogram():
+    left, right, single = Histogram(), Histogram(), Histogram()
+    for value in range(1, 5000, 3):
+        (left if value % 2 else right).record(value)
+        single.record(value)
+    left.merge(right)
+    assert left.counts == single.counts
+    assert (left.total, left.min, left.max) == (single.total, single.min, single.max)
+
+
+def test_encode_round_trip():
+    histogram = Histogram(digits=3)
+    for value in (5, 5, 1200, 3_000_000, 10 ** 9):
+        histogram.record(value)
+    decoded = Histogram.decode(histogram.encode())
+    assert decoded.counts == histogram.counts
+    assert (decoded.digits, decoded.total, decoded.min, decoded.max) == (3, 5, 5, 10 ** 9)
+    assert decoded.percentiles() == histogram.percentiles()
+
+
+def test_named_histograms_round_trip():
+    histograms = {"GET homepage": Histogram(), "PUT update student": Histogram(digits=2)}
+    histograms["GET homepage"].record(1500)
+    histograms["PUT update student"].record(2500, count=3)
+    decoded = decode_histograms(encode_histograms(histograms))
+    assert sorted(decoded) == sorted(histograms)
+    assert decoded["PUT update student"].total == 3
+    assert decoded["PUT update student"].digits == 2
@@ -0,0 +1,97 @@
+import random
+
+import pytest
+
+from identities import IdentityProvider, hot_cold_weights, make_assignment, read_accounts
+
+ACCOUNTS = [{"username": f"s{i}@example.com", "password": "p", "role": "student"} for i in range(10)] + [
+    {"username": f"m{i}@example.com", "password": "p", "role": "manager"} for i in range(3)
+]
+
+
+def test_read_accounts_defaults_role_to_student(tmp_path):
+    path = tmp_path / "accounts.csv"
+    path.write_text("username,password\na@example.com,secret\n")
+    assert read_accounts(str(path)) == [{"username": "a@example.com", "password": "secret", "role": "student"}]
+
+
+@pytest.mark.parametrize("worker_count", [1, 2, 3, 4])
+def test_workers_get_disjoint_shards_covering_all_accounts(worker_count):
+    seen = []
+    for worker_index in range(worker_count):
+        provider = IdentityProvider(ACCOUNTS)
+        provider.shard(worker_index, worker_count)
+        for assignment in provider.roles.values():
+            seen.extend(account["username"] for account in assignment.accounts)
+    assert sorted(seen) == sorted(account["username"] for account in ACCOUNTS)
+
+
+def test_unique_assignment_reuses_released_accounts():
+    provider = IdentityProvider(ACCOUNTS)
+    provider.shard(1, 3)
+    keys = [provider.acquire("manager") for _ in range(2)]
+    # У второго воркера из трех один менеджер: второй пользователь получает его повторно
+    assert keys[0][0]["username"] == "m1@example.com"
+    assert provider.roles["manager"].shared == 1
+    provider.release(keys[0][1])
+    assert provider.acquire("manager")[0]["username"] == "m1@example.com"
+    assert provider.acquire("teacher") is None
+
+
+def test_hot_cold_share():
+    weights = hot_cold_weights(10, 0.2, 0.8)
+    assert sum(weights[:2]) == pytest.approx(0.8)
+    assert sum(weights) == pytest.approx(1.0)
+
+
+def test_zipf_prefers_low_ranks():
+    random.seed(3)
+    assignment = make_assignment(ACCOUNTS[:10], "zipf:1.2")
+    picks = [assignment.assign() for _ in range(5000)]
+    assert picks.count(0) > picks.count(1) > picks.count(9)
+
+
+def test_unknown_skew():
+    with pytest.raises(ValueError):
+        make_assignment(ACCOUNTS, "pareto:1")
+
+
+class FakeResponse:
+    content = b"null"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class FakeEndpoint:
+    def __init__(self):
+        self.sent = []
+
+    def request(self, user, json):
+        self.sent.append(json)
+        return FakeResponse()
+
+    def check(self, response, user=None):
+        return True
+
+
+class FakeEnvironment:
+    parsed_options = None
+
+
+def test_update_keeps_the_password_of_the_account_from_the_file():
+    from scenario_engine import update_student
+
+    user = type("FakeUser", (), {})()
+    user.environment = FakeEnvironment()
+    user.account = {"username": "s3@example.com", "password": "from-file", "role": "student"}
+    user.student = {
+        "first_name": "A", "last_name": "B", "age": 20, "sex": "F", "email": "s3@example.com",
+        "level": "B1", "vocabulary": 100, "teacher_id": 1,
+    }
+    endpoint = FakeEndpoint()
+    update_student(user, endpoint)
+    assert endpoint.sent[0]["password"] == "from-file"
@@ -0,0 +1,60 @@
+import pytest
+
+from journeys import END, Journey, learn
+from scenario_engine import Scenario
+
+SCENARIO = Scenario({
+    "wait_time": {"constant": 0},
+    "endpoints": [
+        {"task": "visit_homepage", "name": "GET homepage", "path": "/"},
+        {"task": "visit_courses_page", "name": "GET courses page", "path": "/Courses.html"},
+        {"task": "get_public_teachers", "name": "GET public teachers", "path": "/api/teachers/public"},
+    ],
+})
+
+
+def log_line(session, second, path):
+    return f'10.0.0.{session} - - [17/Oct/2026:10:00:{second:02d} +0000] "GET {path} HTTP/1.1" 200 1 "-" "ua"\n'
+
+
+def write_log(tmp_path, sessions):
+    """sessions: список маршрутов (путей); сессия i начинается на секунде i"""
+    lines = []
+    for number, paths in enumerate(sessions):
+        for step, path in enumerate(paths):
+            lines.append((number + step, log_line(number, number + step, path)))
+    path = tmp_path / "access.log"
+    path.write_text("".join(line for _, line in sorted(lines)))
+    return str(path)
+
+
+def test_learned_probabilities_sum_to_one_after_min_count(tmp_path):
+    sessions = [["/", "/Courses.html"]] * 6 + [["/", "/api/teachers/public"]] * 3 + [["/"]]
+    (learned,) = learn(write_log(tmp_path, sessions), SCENARIO, min_count=2)
+    transitions = learned["transitions"]
+    assert learned["start"] == "visit_homepage"
+    # Переход в end (1 раз) отброшен, оставшиеся нормированы заново
+    assert transitions["visit_homepage"] == {"visit_courses_page": 0.667, "get_public_teachers": 0.333}
+    for targets in transitions.values():
+        assert sum(targets.values()) == pytest.approx(1.0, abs=0.001)
+    # Полученная таблица собирается в маршрут без ошибок
+    Journey(learned, SCENARIO)
+
+
+def test_state_with_only_rare_transitions_ends_the_journey(tmp_path):
+    sessions = [["/", "/Courses.html", "/api/teachers/public"]] + [["/"]] * 3
+    (learned,) = learn(write_log(tmp_path, sessions), SCENARIO, min_count=2)
+    assert learned["transitions"]["visit_courses_page"] == {END: 1.0}
+    Journey(learned, SCENARIO)
+
+
+def test_journey_rejects_transition_to_unknown_state():
+    spec = {"name": "broken", "start": "visit_homepage", "transitions": {"visit_homepage": {"visit_courses_page": 1}}}
+    with pytest.raises(ValueError):
+        Journey(spec, SCENARIO)
+
+
+def test_journey_normalises_counts():
+    spec = {"name": "counts", "start": "visit_homepage", "transitions": {"visit_homepage": {END: 3, "visit_homepage": 1}}}
+    targets, weights = Journey(spec, SCENARIO).transitions["visit_homepage"]
+    assert dict(zip(targets, weights)) == {END: 0.75, "visit_homepage": 0.25}
@@ -0,0 +1,99 @@
+import gzip
+import json
+
+import log_replay
+from log_replay import ReplayDispatcher, ReplayUser, RouteMap, iter_log
+from scenario_engine import Scenario
+
+SCENARIO = Scenario({
+    "wait_time": {"constant": 0},
+    "endpoints": [
+        {"task": "home", "name": "GET homepage", "path": "/"},
+        {"task": "teachers", "name": "GET public teachers", "path": "/api/teachers/public"},
+        {"task": "teachers_list", "name": "GET teachers", "path": "/api/teachers/"},
+        {"task": "student", "name": "GET student info", "path": "/api/students/{user_id}", "auth": True},
+        {"task": "update", "name": "PUT update student", "method": "PUT", "path": "/api/students/{user_id}",
+         "role": "student"},
+    ],
+})
+
+NGINX_LINES = (
+    '10.0.0.1 - - [17/Oct/2026:23:33:55 +0000] "GET /api/students/42?full=1 HTTP/1.1" 200 123 "-" "Mozilla/5.0"\n'
+    '10.0.0.2 - - [17/Oct/2026:23:33:56 +0000] "PUT /api/students/4 HTTP/1.1" 204 0 "-" "curl/8.0"\n'
+    'not a log line\n'
+    '10.0.0.3 - - [17/Oct/2026:23:33:57 +0000] "GET / HTTP/1.1" 304 0\n'
+)
+
+
+def test_route_map_matches_static_templated_and_method():
+    routes = RouteMap(SCENARIO)
+    assert routes.match("GET", "/api/teachers/public").name == "GET public teachers"
+    assert routes.match("GET", "/api/teachers").name == "GET teachers"
+    assert routes.match("GET", "/api/students/42/").name == "GET student info"
+    assert routes.match("GET", "/api/students/42").name == "GET student info"
+    assert routes.match("PUT", "/api/students/42").name == "PUT update student"
+    assert routes.match("DELETE", "/api/students/42") is None
+    assert routes.match("GET", "/api/students/42/courses") is None
+
+
+def test_nginx_lines(tmp_path):
+    path = tmp_path / "access.log"
+    path.write_text(NGINX_LINES)
+    entries = list(iter_log(str(path)))
+    assert [(entry.method, entry.path, entry.status) for entry in entries] == [
+        ("GET", "/api/students/42", 200), ("PUT", "/api/students/4", 204), ("GET", "/", 304),
+    ]
+    assert entries[0].session == "10.0.0.1 Mozilla/5.0"
+    assert entries[1].timestamp - entries[0].timestamp == 1.0
+    # Строка без Referer и User-Agent (формат common)
+    assert entries[2].session == "10.0.0.3 "
+
+
+def test_json_lines_gzip(tmp_path):
+    path = tmp_path / "access.log.gz"
+    records = [
+        {"time": "2026-10-17T23:33:55Z", "method": "GET", "path": "/api/teachers/public?page=2", "status": 200,
+         "session": "s1"},
+        {"timestamp": 1760744036.5, "request": "PUT /api/students/4 HTTP/1.1", "status": "204",
+         "remote_addr": "10.0.0.2", "user_agent": "curl/8.0"},
+        {"time": "2026-10-17T23:33:57Z"},
+    ]
+    with gzip.open(path, "wt") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+    entries = list(iter_log(str(path)))
+    assert [(entry.session, entry.method, entry.path, entry.status) for entry in entries] == [
+        ("s1", "GET", "/api/teachers/public", 200), ("10.0.0.2 curl/8.0", "PUT", "/api/students/4", 204),
+    ]
+    assert entries[1].timestamp == 1760744036.5
+
+
+def test_sessions_are_split_between_workers_without_overlap():
+    sessions = [f"10.0.0.{i} agent" for i in range(200)]
+    dispatchers = [ReplayDispatcher([], None, worker_index=i, worker_count=3) for i in range(3)]
+    owners = [[d._owned(session) for d in dispatchers].count(True) for session in sessions]
+    assert owners == [1] * len(sessions)
+
+
+class FakeInbox:
+    def __init__(self, items):
+        self.items = list(items)
+
+    def get(self):
+        return self.items.pop(0)
+
+
+def test_entries_not_applicable_to_the_user_are_counted(monkeypatch):
+    dispatcher = ReplayDispatcher([], None)
+    monkeypatch.setattr(log_replay, "DISPATCHER", dispatcher)
+    executed = []
+    monkeypatch.setattr(SCENARIO.endpoint("PUT update student"), "execute", executed.append)
+
+    user = ReplayUser.__new__(ReplayUser)
+    user.role = "manager"
+    user.inbox = FakeInbox([SCENARIO.endpoint("PUT update student")] * 2)
+    user.replay_next()
+    user.role = "student"
+    user.replay_next()
+    assert dispatcher.skipped == 1
+    assert executed == [user]
@@ -0,0 +1,46 @@
+import pytest
+
+import response_json
+from response_json import ParseStats, missing_keys, parse, sampled
+
+
+class FakeResponse:
+    def __init__(self, content):
+        self.content = content
+
+
+@pytest.fixture(autouse=True)
+def stats(monkeypatch):
+    stats = ParseStats()
+    monkeypatch.setattr(response_json, "STATS", stats)
+    return stats
+
+
+def test_body_is_parsed_once_and_repeats_are_counted(stats):
+    response = FakeResponse(b'{"id": 1, "email": "a@example.com"}')
+    assert parse(response) is parse(response)
+    assert missing_keys(response, ("id", "role")) == ["role"]
+    assert (stats.parsed, stats.hits, stats.bytes) == (1, 2, len(response.content))
+
+
+def test_sampling_counts_validated_and_skipped(stats, monkeypatch):
+    monkeypatch.setattr(response_json, "SAMPLE_RATE", 0.0)
+    assert not sampled()
+    monkeypatch.setattr(response_json, "SAMPLE_RATE", 1.0)
+    assert sampled()
+    assert (stats.validated, stats.skipped) == (1, 1)
+
+
+def test_missing_keys_of_lists_and_non_json():
+    assert missing_keys(FakeResponse(b'[{"id": 1}]'), ("id",)) == []
+    assert missing_keys(FakeResponse(b"[]"), ("id",)) == []
+    assert missing_keys(FakeResponse(b"<html>"), ("id",)) == ["<не JSON>"]
+
+
+def test_saved_time_is_hits_and_skipped_times_mean_parse_time():
+    stats = ParseStats()
+    stats.merge({"parsed": 10, "hits": 5, "parse_seconds": 0.010, "bytes": 2048, "validated": 1, "skipped": 15})
+    # Среднее 1 мс на разбор, избежано 5 + 15 разборов
+    assert "сэкономлено около 20 мс CPU" in stats.summary()
+    assert stats.take()["hits"] == 5
+    assert stats.hits == 0
@@ -0,0 +1,77 @@
+import pytest
+
+from hdr_stats import Histogram
+from run_store import RunResult, compare, mann_whitney_greater, two_proportion_greater
+
+
+def histogram(values_ms):
+    result = Histogram()
+    for value in values_ms:
+        result.record(value * 1000)
+    return result
+
+
+def run(rows, histograms):
+    """rows: список (method, name, requests, failures, rps)"""
+    columns = {column: [] for column in ("name", "method", "requests", "failures", "rps")}
+    for method, name, requests, failures, rps in rows:
+        columns["name"].append(name)
+        columns["method"].append(method)
+        columns["requests"].append(requests)
+        columns["failures"].append(failures)
+        columns["rps"].append(rps)
+    return RunResult({"label": "test"}, columns, histograms)
+
+
+def test_mann_whitney_detects_a_shift_but_not_equal_samples():
+    base = histogram(range(10, 110))
+    p_value, superiority = mann_whitney_greater(base, histogram(range(10, 110)))
+    assert p_value == pytest.approx(0.5, abs=0.01)
+    assert superiority == pytest.approx(0.5)
+
+    p_value, superiority = mann_whitney_greater(base, histogram(range(30, 130)))
+    assert p_value < 0.01
+    assert superiority > 0.6
+    # Односторонний критерий: ускорение не считается замедлением
+    assert mann_whitney_greater(histogram(range(30, 130)), base)[0] > 0.99
+
+
+def test_two_proportion_test():
+    assert two_proportion_greater(10, 1000, 40, 1000) < 0.001
+    assert two_proportion_greater(40, 1000, 10, 1000) > 0.99
+    assert two_proportion_greater(0, 1000, 0, 1000) == 1.0
+    assert two_proportion_greater(0, 0, 5, 10) == 1.0
+
+
+def test_rows_are_keyed_by_method_and_name():
+    result = run([("GET", "/api/students", 10, 0, 1.0), ("POST", "/api/students", 5, 1, 0.5)], {})
+    assert result.rows()[("POST", "/api/students")]["failures"] == 1
+    assert len(result.rows()) == 2
+
+
+def test_encode_round_trip():
+    result = run([("GET", "GET homepage", 100, 1, 10.0)], {"GET homepage": histogram([1, 2, 3])})
+    decoded = RunResult.decode(result.encode())
+    assert decoded.meta == result.meta
+    assert decoded.rows() == result.rows()
+    assert decoded.histograms["GET homepage"].total == 3
+
+
+def test_compare_reports_slowdown_errors_and_throughput_drop():
+    base = run(
+        [("GET", "GET homepage", 1000, 5, 50.0), ("PUT", "PUT update student", 1000, 5, 20.0)],
+        {"GET homepage": histogram(range(10, 110)), "PUT update student": histogram(range(10, 110))},
+    )
+    candidate = run(
+        [("GET", "GET homepage", 1000, 5, 49.0), ("PUT", "PUT update student", 1000, 60, 15.0)],
+        {"GET homepage": histogram(range(30, 130)), "PUT update student": histogram(range(10, 110))},
+    )
+    lines, regressions = compare(base, candidate)
+    assert [(line["method"], line["name"]) for line in lines] == [("GET", "GET homepage"), ("PUT", "PUT update student")]
+    assert len(regressions) == 3
+    assert regressions[0].startswith("GET GET homepage: медленнее")
+    assert "доля ошибок" in regressions[1]
+    assert "интенсивность 20.0 -> 15.0" in regressions[2]
+
+    _, regressions = compare(base, candidate, max_rps_drop=0.5, min_slowdown=1.0, names={"GET homepage"})
+    assert regressions == []
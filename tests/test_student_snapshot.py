@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+from student_snapshot import STUDENT_FIELDS, snapshot_after_update, student_update
+
+SNAPSHOT = {
+    "id": 5,
+    "first_name": "Alice",
+    "last_name": "Smith",
+    "age": 21,
+    "sex": "F",
+    "email": "alice@example.com",
+    "level": "B1",
+    "vocabulary": 1500,
+    "teacher_id": 1,
+}
+
+
+class FakeResponse:
+    def __init__(self, body):
+        self.content = body
+
+
+def test_update_keeps_profile_and_sends_account_password():
+    update = student_update(SNAPSHOT, -10, "password123")
+    assert update["vocabulary"] == 1490
+    assert update["password"] == "password123"
+    assert {field: update[field] for field in STUDENT_FIELDS if field != "vocabulary"} == {
+        field: SNAPSHOT[field] for field in STUDENT_FIELDS if field != "vocabulary"
+    }
+    assert "id" not in update
+    assert SNAPSHOT["vocabulary"] == 1500
+
+
+def test_password_is_required():
+    with pytest.raises(TypeError):
+        student_update(SNAPSHOT, 1)
+
+
+def test_snapshot_after_update_prefers_response_body():
+    body = dict(SNAPSHOT, vocabulary=1600)
+    assert snapshot_after_update(FakeResponse(json.dumps(body).encode()), {})["vocabulary"] == 1600
+
+
+def test_snapshot_after_update_falls_back_to_sent_data():
+    update = student_update(SNAPSHOT, 5, "password123")
+    snapshot = snapshot_after_update(FakeResponse(b"null"), update)
+    assert snapshot["vocabulary"] == 1505
+    assert "password" not in snapshot
@@ -0,0 +1,69 @@
+import json
+
+from token_pool import Credentials, TokenPool
+
+
+class FakeResponse:
+    def __init__(self, status_code, data):
+        self.status_code = status_code
+        self.content = json.dumps(data).encode()
+
+
+class FakeClient:
+    """Выдает токены t1, t2, ... и профиль с id 7"""
+
+    def __init__(self):
+        self.logins = 0
+
+    def post(self, path, data):
+        self.logins += 1
+        return FakeResponse(200, {"access_token": f"t{self.logins}"})
+
+    def get(self, path, headers):
+        return FakeResponse(200, {"id": 7, "additional_info": {"teacher_id": 3}})
+
+
+def test_acquire_logs_in_once_per_account():
+    pool, client = TokenPool(ttl=600), FakeClient()
+    first = pool.acquire(client, "alice", "secret")
+    second = pool.acquire(client, "alice", "secret")
+    assert first is second
+    assert client.logins == 1
+    assert (first.user_id, first.teacher_id) == (7, 3)
+
+
+def test_invalidate_resets_only_the_rejected_token():
+    pool, client = TokenPool(ttl=600), FakeClient()
+    credentials = pool.acquire(client, "alice", "secret")
+
+    # 401 на запрос со старым токеном не сбрасывает текущий
+    pool.invalidate("alice", "t0")
+    assert pool.acquire(client, "alice", "secret").access_token == "t1"
+
+    pool.invalidate("alice", "t1")
+    assert not credentials.is_fresh()
+    refreshed = pool.acquire(client, "alice", "secret")
+    assert refreshed.access_token == "t2"
+    # Профиль после повторного входа не запрашивается, id переносится
+    assert refreshed.user_id == 7
+    assert client.logins == 2
+
+
+def test_shared_file_does_not_return_rejected_token(tmp_path):
+    shared_path = str(tmp_path / "tokens.json")
+    pool, client = TokenPool(ttl=600, shared_path=shared_path), FakeClient()
+    pool.acquire(client, "alice", "secret")
+    with open(shared_path) as f:
+        assert json.load(f)["alice"]["access_token"] == "t1"
+
+    pool.invalidate("alice", "t1")
+    assert pool.acquire(client, "alice", "secret").access_token == "t2"
+    with open(shared_path) as f:
+        assert json.load(f)["alice"]["access_token"] == "t2"
+
+
+def test_credentials_freshness_respects_margin():
+    credentials = Credentials("alice", "t1", expires_at=0.0)
+    assert not credentials.is_fresh()
+    credentials.expires_at = 10 ** 10
+    assert credentials.is_fresh(margin=60)
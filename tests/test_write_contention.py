@@ -0,0 +1,109 @@
+from argparse import Namespace
+
+import pytest
+
+import write_contention
+from write_contention import WriteLedger, choose_hot_set, seed_passwords
+
+
+def write_accounts(directory):
+    (directory / "accounts.csv").write_text(
+        "username,password,role,id\n"
+        "s1@seed.example.com,pw-1,student,1\n"
+        "s2@seed.example.com,pw-2,student,2\n"
+        "t1@seed.example.com,pw-t,teacher,3\n"
+    )
+    return str(directory)
+
+
+class FakeEnvironment:
+    def __init__(self, **options):
+        self.parsed_options = Namespace(**dict({"hot_ids": "", "hot_students": 10, "seed_dir": ""}, **options))
+
+
+def test_seed_passwords_reads_only_students(tmp_path):
+    seed_dir = write_accounts(tmp_path)
+    assert seed_passwords(seed_dir, [1, 3, 9]) == {1: "pw-1"}
+    assert seed_passwords("", [1]) == {}
+
+
+def test_hot_ids_take_passwords_from_option_and_accounts(tmp_path):
+    environment = FakeEnvironment(hot_ids="1,5:own-password,2", seed_dir=write_accounts(tmp_path))
+    assert choose_hot_set(environment, None) == {1: "pw-1", 5: "own-password", 2: "pw-2"}
+
+
+def test_students_without_password_are_dropped(tmp_path):
+    environment = FakeEnvironment(hot_ids="1,7", seed_dir=write_accounts(tmp_path))
+    assert choose_hot_set(environment, None) == {1: "pw-1"}
+
+    with pytest.raises(RuntimeError):
+        choose_hot_set(FakeEnvironment(hot_ids="7,8"), None)
+
+
+def test_ledger_counts_applied_and_in_flight_deltas():
+    worker = WriteLedger()
+    worker.start(1, 5)
+    worker.finish(1, 5, applied=True)
+    worker.start(1, 3)
+    worker.finish(1, 3, applied=False)
+    worker.start(2, 4)  # пользователь остановлен до ответа
+    worker.conflicts = 1
+
+    master = WriteLedger()
+    master.merge(worker.take())
+    master.merge(worker.take())
+    assert master.applied == {1: 5}
+    assert master.writes == {1: 1}
+    assert master.pending == {1: 0, 2: 4}
+    assert master.conflicts == 1
+
+
+class FakeResponse:
+    status_code = 200
+    content = (
+        b'{"first_name": "Hot1", "last_name": "S", "age": 20, "sex": "F", "email": "hot1@example.com",'
+        b' "level": "B1", "vocabulary": 1000, "teacher_id": 1}'
+    )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class FakeClient:
+    def get(self, path, **kwargs):
+        return FakeResponse()
+
+
+class FakeEndpoint:
+    def __init__(self):
+        self.sent = []
+
+    def request(self, user, path, json):
+        self.sent.append((path, json))
+        return FakeResponse()
+
+    def check(self, response, user=None):
+        return True
+
+
+class FakeUser:
+    client = FakeClient()
+    hot_student_id = 1
+
+    def auth_headers(self):
+        return {}
+
+
+def test_update_keeps_the_hot_student_password(monkeypatch):
+    ledger = WriteLedger()
+    ledger.passwords = {1: "pw-1"}
+    monkeypatch.setattr(write_contention, "LEDGER", ledger)
+    endpoint = FakeEndpoint()
+    write_contention.contended_update(FakeUser(), endpoint)
+    path, update = endpoint.sent[0]
+    assert path == "/api/students/1"
+    assert update["password"] == "pw-1"
+    assert update["vocabulary"] - 1000 == ledger.applied[1]
@@ -0,0 +1,280 @@
+"""
+Разбивка времени запроса на фазы на стороне клиента.
+
+С ``--timing-breakdown`` в оба HTTP-клиента Locust (urllib3 под HttpUser и
+geventhttpclient под FastHttpUser) встраиваются замеры:
+
+  * ``dns``     - разрешение имени;
+  * ``connect`` - установка TCP-соединения;
+  * ``tls``     - TLS-рукопожатие;
+  * ``ttfb``    - от отправки запроса до заголовков ответа (обработка на сервере);
+  * ``body``    - остаток времени ответа: чтение тела и накладные расходы клиента.
+
+Фазы копятся в greenlet-local хранилище и в слушателе ``events.request``
+относятся к имени запроса ("GET profile info", "PUT update student" и т.д.)
+вместе с признаком повторного использования соединения. Синтетические
+события без своего HTTP-запроса (PAGE из page_load.py, JOURNEY из
+journeys.py) не учитываются. Итоги печатаются
+в конце теста и пишутся в ``<--csv>_timings.csv``; в распределенном режиме
+воркеры отправляют гистограммы мастеру.
+"""
+import csv
+import logging
+import socket
+import time
+
+from gevent.local import local
+from locust import events
+from locust.runners import WorkerRunner
+
+from hdr_stats import Histogram, decode_histograms, encode_histograms
+
+PHASES = ("dns", "connect", "tls", "ttfb", "body")
+HTTP_METHODS = frozenset(("GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"))
+
+_current = local()
+
+
+def _phases():
+    phases = getattr(_current, "phases", None)
+    if phases is None:
+        phases = _current.phases = {}
+    return phases
+
+
+def _add(phase, seconds):
+    phases = _phases()
+    phases[phase] = phases.get(phase, 0.0) + seconds
+
+
+def take_phases():
+    """Забирает фазы, накопленные текущим greenlet с прошлого запроса"""
+    phases = getattr(_current, "phases", None)
+    _current.phases = None
+    return phases or {}
+
+
+# --- urllib3 (HttpUser) ---
+
+
+def _timed_urllib3_classes():
+    from urllib3.connection import HTTPConnection, HTTPSConnection
+
+    class TimedConnectionMixin:
+        _sent_at = None
+
+        def _new_conn(self):
+            started = time.perf_counter()
+            host = self._dns_host
+            try:
+                address = socket.getaddrinfo(host, self.port, 0, socket.SOCK_STREAM)[0][4][0]
+            except OSError:
+                # Ошибку разрешения имени оформит сам urllib3
+                address = None
+            resolved = time.perf_counter()
+            _add("dns", resolved - started)
+            if address is not None:
+                self._dns_host = address
+            try:
+                return super()._new_conn()
+            finally:
+                self._dns_host = host
+                _add("connect", time.perf_counter() - resolved)
+
+        def request(self, *args, **kwargs):
+            super().request(*args, **kwargs)
+            self._sent_at = time.perf_counter()
+
+        def getresponse(self, *args, **kwargs):
+            response = super().getresponse(*args, **kwargs)
+            if self._sent_at is not None:
+                _add("ttfb", time.perf_counter() - self._sent_at)
+                self._sent_at = None
+            return response
+
+    class TimedHTTPConnection(TimedConnectionMixin, HTTPConnection):
+        pass
+
+    class TimedHTTPSConnection(TimedConnectionMixin, HTTPSConnection):
+        def connect(self):
+            started = time.perf_counter()
+            before = dict(_phases())
+            super().connect()
+            phases = _phases()
+            tcp = sum(phases.get(phase, 0.0) - before.get(phase, 0.0) for phase in ("dns", "connect"))
+            _add("tls", time.perf_counter() - started - tcp)
+
+    return TimedHTTPConnection, TimedHTTPSConnection
+
+
+def install_urllib3():
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+    HTTPConnectionPool.ConnectionCls, HTTPSConnectionPool.ConnectionCls = _timed_urllib3_classes()
+
+
+# --- geventhttpclient (FastHttpUser) ---
+
+
+def install_geventhttpclient():
+    from geventhttpclient.client import HTTPClient
+    from geventhttpclient.connectionpool import ConnectionPool, SSLConnectionPool
+
+    def timed(method, phase, exclude=()):
+        def wrapper(self, *args, **kwargs):
+            started = time.perf_counter()
+            before = {name: _phases().get(name, 0.0) for name in exclude}
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                phases = _phases()
+                nested = sum(phases.get(name, 0.0) - before[name] for name in exclude)
+                _add(phase, time.perf_counter() - started - nested)
+        return wrapper
+
+    ConnectionPool._resolve = timed(ConnectionPool._resolve, "dns")
+    ConnectionPool._connect_socket = timed(ConnectionPool._connect_socket, "connect")
+    # SSL-пул сначала вызывает TCP-подключение базового класса, остальное - рукопожатие
+    SSLConnectionPool._connect_socket = timed(SSLConnectionPool._connect_socket, "tls", exclude=("connect",))
+    # HTTPClient.request возвращается после разбора заголовков ответа
+    HTTPClient.request = timed(HTTPClient.request, "ttfb", exclude=("dns", "connect", "tls"))
+
+
+class TimingStats:
+    """Гистограммы фаз и счетчики переиспользования соединений по именам запросов"""
+
+    def __init__(self):
+        self.histograms = {}
+        self.requests = {}
+        self.new_connections = {}
+
+    def record(self, name, response_time, phases):
+        connected = "connect" in phases
+        self.requests[name] = self.requests.get(name, 0) + 1
+        if connected:
+            self.new_connections[name] = self.new_connections.get(name, 0) + 1
+        measured = 0.0
+        for phase in PHASES[:-1]:
+            value = phases.get(phase, 0.0) * 1000
+            measured += value
+            if phase in phases or phase == "ttfb":
+                self._histogram(name, phase).record(value * 1000)
+        self._histogram(name, "body").record(max(0.0, response_time - measured) * 1000)
+
+    def _histogram(self, name, phase):
+        key = f"{name}\t{phase}"
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram(2)
+        return histogram
+
+    def merge(self, data):
+        for key, histogram in decode_histograms(data["histograms"]).items():
+            current = self.histograms.get(key)
+            if current is None:
+                self.histograms[key] = histogram
+            else:
+                current.merge(histogram)
+        for name, count in data["requests"].items():
+            self.requests[name] = self.requests.get(name, 0) + count
+        for name, count in data["new_connections"].items():
+            self.new_connections[name] = self.new_connections.get(name, 0) + count
+
+    def take(self):
+        data = {
+            "histograms": encode_histograms(self.histograms),
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+        }
+        self.reset()
+        return data
+
+    def reset(self):
+        self.histograms = {}
+        self.requests = {}
+        self.new_connections = {}
+
+    def rows(self):
+        """Строки отчета: имя, запросов, доля повторно использованных соединений, среднее и p99 по фазам, мс"""
+        for name in sorted(self.requests):
+            total = self.requests[name]
+            row = [name, total, f"{1 - self.new_connections.get(name, 0) / total:.3f}"]
+            for phase in PHASES:
+                histogram = self.histograms.get(f"{name}\t{phase}")
+                if histogram is None or not histogram.total:
+                    row += ["", ""]
+                    continue
+                mean = sum(value * count for value, count in histogram.items()) / histogram.total
+                row += [f"{mean / 1000:.3f}", f"{histogram.value_at(0.99) / 1000:.3f}"]
+            yield row
+
+
+CSV_HEADER = ["Name", "Requests", "Connection reuse"] + [
+    f"{phase} {stat}, ms" for phase in PHASES for stat in ("avg", "p99")
+]
+
+STATS = TimingStats()
+_enabled = False
+
+
+@events.init_command_line_parser.add_listener
+def _(parser):
+    parser.add_argument(
+        "--timing-breakdown",
+        action="store_true",
+        default=False,
+        help="Замерять фазы запросов (DNS, connect, TLS, TTFB, тело) по именам запросов",
+    )
+
+
+@events.init.add_listener
+def _(environment, **kwargs):
+    global _enabled
+    options = environment.parsed_options
+    if options is None or not options.timing_breakdown:
+        return
+    _enabled = True
+    install_urllib3()
+    install_geventhttpclient()
+
+
+@events.request.add_listener
+def _(request_type, name, response_time, **kwargs):
+    if _enabled and response_time is not None and request_type in HTTP_METHODS:
+        STATS.record(name, response_time, take_phases())
+
+
+@events.report_to_master.add_listener
+def _(client_id, data):
+    if _enabled and STATS.requests:
+        data["timing_breakdown"] = STATS.take()
+
+
+@events.worker_report.add_listener
+def _(client_id, data):
+    if "timing_breakdown" in data:
+        STATS.merge(data["timing_breakdown"])
+
+
+@events.reset_stats.add_listener
+def _():
+    STATS.reset()
+
+
+@events.quitting.add_listener
+def _(environment, **kwargs):
+    if not STATS.requests or isinstance(environment.runner, WorkerRunner):
+        return
+    rows = list(STATS.rows())
+    lines = [f"{'Name':<32} {'reqs':>7} {'reuse':>6} " + " ".join(f"{phase + ' avg/p99':>17}" for phase in PHASES)]
+    for row in rows:
+        cells = [f"{row[i] or '-':>8}/{row[i + 1] or '-':<8}" for i in range(3, len(row), 2)]
+        lines.append(f"{row[0][:32]:<32} {row[1]:>7} {row[2]:>6} " + " ".join(cells))
+    logging.info("Фазы запросов, мс:\n" + "\n".join(lines))
+
+    csv_prefix = environment.parsed_options.csv_prefix if environment.parsed_options else None
+    if csv_prefix:
+        with open(f"{csv_prefix}_timings.csv", "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_HEADER)
+            writer.writerows(rows)
@@ -0,0 +1,241 @@
+"""
+Общий пул авторизационных токенов для пользователей English Gang.
+
+Вместо того чтобы каждый эмулируемый пользователь при старте делал
+``POST /api/token`` и ``GET /api/me``, пул авторизуется один раз на каждую
+учетную запись и раздает закэшированные ``access_token``, ``id`` и
+``teacher_id`` всем новым пользователям. Токен обновляется, когда
+приближается срок его действия (поле ``exp`` из JWT либо ``--token-ttl``).
+
+При указании ``--token-pool-file`` кэш дополнительно сохраняется в файл,
+который разделяют все воркеры на одной машине.
+"""
+import base64
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import time
+
+import gevent
+from gevent.event import Event
+from gevent.lock import Semaphore
+from locust import events
+from locust.event import EventHook
+
+from response_json import parse
+
+# Сколько ждать токены других воркеров перед первой собственной авторизацией, с
+SHARED_WAIT_TIMEOUT = 5.0
+
+
+class Credentials:
+    """Закэшированные данные авторизации одной учетной записи"""
+
+    __slots__ = ("username", "access_token", "user_id", "teacher_id", "expires_at")
+
+    def __init__(self, username, access_token, user_id=None, teacher_id=None, expires_at=0.0):
+        self.username = username
+        self.access_token = access_token
+        self.user_id = user_id
+        self.teacher_id = teacher_id
+        self.expires_at = expires_at
+
+    def is_fresh(self, margin=0.0):
+        """Токен действителен еще как минимум ``margin`` секунд"""
+        return self.expires_at - margin > time.time()
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{name: data.get(name) for name in cls.__slots__})
+
+
+def token_expiry(access_token, default_ttl):
+    """Момент истечения токена: ``exp`` из JWT, если он есть, иначе сейчас + ``default_ttl``"""
+    try:
+        payload = access_token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))["exp"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return time.time() + default_ttl
+
+
+class TokenPool:
+    """
+    Процессный пул токенов: одна авторизация на учетную запись.
+
+    Одновременно стартующие пользователи с одной учетной записью ждут
+    первую авторизацию на семафоре и затем получают результат из кэша.
+    """
+
+    def __init__(self, ttl=1800.0, refresh_margin=30.0, shared_path=None):
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.shared_path = shared_path
+        self._entries = {}
+        self._locks = {}
+        # Срабатывает после новой авторизации: logged_in.fire(credentials=...)
+        self.logged_in = EventHook()
+        # Сброшен, пока воркер ждет от мастера снимок токенов кластера (см. cluster_data.py)
+        self.shared_ready = Event()
+        self.shared_ready.set()
+
+    def configure(self, ttl=None, refresh_margin=None, shared_path=None):
+        if ttl is not None:
+            self.ttl = ttl
+        if refresh_margin is not None:
+            self.refresh_margin = refresh_margin
+        if shared_path is not None:
+            self.shared_path = shared_path
+
+    def clear(self):
+        self._entries.clear()
+
+    def invalidate(self, username, access_token=None):
+        """
+        Сбрасывает токен учетной записи после ответа 401. С ``access_token``
+        сбрасывается только этот токен: запросы, отправленные со старым токеном
+        и вернувшиеся после повторной авторизации, не сбрасывают новый.
+        """
+        entry = self._entries.get(username)
+        if entry is not None and (access_token is None or entry.access_token == access_token):
+            entry.expires_at = 0.0
+
+    def put(self, credentials):
+        """Кладет в пул данные авторизации, полученные извне (например, от другого воркера)"""
+        current = self._entries.get(credentials.username)
+        if current is None or current.expires_at < credentials.expires_at:
+            self._entries[credentials.username] = credentials
+
+    def acquire(self, client, username, password, fetch_profile=True):
+        """
+        Возвращает ``Credentials`` для учетной записи либо ``None``, если авторизоваться не удалось.
+
+        В обычном случае это просто поиск в словаре; HTTP-запросы выполняются
+        только для новой учетной записи или при истекающем токене.
+        """
+        entry = self._entries.get(username)
+        if entry is not None and entry.is_fresh(self.refresh_margin):
+            return entry
+        if not self.shared_ready.is_set():
+            # Токен мог уже получить другой воркер: сначала дожидаемся снимка от мастера
+            if not self.shared_ready.wait(SHARED_WAIT_TIMEOUT):
+                logging.warning("Снимок токенов кластера не получен, авторизуемся самостоятельно")
+                self.shared_ready.set()
+            entry = self._entries.get(username)
+            if entry is not None and entry.is_fresh(self.refresh_margin):
+                return entry
+
+        lock = self._locks.get(username)
+        if lock is None:
+            lock = self._locks[username] = Semaphore()
+        with lock:
+            # Пока мы ждали, токен мог обновить другой пользователь
+            entry = self._entries.get(username)
+            if entry is not None and entry.is_fresh(self.refresh_margin):
+                return entry
+            if self.shared_path:
+                entry = self._login_shared(client, username, password, entry, fetch_profile)
+            else:
+                entry = self._login(client, username, password, entry, fetch_profile)
+            if entry is not None:
+                self._entries[username] = entry
+                self.logged_in.fire(credentials=entry)
+            return entry
+
+    def _login(self, client, username, password, previous, fetch_profile):
+        response = client.post("/api/token", data={"username": username, "password": password})
+        if response.status_code != 200:
+            logging.error(f"Ошибка авторизации {username}: {response.status_code}")
+            return None
+        access_token = parse(response)["access_token"]
+        entry = Credentials(username, access_token, expires_at=token_expiry(access_token, self.ttl))
+
+        if previous is not None and previous.user_id is not None:
+            # id пользователя не меняется, повторно запрашивать профиль не нужно
+            entry.user_id = previous.user_id
+            entry.teacher_id = previous.teacher_id
+        elif fetch_profile:
+            user_response = client.get("/api/me", headers={"Authorization": f"Bearer {access_token}"})
+            if user_response.status_code != 200:
+                logging.error(f"Не удалось получить информацию о пользователе {username}: {user_response.status_code}")
+                return None
+            profile = parse(user_response)
+            entry.user_id = profile["id"]
+            entry.teacher_id = (profile.get("additional_info") or {}).get("teacher_id")
+        return entry
+
+    def _login_shared(self, client, username, password, previous, fetch_profile):
+        """Авторизация через файловый кэш, общий для всех воркеров на машине"""
+        lock_file = open(f"{self.shared_path}.lock", "a")
+        try:
+            # Блокирующий flock остановил бы весь цикл gevent, поэтому опрашиваем
+            while True:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    gevent.sleep(0.05)
+
+            shared = self._read_shared()
+            cached = shared.get(username)
+            if cached is not None:
+                entry = Credentials.from_dict(cached)
+                # Сброшенный после 401 токен в файле еще может выглядеть свежим
+                rejected = previous is not None and entry.access_token == previous.access_token
+                if entry.is_fresh(self.refresh_margin) and not rejected:
+                    return entry
+                previous = previous or entry
+
+            entry = self._login(client, username, password, previous, fetch_profile)
+            if entry is not None:
+                shared[username] = entry.to_dict()
+                self._write_shared(shared)
+            return entry
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+    def _read_shared(self):
+        try:
+            with open(self.shared_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_shared(self, shared):
+        directory = os.path.dirname(os.path.abspath(self.shared_path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".token_pool.")
+        with os.fdopen(fd, "w") as f:
+            json.dump(shared, f)
+        os.replace(tmp_path, self.shared_path)
+
+
+# Пул, общий для всех пользователей процесса
+TOKEN_POOL = TokenPool()
+
+
+@events.init_command_line_parser.add_listener
+def _(parser):
+    parser.add_argument(
+        "--token-ttl",
+        type=float,
+        default=1800.0,
+        help="Время жизни токена в секундах, если в нем нет поля exp",
+    )
+    parser.add_argument(
+        "--token-pool-file",
+        default="",
+        help="Файл с общим кэшем токенов для всех воркеров на машине",
+    )
+
+
+@events.init.add_listener
+def _(environment, **kwargs):
+    options = environment.parsed_options
+    if options is not None:
+        TOKEN_POOL.configure(ttl=options.token_ttl, shared_path=options.token_pool_file or None)
@@ -0,0 +1,341 @@
+"""
+Сквозная корреляция запросов генератора с логами и трассами сервера.
+
+С ``--trace`` каждый запрос пользователей (HttpUser и FastHttpUser,
+включая авторизацию через пул токенов) получает заголовки:
+
+  * ``traceparent`` по W3C Trace Context: ``00-<trace id>-<span id>-01``;
+  * ``X-Request-ID`` - совпадает с trace id, чтобы искать запрос в логах.
+
+Время запроса на стороне клиента пишется спаном OTLP (kind CLIENT) в
+``--trace-file`` в формате JSON lines, как у файлового экспортера
+OpenTelemetry: одна строка - один ``ExportTraceServiceRequest``. В файл
+попадает доля ``--trace-sample`` запросов; воркеры пишут каждый в свой
+файл с суффиксом ``.worker-N``. Проверка файла без коллектора:
+
+    python tracing.py validate spans.jsonl
+
+Для каждого имени запроса сохраняются ``--trace-slowest`` самых медленных
+запросов с полным контекстом (trace id, URL, статус, время, ошибка) - в
+``<--csv>_slowest.json`` либо рядом с ``--trace-file``.
+"""
+import argparse
+import heapq
+import json
+import logging
+import os
+import random
+import re
+import sys
+import time
+from collections import Counter
+
+import gevent
+from locust import events
+from locust.runners import WorkerRunner
+
+SERVICE_NAME = "english-gang-locust"
+SPAN_KIND_CLIENT = 3
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_sample_rate = 1.0
+
+
+def new_ids():
+    """trace id (32 hex) и span id (16 hex)"""
+    return f"{random.getrandbits(128):032x}", f"{random.getrandbits(64):016x}"
+
+
+def traced(request):
+    """Обертка над ``request`` клиента Locust, добавляющая заголовки и контекст трассировки"""
+    def wrapper(self, method, url, *args, **kwargs):
+        trace_id, span_id = new_ids()
+        # Словарь заголовков пользователя (например, закэшированный Authorization) не меняем
+        kwargs["headers"] = {
+            **(kwargs.get("headers") or {}),
+            "X-Request-ID": trace_id,
+            "traceparent": f"00-{trace_id}-{span_id}-01",
+        }
+        kwargs["context"] = {**kwargs.get("context", {}), "trace_id": trace_id, "span_id": span_id}
+        return request(self, method, url, *args, **kwargs)
+    return wrapper
+
+
+def install():
+    from locust.clients import HttpSession
+    from locust.contrib.fasthttp import FastHttpSession
+
+    HttpSession.request = traced(HttpSession.request)
+    FastHttpSession.request = traced(FastHttpSession.request)
+
+
+def _attribute(key, value):
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+class SpanWriter:
+    """Буфер спанов, периодически дописываемый в файл JSON lines"""
+
+    def __init__(self, path, node):
+        self.path = path
+        self.node = node
+        self.spans = []
+        self.written = 0
+
+    def add(self, trace_id, span_id, name, request_type, url, status, start_time, response_time, exception):
+        start_ns = int(start_time * 1e9)
+        attributes = [
+            _attribute("http.request.method", request_type),
+            _attribute("url.full", url or ""),
+            _attribute("locust.name", name),
+        ]
+        if status:
+            attributes.append(_attribute("http.response.status_code", status))
+        span = {
+            "traceId": trace_id,
+            "spanId": span_id,
+            "name": name,
+            "kind": SPAN_KIND_CLIENT,
+            "startTimeUnixNano": str(start_ns),
+            "endTimeUnixNano": str(start_ns + int(response_time * 1e6)),
+            "attributes": attributes,
+            "status": {"code": STATUS_ERROR, "message": str(exception)[:200]} if exception else {"code": STATUS_OK},
+        }
+        self.spans.append(span)
+
+    def flush(self):
+        if not self.spans:
+            return
+        spans, self.spans = self.spans, []
+        batch = {
+            "resourceSpans": [{
+                "resource": {"attributes": [_attribute("service.name", SERVICE_NAME), _attribute("locust.node", self.node)]},
+                "scopeSpans": [{"scope": {"name": "tracing.py"}, "spans": spans}],
+            }]
+        }
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(batch, separators=(",", ":")) + "\n")
+        self.written += len(spans)
+
+    def run(self, interval=5.0):
+        while True:
+            gevent.sleep(interval)
+            self.flush()
+
+
+class SlowestRequests:
+    """N самых медленных запросов по каждому имени"""
+
+    def __init__(self, limit=10):
+        self.limit = limit
+        self.heaps = {}
+        self._counter = 0
+
+    def add(self, record):
+        heap = self.heaps.setdefault(record["name"], [])
+        # Счетчик разрешает совпадения времени без сравнения словарей
+        self._counter += 1
+        item = (record["response_time"], self._counter, record)
+        if len(heap) < self.limit:
+            heapq.heappush(heap, item)
+        elif item[0] > heap[0][0]:
+            heapq.heapreplace(heap, item)
+
+    def take(self):
+        records = [record for heap in self.heaps.values() for _, _, record in heap]
+        self.heaps = {}
+        return records
+
+    def merge(self, records):
+        for record in records:
+            self.add(record)
+
+    def result(self):
+        return {
+            name: [record for _, _, record in sorted(heap, reverse=True)]
+            for name, heap in sorted(self.heaps.items())
+        }
+
+
+SLOWEST = SlowestRequests()
+_writer = None
+_enabled = False
+
+
+@events.init_command_line_parser.add_listener
+def _(parser):
+    parser.add_argument("--trace", action="store_true", default=False,
+                        help="Отправлять X-Request-ID и traceparent с каждым запросом")
+    parser.add_argument("--trace-file", default="", help="Файл спанов OTLP JSON lines")
+    parser.add_argument("--trace-sample", type=float, default=1.0, help="Доля запросов, записываемых в --trace-file")
+    parser.add_argument("--trace-slowest", type=int, default=10, help="Сколько самых медленных запросов хранить на имя")
+
+
+@events.init.add_listener
+def _(environment, **kwargs):
+    global _enabled, _sample_rate
+    options = environment.parsed_options
+    if options is None or not options.trace:
+        return
+    _enabled = True
+    _sample_rate = options.trace_sample
+    SLOWEST.limit = options.trace_slowest
+    install()
+
+
+@events.test_start.add_listener
+def _(environment, **kwargs):
+    global _writer
+    options = environment.parsed_options
+    if not _enabled or not options.trace_file or _writer is not None:
+        return
+    path, node = options.trace_file, "local"
+    runner = environment.runner
+    if isinstance(runner, WorkerRunner):
+        # Номер воркера известен только к началу теста
+        node = f"worker-{runner.worker_index}"
+        path = f"{path}.{node}"
+    _writer = SpanWriter(path, node)
+    gevent.spawn(_writer.run)
+
+
+@events.request.add_listener
+def _(request_type, name, response_time, context, exception, start_time=None, url=None, response=None, **kwargs):
+    trace_id = context.get("trace_id")
+    if trace_id is None or response_time is None:
+        return
+    status = getattr(response, "status_code", 0) or 0
+    start_time = start_time or time.time() - response_time / 1000
+    if _writer is not None and (_sample_rate >= 1.0 or random.random() < _sample_rate):
+        _writer.add(trace_id, context["span_id"], name, request_type, url, status, start_time, response_time, exception)
+    SLOWEST.add({
+        "name": name,
+        "method": request_type,
+        "response_time": round(response_time, 3),
+        "start_time": round(start_time, 6),
+        "trace_id": trace_id,
+        "span_id": context["span_id"],
+        "url": url,
+        "status": status,
+        "error": str(exception) if exception else None,
+    })
+
+
+@events.report_to_master.add_listener
+def _(client_id, data):
+    if _enabled:
+        data["trace_slowest"] = SLOWEST.take()
+
+
+@events.worker_report.add_listener
+def _(client_id, data):
+    SLOWEST.merge(data.get("trace_slowest", ()))
+
+
+@events.quitting.add_listener
+def _(environment, **kwargs):
+    if _writer is not None:
+        _writer.flush()
+        logging.info(f"Записано {_writer.written} спанов в {_writer.path}")
+    if isinstance(environment.runner, WorkerRunner) or not SLOWEST.heaps:
+        return
+    options = environment.parsed_options
+    if options.csv_prefix:
+        path = f"{options.csv_prefix}_slowest.json"
+    elif options.trace_file:
+        path = f"{os.path.splitext(options.trace_file)[0]}_slowest.json"
+    else:
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(SLOWEST.result(), f, ensure_ascii=False, indent=2)
+    logging.info(f"Самые медленные запросы по именам записаны в {path}")
+
+
+# --- Проверка файла спанов ---
+
+
+HEX_ID = {"traceId": re.compile(r"^[0-9a-f]{32}$"), "spanId": re.compile(r"^[0-9a-f]{16}$")}
+
+
+def validate_span(span):
+    """Ошибки спана по правилам OTLP JSON: id в hex, время, обязательные поля"""
+    errors = []
+    for field, pattern in HEX_ID.items():
+        value = span.get(field, "")
+        if not pattern.match(value) or not value.strip("0"):
+            errors.append(f"некорректный {field}: {value!r}")
+    if not span.get("name"):
+        errors.append("пустое имя")
+    try:
+        start, end = int(span["startTimeUnixNano"]), int(span["endTimeUnixNano"])
+        if end < start:
+            errors.append("endTimeUnixNano раньше startTimeUnixNano")
+    except (KeyError, ValueError):
+        errors.append("нет или некорректно время начала/окончания")
+    if span.get("kind") not in range(0, 6):
+        errors.append(f"некорректный kind: {span.get('kind')!r}")
+    if span.get("status", {}).get("code", 0) not in (0, STATUS_OK, STATUS_ERROR):
+        errors.append("некорректный status.code")
+    for attribute in span.get("attributes", ()):
+        if "key" not in attribute or not isinstance(attribute.get("value"), dict):
+            errors.append(f"некорректный атрибут: {attribute!r}")
+    return errors
+
+
+def validate_file(path, max_errors=20):
+    """Проверяет файл спанов; возвращает (число спанов, спаны по именам, ошибки)"""
+    names = Counter()
+    errors = []
+    seen = set()
+    total = 0
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            try:
+                batch = json.loads(line)
+                scope_spans = [
+                    scope for resource in batch["resourceSpans"] for scope in resource["scopeSpans"]
+                ]
+            except (ValueError, KeyError, TypeError) as e:
+                errors.append(f"строка {line_number}: не ExportTraceServiceRequest ({e})")
+                continue
+            for scope in scope_spans:
+                for span in scope.get("spans", ()):
+                    total += 1
+                    names[span.get("name")] += 1
+                    key = (span.get("traceId"), span.get("spanId"))
+                    problems = validate_span(span)
+                    if key in seen:
+                        problems.append("повторный traceId/spanId")
+                    seen.add(key)
+                    errors.extend(f"строка {line_number}: {problem}" for problem in problems)
+            if len(errors) >= max_errors:
+                break
+    return total, names, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Трассировка запросов English Gang")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    validate_parser = subparsers.add_parser("validate", help="Проверить файл спанов OTLP JSON lines")
+    validate_parser.add_argument("files", nargs="+")
+    args = parser.parse_args()
+
+    failed = False
+    for path in args.files:
+        total, names, errors = validate_file(path)
+        print(f"{path}: {total} спанов, {len(names)} имен")
+        for name, count in names.most_common():
+            print(f"  {count:>9}  {name}")
+        for error in errors:
+            print(f"  ОШИБКА {error}")
+        failed = failed or bool(errors) or not total
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""
+Конкурентные обновления "горячих" студентов.
+
+Обычный ``update_student_info`` (вес 2) обновляет только собственную запись
+пользователя, поэтому конкуренция за строки и потерянные обновления не
+проверяются. Здесь все пользователи пишут в небольшой набор студентов:
+читают запись (GET), увеличивают ``vocabulary`` на случайную дельту и
+записывают ее целиком (PUT) - как это делает клиент English Gang.
+
+Горячий набор задается ``--hot-ids 4:pass4,5:pass5`` либо берется из
+первых ``--hot-students`` id каталога ``--seed-dir``; если ни того, ни
+другого нет, студенты создаются перед тестом учетной записью менеджера.
+PUT передает студенту весь профиль вместе с паролем, поэтому пароль
+каждого горячего студента должен быть известен: из ``--hot-ids``, из
+``accounts.csv`` каталога ``--seed-dir`` или заданный при создании.
+Начальные значения читаются до того, как набор становится доступен
+пользователям, поэтому записи во время подготовки невозможны.
+Конкурентность - число пользователей (``-u``) при нулевом ожидании.
+
+В конце теста итоговый ``vocabulary`` каждого студента сравнивается с
+начальным значением плюс сумма дельт успешных PUT: расхождение -
+потерянные обновления. Итоги (размер горячего набора, пользователи,
+записей/с, доля ошибок и конфликтов 409/412, p50/p99 PUT, потерянные
+обновления) печатаются и дописываются строкой в ``--contention-out``,
+чтобы сравнивать прогоны с разным размером горячего набора.
+"""
+import csv
+import json
+import logging
+import os
+import random
+import time
+import uuid
+
+from locust import events
+from locust.runners import MasterRunner, WorkerRunner
+
+from response_json import parse
+from scenario_engine import SEED_IDS, ScenarioUser, action
+from seed_data import LEVELS, BulkLoader
+from student_snapshot import student_update
+
+READ_NAME = "GET contended student"
+WRITE_NAME = "PUT contended student"
+# Статусы, которыми сервер сообщает о конфликте одновременной записи
+CONFLICT_STATUSES = frozenset((409, 412))
+HOT_SET_MESSAGE = "contention_hot_set"
+HOT_PASSWORD = "hotstudent123"
+
+
+class WriteLedger:
+    """Горячий набор и примененные дельты по id студентов"""
+
+    def __init__(self):
+        self.ids = []
+        # Пароли горячих студентов: PUT без правильного пароля сбросил бы его
+        self.passwords = {}
+        self.initial = {}
+        self.applied = {}
+        self.writes = {}
+        # Дельты PUT без ответа: пользователь мог быть остановлен после отправки запроса
+        self.pending = {}
+        self.conflicts = 0
+
+    def start(self, student_id, delta):
+        self.pending[student_id] = self.pending.get(student_id, 0) + delta
+
+    def finish(self, student_id, delta, applied):
+        self.pending[student_id] = self.pending.get(student_id, 0) - delta
+        if applied:
+            self.applied[student_id] = self.applied.get(student_id, 0) + delta
+            self.writes[student_id] = self.writes.get(student_id, 0) + 1
+
+    def take(self):
+        data = {
+            "applied": list(self.applied.items()),
+            "writes": list(self.writes.items()),
+            "pending": list(self.pending.items()),
+            "conflicts": self.conflicts,
+        }
+        self.applied, self.writes, self.pending, self.conflicts = {}, {}, {}, 0
+        return data
+
+    def merge(self, data):
+        for student_id, delta in data["applied"]:
+            self.applied[student_id] = self.applied.get(student_id, 0) + delta
+        for student_id, count in data["writes"]:
+            self.writes[student_id] = self.writes.get(student_id, 0) + count
+        for student_id, delta in data["pending"]:
+            self.pending[student_id] = self.pending.get(student_id, 0) + delta
+        self.conflicts += data["conflicts"]
+
+
+LEDGER = WriteLedger()
+DELTA_MAX = 10
+
+
+@action("contended_update")
+def contended_update(user, endpoint):
+    """GET -> vocabulary + дельта -> PUT для случайного студента из горячего набора"""
+    student_id = user.hot_student_id
+    path = f"/api/students/{student_id}"
+    with user.client.get(path, headers=user.auth_headers(), name=READ_NAME, catch_response=True) as response:
+        if response.status_code != 200:
+            response.failure(f"Не удалось прочитать студента {student_id}: {response.status_code}")
+            return
+        snapshot = parse(response)
+
+    delta = random.randint(1, DELTA_MAX)
+    LEDGER.start(student_id, delta)
+    update = student_update(snapshot, delta, password=LEDGER.passwords[student_id])
+    with endpoint.request(user, path=path, json=update) as response:
+        if response.status_code in CONFLICT_STATUSES:
+            LEDGER.conflicts += 1
+            response.failure(f"Конфликт записи студента {student_id}: {response.status_code}")
+            LEDGER.finish(student_id, delta, applied=False)
+        else:
+            LEDGER.finish(student_id, delta, applied=endpoint.check(response, user))
+
+
+class ContentionUser(ScenarioUser):
+    """Пользователь, пишущий в горячий набор; до его подготовки задачи пропускаются"""
+
+    abstract = True
+
+    @property
+    def hot_student_id(self):
+        return random.choice(LEDGER.ids) if LEDGER.ids else None
+
+
+def _loader(environment):
+    options = environment.parsed_options
+    return BulkLoader(environment.host, options.contention_username, options.contention_password, concurrency=4)
+
+
+def create_students(loader, count):
+    teachers = loader.get("/api/teachers/public") or []
+    if not teachers:
+        raise RuntimeError("Нет преподавателей, к которым можно привязать горячих студентов")
+    tag = uuid.uuid4().hex[:8]
+
+    def payload(number):
+        return {
+            "first_name": f"Hot{number}",
+            "last_name": f"Student{tag}",
+            "age": 20,
+            "sex": "F",
+            "email": f"hot{number}.{tag}@contention.example.com",
+            "level": random.choice(LEVELS),
+            "vocabulary": 1000,
+            "teacher_id": teachers[0]["id"],
+            "password": HOT_PASSWORD,
+        }
+
+    ids = loader.load("/api/students/", range(count), count, "Горячие студенты", payload)
+    return {student_id: HOT_PASSWORD for student_id in ids if student_id}
+
+
+def seed_passwords(seed_dir, ids):
+    """Пароли студентов с заданными id из accounts.csv, записанного seed_data.py"""
+    path = os.path.join(seed_dir, "accounts.csv") if seed_dir else ""
+    if not os.path.exists(path):
+        return {}
+    wanted = set(ids)
+    passwords = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            if row.get("role") == "student" and row.get("id") and int(row["id"]) in wanted:
+                passwords[int(row["id"])] = row["password"]
+    return passwords
+
+
+def choose_hot_set(environment, loader):
+    """Горячий набор: id студента -> пароль; студенты с неизвестным паролем исключаются"""
+    options = environment.parsed_options
+    if options.hot_ids:
+        passwords = {}
+        for value in options.hot_ids.split(","):
+            student_id, _, password = value.partition(":")
+            if student_id:
+                passwords[int(student_id)] = password or None
+    elif SEED_IDS.get("student"):
+        passwords = dict.fromkeys(int(student_id) for student_id in SEED_IDS["student"].ids[:options.hot_students])
+    else:
+        return create_students(loader, options.hot_students)
+
+    unknown = [student_id for student_id, password in passwords.items() if password is None]
+    passwords.update(seed_passwords(options.seed_dir, unknown))
+    unknown = [student_id for student_id, password in passwords.items() if password is None]
+    if unknown:
+        logging.warning(
+            f"Нет паролей студентов {', '.join(map(str, unknown[:10]))}: они исключены из горячего набора, "
+            f"иначе PUT сбросил бы их пароли (задайте --hot-ids id:пароль или accounts.csv в --seed-dir)"
+        )
+    passwords = {student_id: password for student_id, password in passwords.items() if password is not None}
+    if not passwords:
+        raise RuntimeError("В горячем наборе не осталось студентов с известным паролем")
+    return passwords
+
+
+def vocabulary(loader, student_id):
+    student = loader.get(f"/api/students/{student_id}")
+    return student["vocabulary"] if student else None
+
+
+@events.init_command_line_parser.add_listener
+def _(parser):
+    parser.add_argument("--hot-ids", default="", help="Горячие студенты через запятую: id:пароль или id")
+    parser.add_argument("--hot-students", type=int, default=10, help="Размер горячего набора, если --hot-ids не задан")
+    parser.add_argument("--write-delta-max", type=int, default=10, help="Максимальная дельта vocabulary за одну запись")
+    parser.add_argument("--contention-username", default="admin@example.com",
+                        help="Учетная запись для подготовки горячего набора и итоговой проверки")
+    parser.add_argument("--contention-password", default="admin123")
+    parser.add_argument("--contention-out", default="contention_results.jsonl",
+                        help="Файл, в который дописываются итоги прогонов")
+
+
+@events.init.add_listener
+def _(environment, **kwargs):
+    global DELTA_MAX
+    if environment.parsed_options is not None:
+        DELTA_MAX = environment.parsed_options.write_delta_max
+    if isinstance(environment.runner, WorkerRunner):
+        def on_hot_set(environment, msg, **kwargs):
+            LEDGER.passwords = {student_id: password for student_id, password in msg.data}
+            LEDGER.ids = list(LEDGER.passwords)
+
+        environment.runner.register_message(HOT_SET_MESSAGE, on_hot_set)
+
+
+@events.test_start.add_listener
+def _(environment, **kwargs):
+    if isinstance(environment.runner, WorkerRunner):
+        return
+    loader = _loader(environment)
+    LEDGER.take()
+    LEDGER.ids = []
+    passwords = choose_hot_set(environment, loader)
+    # Пользователи уже запускаются: набор публикуется только после чтения начальных значений,
+    # иначе их записи попали бы и в initial, и в applied и считались бы потерянными
+    LEDGER.initial = {student_id: vocabulary(loader, student_id) for student_id in passwords}
+    LEDGER.passwords = passwords
+    LEDGER.ids = list(passwords)
+    logging.info(f"Горячий набор: {len(LEDGER.ids)} студентов ({', '.join(map(str, LEDGER.ids[:10]))}...)")
+    if isinstance(environment.runner, MasterRunner):
+        environment.runner.send_message(HOT_SET_MESSAGE, list(passwords.items()))
+
+
+@events.report_to_master.add_listener
+def _(client_id, data):
+    if LEDGER.writes or LEDGER.pending or LEDGER.conflicts:
+        data["write_contention"] = LEDGER.take()
+
+
+@events.worker_report.add_listener
+def _(client_id, data):
+    if "write_contention" in data:
+        LEDGER.merge(data["write_contention"])
+
+
+@events.quitting.add_listener
+def _(environment, **kwargs):
+    if isinstance(environment.runner, WorkerRunner) or not LEDGER.ids:
+        return
+    loader = _loader(environment)
+    lost = 0
+    inconsistent = 0
+    for student_id in LEDGER.ids:
+        initial = LEDGER.initial.get(student_id)
+        final = vocabulary(loader, student_id)
+        if initial is None or final is None:
+            continue
+        expected = initial + LEDGER.applied.get(student_id, 0)
+        # Запросы, оборванные остановкой пользователей, могли как примениться, так и нет
+        in_flight = LEDGER.pending.get(student_id, 0)
+        if not expected <= final <= expected + in_flight:
+            inconsistent += 1
+            # Дельты положительны, поэтому недостача - сумма потерянных дельт
+            lost += max(0, expected - final)
+
+    write = environment.stats.get(WRITE_NAME, "PUT")
+    writes = sum(LEDGER.writes.values())
+    result = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "hot_students": len(LEDGER.ids),
+        "users": environment.parsed_options.num_users,
+        "writes": writes,
+        "writes_per_second": round(write.total_rps, 2),
+        "error_rate": round(write.fail_ratio, 5),
+        "conflict_rate": round(LEDGER.conflicts / write.num_requests, 5) if write.num_requests else 0.0,
+        "p50_ms": write.get_response_time_percentile(0.5),
+        "p99_ms": write.get_response_time_percentile(0.99),
+        "inconsistent_students": inconsistent,
+        "lost_vocabulary": lost,
+    }
+    logging.info(
+        f"Конкурентная запись: {len(LEDGER.ids)} горячих студентов, {writes} успешных PUT "
+        f"({result['writes_per_second']}/с), ошибок {result['error_rate']:.2%}, конфликтов {result['conflict_rate']:.2%}, "
+        f"p50/p99 {result['p50_ms']}/{result['p99_ms']} мс; расхождение у {inconsistent} студентов, "
+        f"потеряно {lost} единиц vocabulary"
+    )
+    with open(environment.parsed_options.contention_out, "a", encoding="utf-8") as f:
+        f.write(json.dumps(result) + "\n")